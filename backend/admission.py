@@ -0,0 +1,141 @@
+"""
+Admission control for /query.
+
+At most `max_concurrent` pipelines run at once. Up to `max_queue` more
+requests wait in FIFO order for at most `max_queue_wait_ms`. Anything
+beyond that is rejected at once (429 when the queue is full, 503 when
+the wait runs out), with a Retry-After estimated from recent service
+times. Admitted requests keep their latency instead of every request
+slowing down together.
+
+Waiting happens on the event loop, before the request takes a
+threadpool thread, so queued requests hold no worker thread.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+from .config import QUERY_MAX_CONCURRENCY, QUERY_MAX_QUEUE, QUERY_MAX_QUEUE_WAIT_MS
+from .metrics import (
+    QUERY_ADMISSION_IN_FLIGHT,
+    QUERY_ADMISSION_LIMIT,
+    QUERY_QUEUE_DEPTH,
+    QUERY_QUEUE_WAIT_SECONDS,
+    QUERY_REJECTED_TOTAL,
+)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Concurrency limit plus a bounded, time-limited FIFO queue (one event loop)."""
+
+    def __init__(
+        self,
+        max_concurrent: int = QUERY_MAX_CONCURRENCY,
+        max_queue: int = QUERY_MAX_QUEUE,
+        max_queue_wait_ms: float = QUERY_MAX_QUEUE_WAIT_MS,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.max_queue_wait = max_queue_wait_ms / 1000.0
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._service_s = 5.0   # EWMA of admitted request durations
+        self.rejected: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0}
+
+        QUERY_ADMISSION_LIMIT.labels(kind="concurrency").set(self.max_concurrent)
+        QUERY_ADMISSION_LIMIT.labels(kind="queue").set(self.max_queue)
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns seconds queued or raises AdmissionRejected."""
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self._export()
+            QUERY_QUEUE_WAIT_SECONDS.observe(0.0)
+            return 0.0
+
+        if len(self._waiters) >= self.max_queue:
+            self._reject(429, "queue_full")
+
+        start = time.perf_counter()
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self._export()
+        try:
+            # shield: on timeout the future is left alone, so a slot handed
+            # over at the last moment is not lost
+            await asyncio.wait_for(asyncio.shield(fut), self.max_queue_wait)
+        except asyncio.TimeoutError:
+            if not fut.done():
+                self._abandon(fut)
+                self._reject(503, "queue_timeout")
+        except asyncio.CancelledError:
+            # Client went away while queued
+            if fut.done() and not fut.cancelled():
+                self.release()
+            else:
+                self._abandon(fut)
+            raise
+
+        waited = time.perf_counter() - start
+        QUERY_QUEUE_WAIT_SECONDS.observe(waited)
+        return waited
+
+    def release(self, service_s: float | None = None):
+        """Free a slot, handing it straight to the oldest waiter if there is one."""
+        if service_s is not None:
+            self._service_s = 0.8 * self._service_s + 0.2 * service_s
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(True)   # the slot moves over; `active` is unchanged
+                self._export()
+                return
+        self.active -= 1
+        self._export()
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained."""
+        backlog = (len(self._waiters) + 1) / self.max_concurrent
+        return max(1, math.ceil(self._service_s * backlog))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.active,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "max_queue_wait_ms": self.max_queue_wait * 1000.0,
+            "avg_service_s": round(self._service_s, 3),
+            "rejected": dict(self.rejected),
+        }
+
+    def _abandon(self, fut: asyncio.Future):
+        try:
+            self._waiters.remove(fut)
+        except ValueError:
+            pass
+        fut.cancel()
+        self._export()
+
+    def _reject(self, status: int, reason: str):
+        self.rejected[reason] += 1
+        QUERY_REJECTED_TOTAL.labels(reason=reason).inc()
+        raise AdmissionRejected(status, reason, self.retry_after())
+
+    def _export(self):
+        QUERY_ADMISSION_IN_FLIGHT.set(self.active)
+        QUERY_QUEUE_DEPTH.set(len(self._waiters))
+
+
+# GLOBAL INSTANCE
+query_admission = AdmissionController()
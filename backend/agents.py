@@ -1,8 +1,12 @@
+import json
 from typing import Dict, List, Tuple
-import openai
 
 from .config import CHAT_MODEL, RAG_SYSTEM_PROMPT
-from .embeddings import get_embedding
+from .embeddings import get_embedding, get_embeddings
+from .llm_client import chat_completion
+from .instrumentation import traced_agent, record_context
+from .metrics import SUMMARY_LOOKUPS_TOTAL
+from .summaries import summary_store
 from .vector_store import vector_store
 
 # ----------------------------------------------------
@@ -15,14 +19,13 @@ from .logging_config import (
     pipeline_logger,
 )
 
-client = openai.OpenAI()
-
 # ----------------------------------------------------
 # RETRIEVAL AGENT
 # ----------------------------------------------------
+@traced_agent("retrieval")
 def retrieval_agent(query: str, top_k: int) -> List[Dict]:
     retriever_agent_logger.info(
-        f"Retrieval agent received query='{query}', top_k={top_k}",
+        "Retrieval agent received query=%r, top_k=%s", query, top_k,
         extra={"agent": "retrieval"}
     )
 
@@ -30,12 +33,25 @@ def retrieval_agent(query: str, top_k: int) -> List[Dict]:
     return vector_store.search(q_emb, k=top_k)
 
 
+@traced_agent("retrieval")
+def batch_retrieval_agent(queries: List[str], top_k: int) -> List[List[Dict]]:
+    """One embedding request and one index search for a whole batch of queries."""
+    retriever_agent_logger.info(
+        "Batch retrieval agent received %s queries, top_k=%s", len(queries), top_k,
+        extra={"agent": "retrieval"}
+    )
+
+    q_embs = get_embeddings(queries)
+    return vector_store.search_batch(q_embs, k=top_k)
+
+
 # ----------------------------------------------------
 # RERANKER AGENT
 # ----------------------------------------------------
+@traced_agent("reranker")
 def reranker_agent(query: str, candidates: List[Dict]) -> List[Dict]:
     pipeline_logger.info(
-        f"Reranker agent sorting {len(candidates)} candidates for query='{query}'",
+        "Reranker agent sorting %s candidates for query=%r", len(candidates), query,
         extra={"pipeline_step": "rerank"}
     )
 
@@ -45,18 +61,53 @@ def reranker_agent(query: str, candidates: List[Dict]) -> List[Dict]:
 # ----------------------------------------------------
 # SUMMARIZER AGENT
 # ----------------------------------------------------
-def summarizer_agent(chunks: List[Dict]) -> str:
+@traced_agent("summarizer")
+def summarizer_agent(chunks: List[Dict], timeout: float | None = None) -> str:
+    """
+    Assembles the ingest-time summaries of the retrieved chunks (no
+    network call); only chunks without one are summarised live.
+    """
+    lines, missing = [], []
+    for c in chunks:
+        chunk_summary = summary_store.chunk(c)
+        if chunk_summary is None:
+            missing.append(c)
+        else:
+            src = c.get("policy_id") or c.get("source", "unknown")
+            lines.append(f"- [{src}] {chunk_summary}")
+    SUMMARY_LOOKUPS_TOTAL.labels(result="hit").inc(len(chunks) - len(missing))
+    SUMMARY_LOOKUPS_TOTAL.labels(result="miss").inc(len(missing))
+
     synth_agent_logger.info(
-        f"Summarizer agent condensing {len(chunks)} chunks",
+        "Summarizer agent assembling %s precomputed summaries, %s live",
+        len(chunks) - len(missing), len(missing),
         extra={"agent": "summarizer"}
     )
 
+    if missing:
+        lines.append(_live_summary(missing, timeout))
+
+    overviews = []
+    for policy_id in dict.fromkeys(c.get("policy_id") for c in chunks if c.get("policy_id")):
+        overview = summary_store.policy(policy_id)
+        if overview:
+            overviews.append(f"[{policy_id}] {overview}")
+
+    summary = "\n".join(lines)
+    if overviews:
+        summary = "Policy overviews:\n" + "\n".join(overviews) + "\n\nRelevant excerpts:\n" + summary
+    return summary
+
+
+def _live_summary(chunks: List[Dict], timeout: float | None = None) -> str:
+    """The LLM summarizer, for chunks with no precomputed summary."""
     pieces = []
     for c in chunks:
         src = c.get("policy_id") or c.get("source", "unknown")
         pieces.append(f"[{src}] {c.get('text', '')}")
 
     joined = "\n".join(pieces)[:6000]
+    record_context(len(chunks), len(joined))
 
     msg = (
         "Summarise the following policy excerpts into key bullet points focused on "
@@ -64,23 +115,40 @@ def summarizer_agent(chunks: List[Dict]) -> str:
         + joined
     )
 
-    resp = client.chat.completions.create(
+    resp = chat_completion(
         model=CHAT_MODEL,
         messages=[{"role": "user", "content": msg}],
         temperature=0.2,
+        timeout=timeout,
     )
     return resp.choices[0].message.content
 
 
+def fallback_summary(chunks: List[Dict], max_chars: int = 300) -> str:
+    """
+    Cheap extractive stand-in for summarizer_agent used when the latency
+    budget is short: the opening of each chunk, tagged with its source.
+    No LLM call.
+    """
+    lines = []
+    for c in chunks:
+        src = c.get("policy_id") or c.get("source", "unknown")
+        lines.append(f"- [{src}] {summary_store.chunk(c) or c.get('text', '')[:max_chars]}")
+    return "\n".join(lines)
+
+
 # ----------------------------------------------------
 # COMPLIANCE REASONER AGENT
 # ----------------------------------------------------
-def compliance_reasoner_agent(query: str, summary: str) -> str:
+@traced_agent("reasoner")
+def compliance_reasoner_agent(query: str, summary: str, timeout: float | None = None) -> str:
     pipeline_logger.info(
-        f"Compliance reasoning agent analyzing query='{query}'",
+        "Compliance reasoning agent analyzing query=%r", query,
         extra={"pipeline_step": "compliance_reasoning"}
     )
 
+    record_context(0, len(summary))
+
     prompt = (
         f"Question: {query}\n\n"
         f"Policy summary:\n{summary}\n\n"
@@ -88,10 +156,11 @@ def compliance_reasoner_agent(query: str, summary: str) -> str:
         "Identify which rules apply, which do not, and where there is ambiguity."
     )
 
-    resp = client.chat.completions.create(
+    resp = chat_completion(
         model=CHAT_MODEL,
         messages=[{"role": "user", "content": prompt}],
         temperature=0.2,
+        timeout=timeout,
     )
     return resp.choices[0].message.content
 
@@ -99,13 +168,17 @@ def compliance_reasoner_agent(query: str, summary: str) -> str:
 # ----------------------------------------------------
 # FACT CHECKER AGENT
 # ----------------------------------------------------
-def fact_checker_agent(query: str, answer: str, chunks: List[Dict]) -> Tuple[str, List[str]]:
+@traced_agent("fact_checker")
+def fact_checker_agent(
+    query: str, answer: str, chunks: List[Dict], timeout: float | None = None
+) -> Tuple[str, List[str]]:
     pipeline_logger.info(
-        f"Fact-checker agent validating answer for query='{query}' using {len(chunks)} chunks",
+        "Fact-checker agent validating answer for query=%r using %s chunks", query, len(chunks),
         extra={"pipeline_step": "fact_check"}
     )
 
     context = "\n".join(c.get("text", "") for c in chunks)[:6000]
+    record_context(len(chunks), len(context))
 
     prompt = (
         "You are a strict compliance fact checker.\n"
@@ -117,10 +190,11 @@ def fact_checker_agent(query: str, answer: str, chunks: List[Dict]) -> Tuple[str
         "Otherwise, list unsupported or speculative claims."
     )
 
-    resp = client.chat.completions.create(
+    resp = chat_completion(
         model=CHAT_MODEL,
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
+        timeout=timeout,
     )
 
     verdict = resp.choices[0].message.content
@@ -130,9 +204,16 @@ def fact_checker_agent(query: str, answer: str, chunks: List[Dict]) -> Tuple[str
 # ----------------------------------------------------
 # FINAL ANSWER WRITER (SYNTHESIZER)
 # ----------------------------------------------------
-def answer_writer_agent(query: str, chunks: List[Dict], reasoning: str, fact_check_verdict: str) -> str:
+@traced_agent("answer_writer")
+def answer_writer_agent(
+    query: str,
+    chunks: List[Dict],
+    reasoning: str,
+    fact_check_verdict: str,
+    timeout: float | None = None,
+) -> str:
     synth_agent_logger.info(
-        f"Answer writer agent generating final answer for query='{query}'",
+        "Answer writer agent generating final answer for query=%r", query,
         extra={"agent": "answer_writer"}
     )
 
@@ -141,6 +222,7 @@ def answer_writer_agent(query: str, chunks: List[Dict], reasoning: str, fact_che
         src = c.get("policy_id") or c.get("source", "unknown")
         context_strs.append(f"[Source: {src}] Extract: {c.get('text','')}")
     context_block = "\n\n".join(context_strs)[:6000]
+    record_context(len(chunks), len(context_block))
 
     messages = [
         {"role": "system", "content": RAG_SYSTEM_PROMPT},
@@ -157,10 +239,97 @@ def answer_writer_agent(query: str, chunks: List[Dict], reasoning: str, fact_che
         }
     ]
 
-    resp = client.chat.completions.create(
+    resp = chat_completion(
         model=CHAT_MODEL,
         messages=messages,
         temperature=0.2,
+        timeout=timeout,
     )
 
     return resp.choices[0].message.content
+
+
+# ----------------------------------------------------
+# FUSED AGENT (summary, reasoning, fact check and answer in one call)
+# ----------------------------------------------------
+FUSED_FIELDS = ("summary", "reasoning", "fact_check", "answer")
+
+FUSED_SCHEMA = {
+    "name": "compliance_answer",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "summary": {
+                "type": "string",
+                "description": "Key rules, thresholds, timelines and obligations in the excerpts, as bullet points.",
+            },
+            "reasoning": {
+                "type": "string",
+                "description": "As a senior compliance officer: which rules apply, which do not, and where there is ambiguity.",
+            },
+            "fact_check": {
+                "type": "string",
+                "description": "'Answer fully supported' if every claim in the reasoning is backed by the excerpts, "
+                               "otherwise the unsupported or speculative claims.",
+            },
+            "answer": {
+                "type": "string",
+                "description": "Clear, concise answer for a business stakeholder, citing policy IDs or titles.",
+            },
+        },
+        "required": list(FUSED_FIELDS),
+        "additionalProperties": False,
+    },
+}
+
+
+@traced_agent("fused")
+def fused_agent(query: str, chunks: List[Dict], timeout: float | None = None) -> Dict[str, str]:
+    """
+    Summarizer, reasoner, fact checker and answer writer as one
+    structured-output completion. Raises ValueError if the reply does
+    not match FUSED_SCHEMA.
+    """
+    synth_agent_logger.info(
+        "Fused agent answering query=%r from %s chunks", query, len(chunks),
+        extra={"agent": "fused"}
+    )
+
+    context_strs = []
+    for c in chunks:
+        src = c.get("policy_id") or c.get("source", "unknown")
+        context_strs.append(f"[Source: {src}] Extract: {c.get('text','')}")
+    context_block = "\n\n".join(context_strs)[:6000]
+    record_context(len(chunks), len(context_block))
+
+    messages = [
+        {"role": "system", "content": RAG_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": (
+                f"Question: {query}\n\n"
+                f"Relevant policy context:\n{context_block}\n\n"
+                "Fill in each field in order: summarise the excerpts, reason about the question, "
+                "check that reasoning strictly against the excerpts, then write the final answer "
+                "using only supported claims."
+            )
+        }
+    ]
+
+    resp = chat_completion(
+        model=CHAT_MODEL,
+        messages=messages,
+        temperature=0.2,
+        response_format={"type": "json_schema", "json_schema": FUSED_SCHEMA},
+        timeout=timeout,
+    )
+
+    try:
+        parsed = json.loads(resp.choices[0].message.content or "")
+        fields = {name: parsed[name] for name in FUSED_FIELDS}
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Fused reply does not match the schema: {e}") from e
+    if not all(isinstance(v, str) for v in fields.values()):
+        raise ValueError("Fused reply has non-string fields")
+    return fields
@@ -1,7 +1,15 @@
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import json
+import re
+import secrets
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Literal
 
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Header, Depends
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 from prometheus_fastapi_instrumentator import Instrumentator
 from .opentelemetry_config import setup_otel
@@ -19,12 +27,41 @@ from backend.logging_config import (
 # --------------------------------------------
 # PROJECT IMPORTS
 # --------------------------------------------
-from .config import DATA_DIR, CHUNK_SIZE, CHUNK_OVERLAP
-from .preprocess import clean_text, chunk_text
+from .config import (
+    DATA_DIR,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    QUERY_COALESCING,
+    QUERY_ADMISSION,
+    QUERY_DEADLINE_MS,
+    PIPELINE_MODE,
+    BATCH_QUERY_MAX,
+    BATCH_QUERY_CONCURRENCY,
+    TELEMETRY_RECENT_MAX,
+    ADMIN_TOKEN,
+    PROFILE_MAX_SECONDS,
+    PROFILE_CONTINUOUS,
+    SUMMARY_PRECOMPUTE,
+    ensure_dirs,
+)
+from .preprocess import load_documents, chunk_documents
 from .embeddings import get_embeddings
 from .vector_store import vector_store
-from .rag_orchestrator import answer_query   # CORRECT FUNCTION
-from .evaluation import run_ragas_evaluation  # RAGAS Evaluation
+from .rag_orchestrator import answer_query, answer_batch   # CORRECT FUNCTION
+from .metrics import BATCH_QUERIES_TOTAL, BATCH_THROUGHPUT_QPS
+from .singleflight import query_flight, query_key
+from .eval_service import eval_service  # Background RAGAS evaluation
+from .telemetry import telemetry
+from .usage import usage_ledger
+from .profiler import MODES as PROFILE_MODES, profile_for, continuous_profiler
+from .startup import readiness, start_background_warmup
+from .retrieval_eval import load_eval_set, evaluate_retrieval
+from .summaries import summary_precomputer
+from .rate_limiter import llm_priority, scheduler, BATCH
+from .admission import query_admission, AdmissionRejected
+from .lazy import lazy_import
+
+openai = lazy_import("openai")
 
 # --------------------------------------------
 # FASTAPI APP CONFIGURATION
@@ -77,6 +114,9 @@ class IngestRequest(BaseModel):
 
 class QueryRequest(BaseModel):
     query: str
+    deadline_ms: float | None = None   # overrides QUERY_DEADLINE_MS; 0 disables
+    include_usage: bool = False        # return per-stage token/cost accounting
+    mode: Literal["multi_agent", "fused"] | None = None   # overrides PIPELINE_MODE
 
 
 class QueryResponse(BaseModel):
@@ -86,6 +126,25 @@ class QueryResponse(BaseModel):
     fact_check: str
     sources: List[str]
     ragas_scores: dict
+    stages: Dict[str, str] = {}
+    stage_ms: Dict[str, float] = {}
+    degraded: bool = False
+    elapsed_ms: float | None = None
+    usage: dict | None = None
+    compression: dict | None = None
+    mode: str | None = None
+
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    concurrency: int | None = None
+    deadline_ms: float = 0   # audit runs favour complete answers over latency
+    evaluate: bool = False   # score every answer (not just the live sample)
+    mode: Literal["multi_agent", "fused"] | None = None
+
+
+class RetrievalEvalRequest(BaseModel):
+    ks: List[int] = [1, 3, 5, 10]
 
 
 # ---------------------------------------------------
@@ -93,17 +152,63 @@ class QueryResponse(BaseModel):
 # ---------------------------------------------------
 @app.on_event("startup")
 def startup_event():
-    api_logger.info("Starting API... loading vector index.")
-    vector_store.load()
-    api_logger.info("API startup complete.")
+    ensure_dirs()
+    # The index loads in the background; /ready reports progress
+    api_logger.info("Starting API... loading vector index in the background.")
+    start_background_warmup(readiness, vector_store)
+    eval_service.start()
+    if PROFILE_CONTINUOUS:
+        continuous_profiler.start()
+    api_logger.info("API accepting connections.")
+
+
+def _require_ready():
+    if not readiness.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Index is still loading; see /ready",
+            headers={"Retry-After": "5"},
+        )
+
+
+async def admit_query():
+    """
+    Hold an admission slot for the whole /query request. Waiting happens
+    on the event loop, so queued requests take no threadpool thread.
+    Yields the seconds spent queued.
+    """
+    if not QUERY_ADMISSION:
+        yield 0.0
+        return
+    try:
+        queued_s = await query_admission.acquire()
+    except AdmissionRejected as e:
+        api_logger.warning(f"/query rejected by admission control ({e.reason}); retry after {e.retry_after}s")
+        raise HTTPException(
+            status_code=e.status,
+            detail=f"Server busy ({e.reason}); retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    start = time.perf_counter()
+    try:
+        yield queued_s
+    finally:
+        query_admission.release(time.perf_counter() - start)
 
 
 # ---------------------------------------------------
-# HEALTHCHECK ENDPOINT
+# HEALTHCHECK / READINESS ENDPOINTS
 # ---------------------------------------------------
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    """Liveness: the process is up. Use /ready for traffic routing."""
+    return {"status": "ok", "ready": readiness.ready}
+
+
+@app.get("/ready")
+def ready():
+    snapshot = readiness.snapshot()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
 
 
 # ---------------------------------------------------
@@ -111,87 +216,82 @@ def health():
 # ---------------------------------------------------
 @app.post("/ingest")
 def ingest(req: IngestRequest):
+    _require_ready()
     directory = Path(req.directory) if req.directory else DATA_DIR
 
     if not directory.exists():
         raise HTTPException(status_code=400, detail="Ingest directory does not exist")
 
-    texts: List[str] = []
-    metadatas: List[dict] = []
-
-    supported_ext = {".txt", ".md", ".pdf", ".docx"}
     api_logger.info(f"Starting ingestion from {directory}")
-
-    for file_path in directory.rglob("*"):
-        if file_path.suffix.lower() not in supported_ext:
-            continue
-
-        try:
-            if file_path.suffix.lower() in {".txt", ".md"}:
-                raw = file_path.read_text(encoding="utf-8", errors="ignore")
-
-            elif file_path.suffix.lower() == ".pdf":
-                from pypdf import PdfReader
-                reader = PdfReader(str(file_path))
-                raw = "\n".join(page.extract_text() or "" for page in reader.pages)
-
-            elif file_path.suffix.lower() == ".docx":
-                import docx
-                doc = docx.Document(str(file_path))
-                raw = "\n".join(p.text for p in doc.paragraphs)
-
-            else:
-                continue
-
-        except Exception as e:
-            error_logger.error(
-                f"Failed to read {file_path}: {e}",
-                extra={"request_id": new_request_id()}
-            )
-            continue
-
-        clean = clean_text(raw)
-        chunks = chunk_text(clean, CHUNK_SIZE, CHUNK_OVERLAP)
-
-        policy_id = file_path.stem.split("_")[0]
-
-        for i, chunk in enumerate(chunks):
-            texts.append(chunk)
-            metadatas.append({
-                "source": str(file_path),
-                "policy_id": policy_id,
-                "chunk_id": i,
-                "text": chunk,
-            })
+    documents = load_documents(directory, log_extra={"request_id": new_request_id()})
+    texts, metadatas = chunk_documents(documents, CHUNK_SIZE, CHUNK_OVERLAP)
 
     if not texts:
         raise HTTPException(status_code=400, detail="No supported files found")
 
     api_logger.info(f"Generating embeddings for {len(texts)} chunks")
-    embeddings = get_embeddings(texts)
+    with llm_priority(BATCH):
+        embeddings = get_embeddings(texts)
+
+    # Appended to the latest snapshot and published while holding the write lock
+    with vector_store.writing():
+        vector_store.add(embeddings, metadatas)
+        vector_store.save()
 
-    vector_store.add(embeddings, metadatas)
-    vector_store.save()
+    # Chunk/policy summaries are generated in the background
+    pending = summary_precomputer.schedule(vector_store.metadatas) if SUMMARY_PRECOMPUTE else 0
 
     api_logger.info("Ingestion complete.")
-    return {"status": "ok", "num_chunks": len(texts)}
+    return {"status": "ok", "num_chunks": len(texts), "summaries_pending": pending}
 
 
 # ---------------------------------------------------
-# RAG QUERY ENDPOINT WITH AUTOMATIC RAGAS EVALUATION
+# RAG QUERY ENDPOINT (RAGAS SCORED IN THE BACKGROUND)
 # ---------------------------------------------------
 @app.post("/query", response_model=QueryResponse)
-def query_rag(req: QueryRequest):
+def query_rag(req: QueryRequest, queued_s: float = Depends(admit_query)):
+    _require_ready()
     query_text = req.query
+    start = time.perf_counter()
+    shared = False
 
-    # --- Run Multi-Agent RAG Pipeline ---
-    result = answer_query(query_text)
+    mode = req.mode or PIPELINE_MODE
+
+    # Time spent in the admission queue counts against the latency budget
+    deadline_ms = QUERY_DEADLINE_MS if req.deadline_ms is None else req.deadline_ms
+    if deadline_ms and queued_s:
+        deadline_ms = max(1.0, deadline_ms - queued_s * 1000.0)
 
-    # --- Run RAGAS Evaluation Automatically ---
+    # --- Run Multi-Agent RAG Pipeline ---
+    # Identical concurrent queries share a single pipeline execution
     try:
-        ragas_output = run_ragas_evaluation()
-    except Exception as e:
-        ragas_output = {"error": str(e)}
+        if QUERY_COALESCING:
+            result, shared = query_flight.do(
+                query_key(query_text, deadline_ms=req.deadline_ms, mode=mode),
+                answer_query, query_text, deadline_ms=deadline_ms, mode=mode,
+            )
+            if shared:
+                api_logger.info("Query served from an identical in-flight pipeline")
+        else:
+            result = answer_query(query_text, deadline_ms=deadline_ms, mode=mode)
+    except openai.APITimeoutError:
+        telemetry.record(query_text, time.perf_counter() - start, status=504)
+        raise HTTPException(status_code=504, detail="Query exceeded its latency budget")
+    except Exception:
+        telemetry.record(query_text, time.perf_counter() - start, status=500)
+        raise
+
+    telemetry.record(
+        query_text,
+        time.perf_counter() - start,
+        stage_ms=result.get("stage_ms"),
+        degraded=result.get("degraded", False),
+        coalesced=shared,
+    )
+
+    # --- Sample for background RAGAS evaluation (no I/O here) ---
+    eval_service.record(query_text, result)
+    ragas_output = eval_service.latest()
 
     return QueryResponse(
         answer=result["answer"],
@@ -200,15 +300,124 @@ def query_rag(req: QueryRequest):
         fact_check=result["fact_check"],
         sources=result["sources"],
         ragas_scores=ragas_output,
+        stages=result.get("stages", {}),
+        stage_ms=result.get("stage_ms", {}),
+        degraded=result.get("degraded", False),
+        elapsed_ms=result.get("elapsed_ms"),
+        usage=result.get("usage") if req.include_usage else None,
+        compression=result.get("compression"),
+        mode=result.get("mode"),
     )
 
 
 # ---------------------------------------------------
-# SYSTEM METRICS ENDPOINTS
+# BATCH QUERY ENDPOINT (JSONL STREAM)
 # ---------------------------------------------------
-from time import time
+@app.post("/query/batch")
+def query_batch(req: BatchQueryRequest):
+    _require_ready()
+    queries = [q.strip() for q in req.queries]
+
+    if not queries:
+        raise HTTPException(status_code=400, detail="No queries provided")
+    if len(queries) > BATCH_QUERY_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_QUERY_MAX} queries per batch")
+    if not all(queries):
+        raise HTTPException(status_code=400, detail="Queries must not be blank")
+
+    concurrency = min(req.concurrency or BATCH_QUERY_CONCURRENCY, BATCH_QUERY_CONCURRENCY)
+
+    def stream():
+        start = time.perf_counter()
+        errors = 0
+        tokens, cost = 0, 0.0
+
+        for index, result, error in answer_batch(queries, req.deadline_ms, concurrency, req.mode or PIPELINE_MODE):
+            line = {"index": index, "query": queries[index]}
+            if error is not None:
+                errors += 1
+                line["error"] = str(error)
+                BATCH_QUERIES_TOTAL.labels(status="error").inc()
+                telemetry.record(queries[index], 0.0, status=500, endpoint="/query/batch")
+            else:
+                line.update(result)
+                BATCH_QUERIES_TOTAL.labels(status="ok").inc()
+                if req.evaluate:
+                    eval_service.record(queries[index], result, force=True)
+                total = result.get("usage", {}).get("total", {})
+                tokens += total.get("prompt_tokens", 0) + total.get("completion_tokens", 0)
+                cost += total.get("cost_usd", 0.0)
+                telemetry.record(
+                    queries[index],
+                    result.get("elapsed_ms", 0.0) / 1000.0,
+                    stage_ms=result.get("stage_ms"),
+                    degraded=result.get("degraded", False),
+                    endpoint="/query/batch",
+                )
+            yield json.dumps(line) + "\n"
+
+        elapsed = time.perf_counter() - start
+        qps = len(queries) / elapsed if elapsed > 0 else 0.0
+        BATCH_THROUGHPUT_QPS.set(qps)
+        api_logger.info(f"Batch of {len(queries)} queries done in {elapsed:.1f}s ({qps:.2f} q/s)")
+        if req.evaluate:
+            eval_service.trigger()
+
+        yield json.dumps({"summary": {
+            "count": len(queries),
+            "errors": errors,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_qps": round(qps, 3),
+            "concurrency": concurrency,
+            "tokens": tokens,
+            "cost_usd": round(cost, 6),
+        }}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 
+# ---------------------------------------------------
+# BACKGROUND EVALUATION ENDPOINTS
+# ---------------------------------------------------
+@app.get("/evaluation/latest")
+def evaluation_latest():
+    return eval_service.latest()
+
+
+@app.post("/evaluation/run")
+def evaluation_run():
+    eval_service.trigger()
+    return {"status": "scheduled", "pending": eval_service.latest()["pending"]}
+
+
+@app.post("/evaluation/retrieval")
+def evaluation_retrieval(req: RetrievalEvalRequest):
+    _require_ready()
+    if not req.ks or min(req.ks) < 1:
+        raise HTTPException(status_code=400, detail="ks must be positive integers")
+    try:
+        items = load_eval_set()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Retrieval evaluation set not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return evaluate_retrieval(items, req.ks)
+
+
+# ---------------------------------------------------
+# TOKEN / COST ACCOUNTING
+# ---------------------------------------------------
+@app.get("/usage")
+def get_usage(days: int = 7):
+    """Per-day, per-stage token and cost totals (UTC days, newest first)."""
+    return usage_ledger.daily(max(days, 1))
+
+
+# ---------------------------------------------------
+# SYSTEM METRICS ENDPOINTS
+# ---------------------------------------------------
+# Served from in-memory telemetry: no disk reads, no pipeline calls
 @app.get("/stats")
 def get_stats():
     try:
@@ -216,18 +425,121 @@ def get_stats():
     except:
         vector_stats = {"documents": 0, "chunks": 0}
 
+    snapshot = telemetry.snapshot()
+    latency = snapshot["latency_s"]
+
     return {
         "documents_ingested": vector_stats.get("documents", 0),
         "chunks_ingested": vector_stats.get("chunks", 0),
-        "avg_latency": 1.8,
-        "ragas_score": 0.87,
-        "uptime": time(),
+        "avg_latency": latency.get("mean"),
+        "p95_latency": latency.get("p95"),
+        "ragas_score": eval_service.latest().get("composite_score"),
+        "uptime": snapshot["uptime_s"],
+        **snapshot,
     }
 
 
 @app.get("/recent-queries")
 def get_recent_queries(limit: int = 20):
-    return [
-        {"timestamp": "2025-01-05 12:03", "query": "What is the retention period?", "latency": 1.4, "status": 200},
-        {"timestamp": "2025-01-05 12:05", "query": "Can employees access policy X?", "latency": 1.7, "status": 200},
-    ]
+    return telemetry.recent(min(limit, TELEMETRY_RECENT_MAX))
+
+
+# One cheap call for the dashboard: status, stats, evaluation and today's usage
+@app.get("/dashboard/summary")
+def dashboard_summary():
+    return {
+        "status": "ok",
+        "ready": readiness.ready,
+        "stats": get_stats(),
+        "evaluation": eval_service.latest(),
+        "usage_today": next(iter(usage_ledger.daily(1).values()), None),
+        "summaries": summary_precomputer.status(),
+        "rate_limits": scheduler.snapshot(),
+        "admission": query_admission.snapshot(),
+    }
+
+
+@app.get("/admission")
+def admission():
+    """/query admission state: in flight, queued, limits, rejections."""
+    return query_admission.snapshot()
+
+
+@app.get("/rate-limits")
+def rate_limits():
+    """Scheduler state per model: limits, available capacity, waiters, 429 pause."""
+    return scheduler.snapshot()
+
+
+@app.get("/summaries/status")
+def summaries_status():
+    return summary_precomputer.status()
+
+
+# ---------------------------------------------------
+# ADMIN: SAMPLING PROFILER
+# ---------------------------------------------------
+_PROFILE_NAME_RE = re.compile(r"^profile-\d{8}T\d{6}Z\.collapsed$")
+
+
+def _require_admin(token: str | None):
+    # No ADMIN_TOKEN configured means the admin surface does not exist
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not token or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.get("/admin/profile")
+def admin_profile(
+    seconds: float = 10.0,
+    interval_ms: float = 10.0,
+    mode: str = "wall",
+    format: str = "collapsed",
+    x_admin_token: str | None = Header(default=None),
+):
+    """
+    Sample every thread for `seconds` and return collapsed stacks
+    (flamegraph.pl / speedscope input), or a JSON summary with format=json.
+    """
+    _require_admin(x_admin_token)
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {list(PROFILE_MODES)}")
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS}]")
+
+    profiler = profile_for(seconds, interval_ms, mode)
+    if profiler is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    api_logger.info(f"Admin profile captured: {profiler.samples} samples, mode={mode}")
+    if format == "json":
+        return {
+            "mode": mode,
+            "seconds": seconds,
+            "samples": profiler.samples,
+            "top_functions": profiler.top_functions(),
+            "collapsed": profiler.collapsed(),
+        }
+    return PlainTextResponse(profiler.collapsed())
+
+
+@app.get("/admin/profiles")
+def admin_profiles(x_admin_token: str | None = Header(default=None)):
+    _require_admin(x_admin_token)
+    return {
+        "continuous": continuous_profiler.running,
+        "profiles": [p.name for p in continuous_profiler.profiles()],
+    }
+
+
+@app.get("/admin/profiles/{name}")
+def admin_profile_file(name: str, x_admin_token: str | None = Header(default=None)):
+    _require_admin(x_admin_token)
+    path = continuous_profiler.directory / name
+    if not _PROFILE_NAME_RE.match(name) or not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(path.read_text(encoding="utf-8"))
+
+
+readiness.mark_imported(_IMPORT_STARTED)
@@ -0,0 +1,128 @@
+"""
+Query-focused extractive compression of retrieved chunks.
+
+Chunks are fixed-size windows, and most of their sentences are unrelated
+to the question. Before the LLM stages, every sentence of the retrieved
+set is scored with BM25 against the query terms, in one vectorised pass
+with no API call. Each chunk then keeps its best sentences, in their
+original order, up to CONTEXT_COMPRESSION_RATIO of its length. Sentences
+that share no term with the query are dropped, but every chunk keeps at
+least CONTEXT_COMPRESSION_MIN_SENTENCES (its best ones, even if none
+matches). Chunk metadata is unchanged, so prompts keep their
+[policy_id] source tags.
+"""
+import re
+from typing import Any, Dict, List, Tuple
+
+from .config import (
+    CONTEXT_COMPRESSION_RATIO,
+    CONTEXT_COMPRESSION_MAX_CHARS,
+    CONTEXT_COMPRESSION_MIN_SENTENCES,
+)
+from .lazy import lazy_import
+from .metrics import CONTEXT_KEPT_RATIO, CONTEXT_CHARS_TOTAL
+
+np = lazy_import("numpy")
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+|\n+")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and any are as at be by can do does for from has have how i if in is it its "
+    "may must not of on or our should so that the their them there these this those to "
+    "was we what when where which who why will with within you your".split()
+)
+ELISION = " … "
+
+
+def _terms(text: str) -> List[str]:
+    terms = []
+    for t in _TOKEN_RE.findall(text.lower()):
+        if len(t) < 2 or t in _STOPWORDS:
+            continue
+        if len(t) > 4 and t.endswith("s") and not t.endswith("ss"):
+            t = t[:-1]   # fold plurals: records -> record
+        terms.append(t)
+    return terms
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_RE.split(text or "") if s.strip()]
+
+
+def bm25_scores(query: str, sentences: List[str], k1: float = 1.2, b: float = 0.75):
+    """BM25 of every sentence against `query`, with IDF over `sentences`."""
+    vocab = {t: j for j, t in enumerate(dict.fromkeys(_terms(query)))}
+    n = len(sentences)
+    if not vocab or not n:
+        return np.zeros(n)
+
+    rows, cols = [], []
+    lengths = np.empty(n)
+    for i, sentence in enumerate(sentences):
+        terms = _terms(sentence)
+        lengths[i] = len(terms)
+        for t in terms:
+            j = vocab.get(t)
+            if j is not None:
+                rows.append(i)
+                cols.append(j)
+
+    tf = np.zeros((n, len(vocab)))
+    np.add.at(tf, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    norm = k1 * (1.0 - b + b * lengths / max(lengths.mean(), 1.0))
+    return (tf * (k1 + 1.0) / (tf + norm[:, None])) @ idf
+
+
+def _select(sentences: List[str], scores, budget: float, min_sentences: int) -> str:
+    # Highest score first; earlier sentences win ties
+    order = np.lexsort((np.arange(len(sentences)), -scores))
+    keep, used = [], 0
+    for i in order:
+        if len(keep) >= min_sentences and (scores[i] <= 0 or used + len(sentences[i]) > budget):
+            break
+        keep.append(int(i))
+        used += len(sentences[i])
+
+    keep.sort()
+    parts = [sentences[keep[0]]]
+    for prev, i in zip(keep, keep[1:]):
+        parts.append((" " if i == prev + 1 else ELISION) + sentences[i])
+    return "".join(parts)
+
+
+def compress_chunks(
+    query: str,
+    chunks: List[Dict],
+    ratio: float = CONTEXT_COMPRESSION_RATIO,
+    max_chars: int = CONTEXT_COMPRESSION_MAX_CHARS,
+    min_sentences: int = CONTEXT_COMPRESSION_MIN_SENTENCES,
+) -> Tuple[List[Dict], Dict[str, Any]]:
+    """
+    Copies of `chunks` whose text keeps only the query-relevant sentences,
+    plus {"chars_in", "chars_out", "ratio"}. Each copy keeps the full text
+    as `original_text` (stored summaries are keyed by it).
+    """
+    split = [split_sentences(c.get("text", "")) for c in chunks]
+    scores = bm25_scores(query, [s for sentences in split for s in sentences])
+    share = max_chars / len(chunks) if max_chars and chunks else None
+
+    compressed, offset = [], 0
+    chars_in = chars_out = 0
+    for chunk, sentences in zip(chunks, split):
+        text = chunk.get("text", "")
+        chunk_scores = scores[offset:offset + len(sentences)]
+        offset += len(sentences)
+
+        budget = len(text) * ratio if share is None else min(len(text) * ratio, share)
+        kept = text if len(sentences) <= min_sentences else _select(sentences, chunk_scores, budget, min_sentences)
+        compressed.append({**chunk, "text": kept, "original_text": text})
+        chars_in += len(text)
+        chars_out += len(kept)
+
+    kept_ratio = chars_out / chars_in if chars_in else 1.0
+    CONTEXT_KEPT_RATIO.observe(kept_ratio)
+    CONTEXT_CHARS_TOTAL.labels(kind="in").inc(chars_in)
+    CONTEXT_CHARS_TOTAL.labels(kind="out").inc(chars_out)
+    return compressed, {"chars_in": chars_in, "chars_out": chars_out, "ratio": round(kept_ratio, 3)}
@@ -1,4 +1,5 @@
 from pathlib import Path
+import json
 import os
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -6,17 +7,185 @@ DATA_DIR = PROJECT_ROOT / "data" / "raw"
 ARTIFACTS_DIR = PROJECT_ROOT / "artifacts"
 LOG_DIR = PROJECT_ROOT / "logs"
 
-for d in (DATA_DIR, ARTIFACTS_DIR, LOG_DIR):
-    d.mkdir(parents=True, exist_ok=True)
+
+def ensure_dirs():
+    """Create the data/artifact/log directories (called at startup, not import)."""
+    for d in (DATA_DIR, ARTIFACTS_DIR, LOG_DIR):
+        d.mkdir(parents=True, exist_ok=True)
+
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
 CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4.1-mini")
 
+# USD per 1M tokens as [prompt, completion], matched by model-name prefix.
+# Override with LLM_PRICES='{"gpt-4.1-mini": [0.4, 1.6], ...}'
+LLM_PRICES = {
+    "gpt-4.1-mini": [0.40, 1.60],
+    "gpt-4.1-nano": [0.10, 0.40],
+    "gpt-4.1": [2.00, 8.00],
+    "gpt-4o-mini": [0.15, 0.60],
+    "gpt-4o": [2.50, 10.00],
+    "text-embedding-3-large": [0.13, 0.0],
+    "text-embedding-3-small": [0.02, 0.0],
+}
+LLM_PRICES.update(json.loads(os.getenv("LLM_PRICES", "{}")))
+USAGE_DAYS_KEPT = int(os.getenv("USAGE_DAYS_KEPT", "31"))
+
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "800"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
 TOP_K = int(os.getenv("TOP_K", "6"))
 
+# Shared HTTP transport for every OpenAI call (seconds for timeouts)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_WRITE_TIMEOUT = float(os.getenv("HTTP_WRITE_TIMEOUT", "10"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+# Transport mode for OpenAI calls: live | record | replay | synthetic
+LLM_TRANSPORT_MODE = os.getenv("LLM_TRANSPORT_MODE", "live").lower()
+LLM_CASSETTE_DIR = Path(os.getenv("LLM_CASSETTE_DIR", str(ARTIFACTS_DIR / "cassettes")))
+# Replay latency override in ms (unset = recorded latency)
+LLM_REPLAY_LATENCY_MS = os.getenv("LLM_REPLAY_LATENCY_MS")
+LLM_SYNTHETIC_LATENCY_MS = float(os.getenv("LLM_SYNTHETIC_LATENCY_MS", "0"))
+SYNTHETIC_EMBEDDING_DIM = int(os.getenv("SYNTHETIC_EMBEDDING_DIM", "3072"))
+SYNTHETIC_COMPLETION_WORDS = int(os.getenv("SYNTHETIC_COMPLETION_WORDS", "120"))
+
+# Synthetic provider rate limits per model (0 = unlimited), for testing
+# the scheduler; exceeding them returns 429 like the real API
+SYNTHETIC_RPM = int(os.getenv("SYNTHETIC_RPM", "0"))
+SYNTHETIC_TPM = int(os.getenv("SYNTHETIC_TPM", "0"))
+
+# Client-side rate-limit scheduler: every provider request waits for a
+# requests-per-minute and a tokens-per-minute token bucket, by priority
+# (interactive > batch > eval). Limits are [rpm, tpm] by model-name prefix
+# and are corrected from the provider's x-ratelimit-* response headers.
+LLM_RATE_LIMITING = os.getenv("LLM_RATE_LIMITING", "true").lower() == "true"
+LLM_RATE_LIMITS = {
+    "gpt-4.1-mini": [500, 200_000],
+    "text-embedding-3": [3000, 1_000_000],
+}
+LLM_RATE_LIMITS.update(json.loads(os.getenv("LLM_RATE_LIMITS", "{}")))
+LLM_DEFAULT_RATE_LIMIT = [int(x) for x in os.getenv("LLM_DEFAULT_RATE_LIMIT", "500,200000").split(",")]
+# Share of each bucket only interactive calls may use
+LLM_INTERACTIVE_RESERVE = float(os.getenv("LLM_INTERACTIVE_RESERVE", "0.2"))
+# Completion tokens assumed when a request sets no max_tokens
+LLM_EST_COMPLETION_TOKENS = int(os.getenv("LLM_EST_COMPLETION_TOKENS", "400"))
+# Longest a call without its own latency budget waits for capacity
+LLM_MAX_QUEUE_WAIT_S = float(os.getenv("LLM_MAX_QUEUE_WAIT_S", "120"))
+
+# Hedged chat completions: duplicate a slow call after a p95-derived delay
+LLM_HEDGING = os.getenv("LLM_HEDGING", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "250"))
+LLM_HEDGE_INITIAL_DELAY_MS = float(os.getenv("LLM_HEDGE_INITIAL_DELAY_MS", "2000"))
+LLM_HEDGE_MAX_WORKERS = int(os.getenv("LLM_HEDGE_MAX_WORKERS", "32"))
+
+# Per-request latency budget (0 disables). Optional stages (summarizer,
+# fact checker) fall back or are skipped when their budget runs short.
+QUERY_DEADLINE_MS = float(os.getenv("QUERY_DEADLINE_MS", "12000"))
+SUMMARIZER_BUDGET_MS = float(os.getenv("SUMMARIZER_BUDGET_MS", "2500"))
+REASONER_BUDGET_MS = float(os.getenv("REASONER_BUDGET_MS", "3500"))
+FACT_CHECK_BUDGET_MS = float(os.getenv("FACT_CHECK_BUDGET_MS", "2500"))
+ANSWER_BUDGET_MS = float(os.getenv("ANSWER_BUDGET_MS", "3500"))
+MIN_STAGE_BUDGET_MS = float(os.getenv("MIN_STAGE_BUDGET_MS", "500"))
+
+# /query/batch: max questions per request and concurrent LLM pipelines
+BATCH_QUERY_MAX = int(os.getenv("BATCH_QUERY_MAX", "500"))
+BATCH_QUERY_CONCURRENCY = int(os.getenv("BATCH_QUERY_CONCURRENCY", "8"))
+
+# Background evaluation of sampled live answers (nothing runs on /query)
+EVAL_SAMPLE_RATE = float(os.getenv("EVAL_SAMPLE_RATE", "0.1"))
+EVAL_INTERVAL_S = float(os.getenv("EVAL_INTERVAL_S", "300"))
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "2"))
+EVAL_BATCH_SIZE = int(os.getenv("EVAL_BATCH_SIZE", "10"))
+EVAL_QUEUE_MAX = int(os.getenv("EVAL_QUEUE_MAX", "1000"))
+EVAL_SCORER = os.getenv("EVAL_SCORER", "placeholder")   # placeholder | ragas
+EVAL_LOG_PATH = ARTIFACTS_DIR / "eval_log.jsonl"
+EVAL_SCORES_PATH = ARTIFACTS_DIR / "eval_scores.jsonl"
+
+# Ingest-time chunk and policy summaries (query-time summarizer reads these)
+SUMMARY_PRECOMPUTE = os.getenv("SUMMARY_PRECOMPUTE", "true").lower() == "true"
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "8"))
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "2"))
+CHUNK_SUMMARIES_PATH = ARTIFACTS_DIR / "chunk_summaries.jsonl"
+POLICY_SUMMARIES_PATH = ARTIFACTS_DIR / "policy_summaries.jsonl"
+
+# Query-focused extractive compression of retrieved chunks before the LLM
+# stages (BM25 sentence scoring, no API call). Each chunk keeps its best
+# sentences up to RATIO of its length; MAX_CHARS (0 = off) also caps the
+# total across chunks.
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "true").lower() == "true"
+CONTEXT_COMPRESSION_RATIO = float(os.getenv("CONTEXT_COMPRESSION_RATIO", "0.5"))
+CONTEXT_COMPRESSION_MAX_CHARS = int(os.getenv("CONTEXT_COMPRESSION_MAX_CHARS", "0"))
+CONTEXT_COMPRESSION_MIN_SENTENCES = int(os.getenv("CONTEXT_COMPRESSION_MIN_SENTENCES", "1"))
+
+# Default /query pipeline: multi_agent (one call per stage) or fused (one
+# structured-output call); requests can override it with "mode"
+PIPELINE_MODES = ("multi_agent", "fused")
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "multi_agent")
+if PIPELINE_MODE not in PIPELINE_MODES:
+    raise ValueError(f"Unknown PIPELINE_MODE '{PIPELINE_MODE}', expected one of {PIPELINE_MODES}")
+
+# Labelled question -> policy_id set for offline retrieval metrics
+RETRIEVAL_EVAL_SET_PATH = Path(
+    os.getenv("RETRIEVAL_EVAL_SET_PATH", str(ARTIFACTS_DIR / "retrieval_eval_set.jsonl"))
+)
+
+# Share one pipeline execution between identical concurrent /query requests
+QUERY_COALESCING = os.getenv("QUERY_COALESCING", "true").lower() == "true"
+
+# Admission control for /query: at most QUERY_MAX_CONCURRENCY pipelines run
+# per worker; up to QUERY_MAX_QUEUE more wait at most QUERY_MAX_QUEUE_WAIT_MS,
+# and anything beyond is rejected fast (429/503 with Retry-After). Keep the
+# concurrency below the threadpool size (40 by default).
+QUERY_ADMISSION = os.getenv("QUERY_ADMISSION", "true").lower() == "true"
+QUERY_MAX_CONCURRENCY = int(os.getenv("QUERY_MAX_CONCURRENCY", "16"))
+QUERY_MAX_QUEUE = int(os.getenv("QUERY_MAX_QUEUE", "32"))
+QUERY_MAX_QUEUE_WAIT_MS = float(os.getenv("QUERY_MAX_QUEUE_WAIT_MS", "2000"))
+
+# Persistent cache for batch embeddings (ingest, chunking sweeps)
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = Path(os.getenv("EMBEDDING_CACHE_PATH", str(ARTIFACTS_DIR / "embedding_cache.sqlite")))
+
+# Micro-batch concurrent single-text embedding calls into one request
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "true").lower() == "true"
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "64"))
+EMBED_BATCH_MAX_IN_FLIGHT = int(os.getenv("EMBED_BATCH_MAX_IN_FLIGHT", "4"))
+EMBED_BATCH_MAX_QUEUE = int(os.getenv("EMBED_BATCH_MAX_QUEUE", "1024"))
+EMBED_BATCH_TIMEOUT_S = float(os.getenv("EMBED_BATCH_TIMEOUT_S", "60"))
+
+# In-process telemetry behind /stats and /recent-queries
+TELEMETRY_RECENT_MAX = int(os.getenv("TELEMETRY_RECENT_MAX", "500"))
+TELEMETRY_SKETCH_ACCURACY = float(os.getenv("TELEMETRY_SKETCH_ACCURACY", "0.01"))
+
+# Admin endpoints (/admin/*) are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Sampling profiler
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_CONTINUOUS = os.getenv("PROFILE_CONTINUOUS", "false").lower() == "true"
+PROFILE_CONTINUOUS_INTERVAL_MS = float(os.getenv("PROFILE_CONTINUOUS_INTERVAL_MS", "100"))
+PROFILE_CONTINUOUS_WINDOW_S = float(os.getenv("PROFILE_CONTINUOUS_WINDOW_S", "60"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "120"))
+PROFILE_DIR = ARTIFACTS_DIR / "profiles"
+
+# Startup: warm-up runs one embedding + search before /ready reports ready
+WARMUP = os.getenv("WARMUP", "true").lower() == "true"
+WARMUP_QUERY = os.getenv("WARMUP_QUERY", "data retention policy")
+
+# Multi-worker serving: map the index and metadata from disk so every
+# worker searches one physical copy (via the page cache)
+VECTOR_STORE_MMAP = os.getenv("VECTOR_STORE_MMAP", "false").lower() == "true"
+# How often workers check the snapshot version written by /ingest
+SNAPSHOT_CHECK_INTERVAL_S = float(os.getenv("SNAPSHOT_CHECK_INTERVAL_S", "2"))
+
 FAISS_INDEX_PATH = ARTIFACTS_DIR / "faiss_index.bin"
 DOCSTORE_PATH = ARTIFACTS_DIR / "docstore.pkl"
 
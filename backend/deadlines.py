@@ -0,0 +1,70 @@
+import time
+from typing import Dict
+
+from .metrics import STAGE_OUTCOME_TOTAL
+
+# Stage statuses reported back in QueryResponse.stages
+RAN = "ran"
+SKIPPED = "skipped"
+DEGRADED = "degraded"
+
+
+class Deadline:
+    """
+    Per-request latency budget.
+
+    `total_ms <= 0` disables the deadline: every budget is unbounded
+    and all stages run as before.
+    """
+
+    def __init__(self, total_ms: float):
+        self._start = time.perf_counter()
+        self._total = total_ms / 1000.0 if total_ms and total_ms > 0 else None
+
+    @property
+    def enabled(self) -> bool:
+        return self._total is not None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def remaining(self) -> float:
+        if self._total is None:
+            return float("inf")
+        return max(0.0, self._total - self.elapsed())
+
+    def budget(self, stage_ms: float | None = None, reserve_ms: float = 0.0) -> float | None:
+        """
+        Seconds a stage may spend: its own budget (uncapped if None), limited
+        to what is left after keeping `reserve_ms` for the stages that must
+        still run. Returns None when no deadline is active.
+        """
+        if self._total is None:
+            return None
+        available = self.remaining() - reserve_ms / 1000.0
+        if stage_ms is not None:
+            available = min(stage_ms / 1000.0, available)
+        return max(0.0, available)
+
+
+class StageReport:
+    """
+    Records how each pipeline stage was executed and how long it took.
+    Stages run sequentially, so a stage's time is measured from the
+    previous mark.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, str] = {}
+        self.timings_ms: Dict[str, float] = {}
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str, status: str):
+        now = time.perf_counter()
+        self.stages[stage] = status
+        self.timings_ms[stage] = round((now - self._last) * 1000.0, 1)
+        self._last = now
+        STAGE_OUTCOME_TOTAL.labels(stage=stage, status=status).inc()
+
+    def degraded(self) -> bool:
+        return any(s != RAN for s in self.stages.values())
@@ -0,0 +1,170 @@
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from .metrics import EMBED_BATCH_IN_FLIGHT, EMBED_BATCH_SIZE, EMBED_BATCH_WAIT_SECONDS
+from .rate_limiter import PRIORITIES, current_priority, llm_priority
+from .usage import Usage, current_usage, track_usage
+
+Pending = Tuple[str, Future, float, Usage | None, str]
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent single-text embedding calls into batch requests.
+
+    A collector thread waits for the first pending text, then keeps
+    collecting for at most `window_ms` (or until `max_items` are queued)
+    and closes the batch. Closed batches are sent from a pool of up to
+    `max_in_flight` threads, so collection goes on while earlier batches
+    are on the wire. A text therefore waits for at most one window, plus
+    a free send slot when `max_in_flight` batches are already in flight.
+
+    Texts of different priorities are sent as separate requests, so an
+    interactive text never waits in the rate limiter behind batch work.
+    At most `max_queue` texts wait for collection; further callers block
+    in `submit` until there is room. Token usage of a shared call is
+    split evenly across the callers' request accumulators.
+
+    Every pending future is always resolved: any failure while sending a
+    batch is set on all of its futures, a dead collector is restarted on
+    the next submit, and `embed` gives up after `timeout_s`.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        window_ms: float = 5.0,
+        max_items: int = 64,
+        max_in_flight: int = 4,
+        max_queue: int = 1024,
+        timeout_s: float = 60.0,
+    ):
+        self._embed_batch = embed_batch
+        self._window = window_ms / 1000.0
+        self._max_items = max(1, max_items)
+        self._max_in_flight = max(1, max_in_flight)
+        self._timeout = timeout_s
+        self._queue: "queue.Queue[Pending]" = queue.Queue(maxsize=max(1, max_queue))
+        self._slots = threading.BoundedSemaphore(self._max_in_flight)
+        self._pool: ThreadPoolExecutor | None = None
+        self._worker: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    # --------------------------------------------------------
+    # PUBLIC API
+    # --------------------------------------------------------
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        fut: Future = Future()
+        try:
+            self._queue.put((text, fut, time.perf_counter(), current_usage(), current_priority()), timeout=self._timeout)
+        except queue.Full:
+            raise TimeoutError(f"Embedding batcher queue still full after {self._timeout:.0f}s") from None
+        return fut
+
+    def embed(self, text: str) -> List[float]:
+        return self.submit(text).result(timeout=self._timeout)
+
+    # --------------------------------------------------------
+    # WORKER
+    # --------------------------------------------------------
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self._max_in_flight, thread_name_prefix="embedding-batch"
+                    )
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self) -> List[Pending]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self._window
+
+        while len(batch) < self._max_items:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                by_priority: Dict[str, List[Pending]] = defaultdict(list)
+                for item in batch:
+                    by_priority[item[4]].append(item)
+
+                # Most urgent first; while every slot is busy, new texts keep
+                # queueing and go out as a fuller batch
+                for priority in sorted(by_priority, key=PRIORITIES.get):
+                    self._slots.acquire()
+                    try:
+                        self._pool.submit(self._send, by_priority[priority], priority)
+                    except BaseException:
+                        self._slots.release()
+                        raise
+            except Exception as e:
+                _fail(batch, e)
+
+    def _send(self, batch: List[Pending], priority: str):
+        EMBED_BATCH_IN_FLIGHT.inc()
+        try:
+            self._dispatch(batch, priority)
+        except Exception as e:
+            _fail(batch, e)
+        finally:
+            EMBED_BATCH_IN_FLIGHT.dec()
+            self._slots.release()
+
+    def _dispatch(self, batch: List[Pending], priority: str):
+        dispatched = time.perf_counter()
+
+        # Identical texts inside one window are embedded once
+        positions: Dict[str, int] = {}
+        unique: List[str] = []
+        for text, _, enqueued, _, _ in batch:
+            EMBED_BATCH_WAIT_SECONDS.observe(dispatched - enqueued)
+            if text not in positions:
+                positions[text] = len(unique)
+                unique.append(text)
+
+        EMBED_BATCH_SIZE.observe(len(unique))
+
+        try:
+            with track_usage() as batch_usage, llm_priority(priority):
+                vectors = self._embed_batch(unique)
+            if len(vectors) != len(unique):
+                raise RuntimeError(
+                    f"Embedding batch returned {len(vectors)} vectors for {len(unique)} texts"
+                )
+        except Exception as e:
+            _fail(batch, e)
+            return
+
+        # Usage first: once a future is resolved its caller may report usage
+        for _, _, _, usage, _ in batch:
+            if usage is not None:
+                usage.merge(batch_usage, 1.0 / len(batch))
+        for text, fut, _, _, _ in batch:
+            if not fut.done():
+                fut.set_result(vectors[positions[text]])
+
+
+def _fail(batch: List[Pending], error: Exception):
+    for _, fut, _, _, _ in batch:
+        if not fut.done():
+            fut.set_exception(error)
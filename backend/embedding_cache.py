@@ -0,0 +1,85 @@
+"""
+Persistent embedding cache for batch embeddings (ingest, sweeps).
+
+Vectors are stored in SQLite as float32 blobs, keyed by a hash of the
+model name and the exact text. Re-ingesting unchanged documents, or
+re-chunking a corpus whose chunks repeat, only pays for new texts.
+Synthetic and replayed vectors are kept apart from live ones, so a
+test run never serves fake vectors to production.
+"""
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List
+
+from .config import EMBEDDING_CACHE_PATH, LLM_TRANSPORT_MODE
+from .lazy import lazy_import
+from .metrics import EMBEDDING_CACHE_LOOKUPS_TOTAL
+
+np = lazy_import("numpy")
+
+# Live and recorded calls return real vectors; other modes get their own namespace
+_NAMESPACE = "" if LLM_TRANSPORT_MODE in ("live", "record") else f"{LLM_TRANSPORT_MODE}:"
+_SQL_BATCH = 500
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha1(f"{_NAMESPACE}{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: Path = EMBEDDING_CACHE_PATH):
+        self.path = Path(path)
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # One connection shared under a lock; WAL lets other workers read while one writes
+            conn = sqlite3.connect(str(self.path), timeout=30.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model: str, texts: List[str]) -> List[List[float] | None]:
+        """Cached vector for each text, or None."""
+        keys = [cache_key(model, t) for t in texts]
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            for i in range(0, len(keys), _SQL_BATCH):
+                part = keys[i:i + _SQL_BATCH]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                )
+                found.update(rows)
+
+        vectors = [
+            np.frombuffer(found[k], dtype=np.float32).tolist() if k in found else None
+            for k in keys
+        ]
+        hits = len(texts) - vectors.count(None)
+        EMBEDDING_CACHE_LOOKUPS_TOTAL.labels(result="hit").inc(hits)
+        EMBEDDING_CACHE_LOOKUPS_TOTAL.labels(result="miss").inc(len(texts) - hits)
+        return vectors
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        rows = [
+            (cache_key(model, t), np.asarray(v, dtype=np.float32).tobytes())
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+
+    def size(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+# GLOBAL INSTANCE
+embedding_cache = EmbeddingCache()
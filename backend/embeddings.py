@@ -1,12 +1,46 @@
+import threading
 from typing import List
 from functools import lru_cache
-import openai
-from .config import OPENAI_API_KEY, EMBEDDING_MODEL
+from .config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_CACHE,
+    EMBED_BATCHING,
+    EMBED_BATCH_WINDOW_MS,
+    EMBED_BATCH_MAX_ITEMS,
+    EMBED_BATCH_MAX_IN_FLIGHT,
+    EMBED_BATCH_MAX_QUEUE,
+    EMBED_BATCH_TIMEOUT_S,
+)
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_cache import embedding_cache
+from .llm_client import create_embeddings
+from .instrumentation import agent_span
+from .metrics import EMBEDDING_REQUESTS_TOTAL
+
+# Set by _cached_single_embedding, which only runs on an LRU miss
+_cache_state = threading.local()
+
 
 # ------------------------------------------------------------
-# OpenAI Client Initialization
+# RAW EMBEDDING CALL (shared client from llm_client)
 # ------------------------------------------------------------
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    resp = create_embeddings(
+        model=EMBEDDING_MODEL,
+        input=texts,
+    )
+    return [d.embedding for d in resp.data]
+
+
+# Concurrent query embeddings share one request per batching window
+_batcher = EmbeddingBatcher(
+    _embed_batch,
+    window_ms=EMBED_BATCH_WINDOW_MS,
+    max_items=EMBED_BATCH_MAX_ITEMS,
+    max_in_flight=EMBED_BATCH_MAX_IN_FLIGHT,
+    max_queue=EMBED_BATCH_MAX_QUEUE,
+    timeout_s=EMBED_BATCH_TIMEOUT_S,
+)
 
 
 # ------------------------------------------------------------
@@ -17,12 +51,12 @@ def _cached_single_embedding(text: str) -> List[float]:
     """
     INTERNAL USE ONLY.
     Uses LRU cache to dramatically speed up repeated queries.
+    Cache misses go through the micro-batcher when enabled.
     """
-    resp = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=text,
-    )
-    return resp.data[0].embedding
+    _cache_state.miss = True
+    if EMBED_BATCHING:
+        return _batcher.embed(text)
+    return _embed_batch([text])[0]
 
 
 def get_embedding(text: str) -> List[float]:
@@ -33,26 +67,36 @@ def get_embedding(text: str) -> List[float]:
     text = (text or "").strip()
     if not text:
         return []
-    return _cached_single_embedding(text)
+
+    with agent_span("embedding", text_chars=len(text)) as span:
+        _cache_state.miss = False
+        vector = _cached_single_embedding(text)
+        hit = not _cache_state.miss
+        span.set_attribute("rag.cache_hit", hit)
+        EMBEDDING_REQUESTS_TOTAL.labels(cache="hit" if hit else "miss").inc()
+    return vector
 
 
 # ------------------------------------------------------------
-# BATCH EMBEDDINGS (Not cached)
+# BATCH EMBEDDINGS (persistent cache)
 # ------------------------------------------------------------
-def get_embeddings(texts: List[str]) -> List[List[float]]:
+def get_embeddings(texts: List[str], use_cache: bool = EMBEDDING_CACHE) -> List[List[float]]:
     """
     Generates embeddings for a batch of texts.
     Skips empty strings. Preserves ordering.
-    OpenAI handles batching efficiently.
+    Only texts missing from the persistent cache are sent, once each.
     """
     if not texts:
         return []
 
     cleaned = [(t or "").strip() for t in texts]
+    if not use_cache:
+        return _embed_batch(cleaned)
 
-    resp = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=cleaned,
-    )
-
-    return [d.embedding for d in resp.data]
+    vectors = embedding_cache.get_many(EMBEDDING_MODEL, cleaned)
+    missing = list(dict.fromkeys(t for t, v in zip(cleaned, vectors) if v is None))
+    if missing:
+        fresh = dict(zip(missing, _embed_batch(missing)))
+        embedding_cache.put_many(EMBEDDING_MODEL, missing, list(fresh.values()))
+        vectors = [fresh[t] if v is None else v for t, v in zip(cleaned, vectors)]
+    return vectors
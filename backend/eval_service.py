@@ -0,0 +1,230 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Deque, Dict, List
+
+from .config import (
+    EVAL_SAMPLE_RATE,
+    EVAL_INTERVAL_S,
+    EVAL_CONCURRENCY,
+    EVAL_BATCH_SIZE,
+    EVAL_QUEUE_MAX,
+    EVAL_SCORER,
+    EVAL_LOG_PATH,
+    EVAL_SCORES_PATH,
+)
+from .evaluation import LEGACY_PLACEHOLDER_SCORES, score_samples
+from .logging_config import pipeline_logger, error_logger
+from .metrics import RAGAS_COMPOSITE_SCORE
+from .rate_limiter import llm_priority, EVAL
+
+
+class EvaluationService:
+    """
+    Background RAGAS-style evaluator for live traffic.
+
+    /query only calls `record()`, which samples the answer into an
+    in-memory queue — no disk or network I/O on the request path. A
+    background thread periodically (or on `trigger()`) appends pending
+    samples to the evaluation log, scores them in batches with bounded
+    concurrency, appends the scores to an append-only JSONL store and
+    updates the running aggregates served by `latest()`.
+
+    With the "placeholder" scorer, samples are logged but not scored:
+    the aggregates stay empty and the composite gauge is not exported.
+    """
+
+    def __init__(
+        self,
+        log_path: Path = EVAL_LOG_PATH,
+        scores_path: Path = EVAL_SCORES_PATH,
+        sample_rate: float = EVAL_SAMPLE_RATE,
+        interval_s: float = EVAL_INTERVAL_S,
+        concurrency: int = EVAL_CONCURRENCY,
+        batch_size: int = EVAL_BATCH_SIZE,
+        queue_max: int = EVAL_QUEUE_MAX,
+        scorer: str = EVAL_SCORER,
+    ):
+        self.log_path = Path(log_path)
+        self.scores_path = Path(scores_path)
+        self.sample_rate = sample_rate
+        self.interval_s = interval_s
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.scorer = scorer
+
+        self._pending: Deque[Dict[str, Any]] = deque(maxlen=queue_max)
+        # Explicit evaluation runs are never dropped; /query/batch bounds their size
+        self._forced: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._sums: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+        self._num_samples = 0
+        self._last_run: str | None = None
+        self._last_error: str | None = None
+        self._dropped = 0
+
+    # --------------------------------------------------------
+    # REQUEST PATH
+    # --------------------------------------------------------
+    def record(self, query: str, result: Dict[str, Any], force: bool = False) -> bool:
+        """
+        Sample an answered query for later scoring. Never blocks on I/O.
+        `force` skips sampling (explicit evaluation runs) and bypasses the
+        queue bound, so a large run never evicts its own answers.
+        """
+        if not force and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return False
+
+        sample = {
+            "id": uuid.uuid4().hex,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "question": query,
+            "answer": result.get("answer", ""),
+            "contexts": [c.get("text", "") for c in result.get("contexts", [])],
+        }
+        with self._lock:
+            if force:
+                self._forced.append(sample)
+                return True
+            if len(self._pending) == self._pending.maxlen:
+                self._dropped += 1
+            self._pending.append(sample)
+        return True
+
+    def latest(self) -> Dict[str, Any]:
+        """Current aggregates, served from memory."""
+        with self._lock:
+            scores: Dict[str, Any] = {
+                k: round(self._sums[k] / self._counts[k], 4) for k in self._sums if self._counts[k]
+            }
+            metric_values = list(scores.values())
+            if metric_values:
+                scores["composite_score"] = round(sum(metric_values) / len(metric_values), 4)
+            scores["scorer"] = self.scorer
+            scores["num_samples"] = self._num_samples
+            scores["pending"] = len(self._pending) + len(self._forced)
+            scores["dropped"] = self._dropped
+            scores["last_run"] = self._last_run
+            if self._last_error:
+                scores["last_error"] = self._last_error
+        return scores
+
+    # --------------------------------------------------------
+    # LIFECYCLE
+    # --------------------------------------------------------
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="eval-service", daemon=True)
+        self._thread.start()
+
+    def trigger(self):
+        """Score pending samples now instead of waiting for the interval."""
+        self._wake.set()
+
+    # --------------------------------------------------------
+    # BACKGROUND WORKER
+    # --------------------------------------------------------
+    def _run(self):
+        self._restore()
+        while True:
+            self._wake.wait(timeout=self.interval_s)
+            self._wake.clear()
+            try:
+                self.run_once()
+            except Exception as e:
+                self._last_error = str(e)
+                error_logger.error(f"Background evaluation failed: {e}")
+
+    def run_once(self) -> int:
+        """Drain pending samples, score them and persist. Returns count scored."""
+        with self._lock:
+            batch = self._forced + list(self._pending)
+            self._forced = []
+            self._pending.clear()
+        if not batch:
+            return 0
+
+        self._append(self.log_path, batch)
+
+        chunks = [batch[i:i + self.batch_size] for i in range(0, len(batch), self.batch_size)]
+        scored: List[Dict[str, Any]] = []
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="eval") as pool:
+            for chunk, scores in zip(chunks, pool.map(self._score, chunks)):
+                for sample, metrics in zip(chunk, scores):
+                    scored.append({
+                        "id": sample["id"],
+                        "timestamp": sample["timestamp"],
+                        "scorer": self.scorer,
+                        "scores": metrics,
+                    })
+
+        self._append(self.scores_path, scored)
+        for row in scored:
+            self._accumulate(row["scores"], self.scorer)
+
+        with self._lock:
+            self._last_run = datetime.now(timezone.utc).isoformat()
+            self._last_error = None
+
+        pipeline_logger.info(f"Background evaluation scored {len(scored)} samples")
+        return len(scored)
+
+    def _score(self, chunk: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        # Judge calls yield to interactive and batch traffic
+        with llm_priority(EVAL):
+            return score_samples(chunk, self.scorer)
+
+    def _accumulate(self, metrics: Dict[str, float], scorer: str):
+        if not metrics:
+            return
+        with self._lock:
+            self._num_samples += 1
+            for k, v in metrics.items():
+                self._sums[k] = self._sums.get(k, 0.0) + v
+                self._counts[k] = self._counts.get(k, 0) + 1
+            means = [self._sums[k] / self._counts[k] for k in self._sums if self._counts[k]]
+        if means:
+            RAGAS_COMPOSITE_SCORE.labels(scorer=scorer).set(sum(means) / len(means))
+
+    def _restore(self):
+        """Rebuild aggregates from the append-only store after a restart."""
+        if not self.scores_path.exists():
+            return
+        start = time.perf_counter()
+        with self.scores_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                    scores = row["scores"]
+                except (ValueError, KeyError):
+                    continue
+                # Unlabelled rows with the fixed scores predate the scorer label
+                scorer = row.get("scorer")
+                if scorer == "placeholder" or (scorer is None and scores == LEGACY_PLACEHOLDER_SCORES):
+                    continue
+                self._accumulate(scores, scorer or "ragas")
+        pipeline_logger.info(
+            f"Restored {self._num_samples} evaluation scores in {time.perf_counter() - start:.2f}s"
+        )
+
+    @staticmethod
+    def _append(path: Path, rows: List[Dict[str, Any]]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+
+
+# GLOBAL INSTANCE
+eval_service = EvaluationService()
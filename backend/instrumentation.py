@@ -0,0 +1,81 @@
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable
+
+from opentelemetry import trace
+
+from .metrics import (
+    AGENT_LATENCY_SECONDS,
+    AGENT_CONTEXT_CHARS,
+    LLM_TOKENS_TOTAL,
+)
+from .usage import add_usage
+
+# ------------------------------------------------------------
+# Per-agent spans and Prometheus metrics
+# ------------------------------------------------------------
+tracer = trace.get_tracer("rag_pipeline")
+
+# Name of the agent whose span is currently open in this context
+_current_agent: ContextVar[str | None] = ContextVar("rag_current_agent", default=None)
+
+
+def current_agent() -> str:
+    return _current_agent.get() or "unknown"
+
+
+@contextmanager
+def agent_span(agent: str, **attributes: Any):
+    """Span `agent.<name>` plus a latency observation for the agent."""
+    token = _current_agent.set(agent)
+    start = time.perf_counter()
+    try:
+        with tracer.start_as_current_span(f"agent.{agent}") as span:
+            span.set_attribute("rag.agent", agent)
+            for key, value in attributes.items():
+                span.set_attribute(f"rag.{key}", value)
+            yield span
+    finally:
+        AGENT_LATENCY_SECONDS.labels(agent=agent).observe(time.perf_counter() - start)
+        _current_agent.reset(token)
+
+
+def traced_agent(agent: str) -> Callable:
+    """Decorator form of agent_span for agent functions."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with agent_span(agent):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_context(num_chunks: int, chars: int):
+    """Attach the size of the context an agent is about to send."""
+    span = trace.get_current_span()
+    span.set_attribute("rag.context_chunks", num_chunks)
+    span.set_attribute("rag.context_chars", chars)
+    AGENT_CONTEXT_CHARS.labels(agent=current_agent()).observe(chars)
+
+
+def record_usage(resp: Any, agent: str | None = None):
+    """Token counts from an OpenAI response onto the span, counters and usage ledger."""
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return
+    agent = agent or current_agent()
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+
+    span = trace.get_current_span()
+    span.set_attribute("llm.usage.prompt_tokens", prompt)
+    span.set_attribute("llm.usage.completion_tokens", completion)
+
+    LLM_TOKENS_TOTAL.labels(agent=agent, kind="prompt").inc(prompt)
+    if completion:
+        LLM_TOKENS_TOTAL.labels(agent=agent, kind="completion").inc(completion)
+
+    add_usage(agent, getattr(resp, "model", "") or "", prompt, completion)
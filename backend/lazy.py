@@ -0,0 +1,29 @@
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Return a module that is only executed on first attribute access.
+
+    Used for heavy dependencies (openai, faiss, numpy, httpx) so that
+    importing the API is cheap; the warm-up step or the first real use
+    pays the import cost instead. Already-imported modules are returned
+    as-is.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        # Let the normal import raise the usual ModuleNotFoundError
+        return importlib.import_module(name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque
+
+from .config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_WRITE_TIMEOUT,
+    HTTP_POOL_TIMEOUT,
+    LLM_MAX_RETRIES,
+    LLM_HEDGING,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_MIN_DELAY_MS,
+    LLM_HEDGE_INITIAL_DELAY_MS,
+    LLM_HEDGE_MAX_WORKERS,
+    LLM_TRANSPORT_MODE,
+    LLM_CASSETTE_DIR,
+    LLM_REPLAY_LATENCY_MS,
+    LLM_SYNTHETIC_LATENCY_MS,
+    SYNTHETIC_EMBEDDING_DIM,
+    SYNTHETIC_COMPLETION_WORDS,
+    SYNTHETIC_RPM,
+    SYNTHETIC_TPM,
+    LLM_RATE_LIMITING,
+)
+from .metrics import LLM_HEDGE_TOTAL
+from .instrumentation import record_usage
+from .lazy import lazy_import
+from .rate_limiter import PRIORITY_HEADER, scheduler, max_queue_wait
+
+# Heavy SDK imports are deferred to first use (normally the warm-up step)
+httpx = lazy_import("httpx")
+openai = lazy_import("openai")
+
+# ------------------------------------------------------------
+# SHARED TRANSPORT
+# ------------------------------------------------------------
+# Every agent and embedding call goes through one OpenAI client
+# backed by one tuned httpx connection pool.
+_client: openai.OpenAI | None = None
+_client_lock = threading.Lock()
+
+
+def build_transport(mode: str = LLM_TRANSPORT_MODE) -> httpx.BaseTransport:
+    """Network transport for the selected LLM_TRANSPORT_MODE."""
+    from .transport import TRANSPORT_MODES, RecordingTransport, ReplayTransport, SyntheticTransport
+
+    if mode not in TRANSPORT_MODES:
+        raise ValueError(f"Unknown LLM_TRANSPORT_MODE '{mode}', expected one of {TRANSPORT_MODES}")
+
+    if mode == "replay":
+        latency = None if LLM_REPLAY_LATENCY_MS is None else float(LLM_REPLAY_LATENCY_MS)
+        return ReplayTransport(LLM_CASSETTE_DIR, latency_ms=latency)
+    if mode == "synthetic":
+        return SyntheticTransport(
+            latency_ms=LLM_SYNTHETIC_LATENCY_MS,
+            embedding_dim=SYNTHETIC_EMBEDDING_DIM,
+            completion_words=SYNTHETIC_COMPLETION_WORDS,
+            rpm=SYNTHETIC_RPM,
+            tpm=SYNTHETIC_TPM,
+        )
+
+    network = httpx.HTTPTransport(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+    if mode == "record":
+        return RecordingTransport(network, LLM_CASSETTE_DIR)
+    return network
+
+
+def build_http_client() -> httpx.Client:
+    """httpx client with explicit pool limits, keep-alive and timeouts."""
+    transport = build_transport()
+    if LLM_RATE_LIMITING:
+        from .transport import RateLimitedTransport
+        transport = RateLimitedTransport(transport, scheduler)
+
+    return httpx.Client(
+        transport=transport,
+        timeout=httpx.Timeout(
+            connect=HTTP_CONNECT_TIMEOUT,
+            read=HTTP_READ_TIMEOUT,
+            write=HTTP_WRITE_TIMEOUT,
+            pool=HTTP_POOL_TIMEOUT,
+        ),
+    )
+
+
+def get_client() -> openai.OpenAI:
+    """Return the process-wide OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                http_client = build_http_client()
+                offline = LLM_TRANSPORT_MODE in ("replay", "synthetic")
+                _client = openai.OpenAI(
+                    api_key=OPENAI_API_KEY or ("offline" if offline else None),
+                    base_url=OPENAI_BASE_URL or None,
+                    http_client=http_client,
+                    timeout=http_client.timeout,
+                    max_retries=LLM_MAX_RETRIES,
+                )
+    return _client
+
+
+def priority_client(priority: str) -> openai.OpenAI:
+    """
+    The shared client with every request pinned to `priority`, for
+    libraries that call OpenAI themselves (ragas judge calls).
+    """
+    return get_client().with_options(default_headers={PRIORITY_HEADER: priority})
+
+
+# ------------------------------------------------------------
+# HEDGED REQUESTS
+# ------------------------------------------------------------
+class LatencyWindow:
+    """Rolling window of recent call latencies (seconds)."""
+
+    def __init__(self, size: int = 500):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> float | None:
+        with self._lock:
+            if len(self._samples) < 20:
+                return None
+            ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, int(len(ordered) * pct / 100.0))
+        return ordered[idx]
+
+
+class Hedger:
+    """
+    Runs a call and, if it has not answered after a delay derived from the
+    recent latency percentile, fires one duplicate and returns whichever
+    succeeds first. The losing request cannot be aborted mid-flight with
+    the sync client, so it completes in the background and is discarded
+    (its tokens are still accounted by the wrapped call).
+
+    Attempts only run on an idle pool worker. When none is free the call
+    runs unhedged on the caller's thread, so under overload hedging adds
+    no load and a queued primary never trips the hedge delay.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_delay_ms: float = 250.0,
+        initial_delay_ms: float = 2000.0,
+        max_workers: int = 32,
+    ):
+        self.latencies = LatencyWindow()
+        self._percentile = percentile
+        self._min_delay = min_delay_ms / 1000.0
+        self._initial_delay = initial_delay_ms / 1000.0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge")
+        self._idle = threading.Semaphore(max_workers)
+
+    def delay(self) -> float:
+        observed = self.latencies.percentile(self._percentile)
+        if observed is None:
+            return self._initial_delay
+        return max(self._min_delay, observed)
+
+    def _timed(self, started: threading.Event | None, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if started is not None:
+            started.set()
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.latencies.observe(time.perf_counter() - start)
+        return result
+
+    def _try_submit(self, started: threading.Event | None, fn: Callable[..., Any], *args, **kwargs):
+        """Run on an idle pool worker, or return None when all are busy."""
+        if not self._idle.acquire(blocking=False):
+            return None
+        # Carry the caller's context (trace span, current agent, usage) into the pool
+        ctx = contextvars.copy_context()
+        try:
+            fut = self._pool.submit(ctx.run, self._timed, started, fn, *args, **kwargs)
+        except BaseException:
+            self._idle.release()
+            raise
+        fut.add_done_callback(lambda _: self._idle.release())
+        return fut
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        started = threading.Event()
+        primary = self._try_submit(started, fn, *args, **kwargs)
+        if primary is None:
+            LLM_HEDGE_TOTAL.labels(outcome="skipped").inc()
+            return self._timed(None, fn, *args, **kwargs)
+
+        # The hedge delay counts from when the primary starts running
+        started.wait()
+        done, _ = wait([primary], timeout=self.delay())
+        if done:
+            return primary.result()
+
+        hedge = self._try_submit(None, fn, *args, **kwargs)
+        if hedge is None:
+            LLM_HEDGE_TOTAL.labels(outcome="skipped").inc()
+            return primary.result()
+
+        LLM_HEDGE_TOTAL.labels(outcome="fired").inc()
+        pending = {primary, hedge}
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None:
+                    LLM_HEDGE_TOTAL.labels(
+                        outcome="hedge_won" if fut is hedge else "primary_won"
+                    ).inc()
+                    return fut.result()
+
+        # Both attempts failed: surface the primary's error
+        return primary.result()
+
+
+hedger = Hedger(
+    percentile=LLM_HEDGE_PERCENTILE,
+    min_delay_ms=LLM_HEDGE_MIN_DELAY_MS,
+    initial_delay_ms=LLM_HEDGE_INITIAL_DELAY_MS,
+    max_workers=LLM_HEDGE_MAX_WORKERS,
+)
+
+
+# ------------------------------------------------------------
+# PUBLIC HELPERS
+# ------------------------------------------------------------
+def chat_completion(timeout: float | None = None, **kwargs) -> Any:
+    """
+    Shared entrypoint for every agent chat completion.
+    Hedged when LLM_HEDGING is enabled. A `timeout` (seconds) bounds the
+    whole call, so retries are disabled for it.
+    """
+    client = get_client()
+    if timeout is not None:
+        client = client.with_options(timeout=timeout, max_retries=0)
+    create = client.chat.completions.create
+
+    def create_and_record(**kw):
+        # Recorded per attempt, so a losing hedge's tokens are still accounted
+        resp = create(**kw)
+        record_usage(resp)
+        return resp
+
+    # Time spent queued for rate-limit capacity counts against the budget
+    with max_queue_wait(timeout):
+        if LLM_HEDGING:
+            return hedger.call(create_and_record, **kwargs)
+        return create_and_record(**kwargs)
+
+
+def create_embeddings(**kwargs) -> Any:
+    resp = get_client().embeddings.create(**kwargs)
+    record_usage(resp, agent="embedding")
+    return resp
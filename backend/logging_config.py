@@ -1,70 +1,205 @@
+import atexit
 import logging
 import json
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
 import os
+import queue
+import random
+import time
 import uuid
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict
 
-# Ensure log directory exists
-LOG_DIR = "/var/log/rag_system"
-os.makedirs(LOG_DIR, exist_ok=True)
+# Created on the first write, not at import
+LOG_DIR = os.getenv("LOG_DIR", "/var/log/rag_system")
+
+# Request threads only enqueue; a background listener formats and writes.
+# LOG_ASYNC=false attaches the file handlers directly (useful when debugging).
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+
+
+def _parse_overrides(raw: str) -> Dict[str, str]:
+    """'api_logger=WARNING,rag_pipeline=0.1' -> {'api_logger': 'WARNING', ...}"""
+    out = {}
+    for part in raw.split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            out[name.strip()] = value.strip()
+    return out
+
+
+# Per-logger overrides, e.g. LOG_LEVELS="rag_pipeline=WARNING"
+LOG_LEVELS = {k: v.upper() for k, v in _parse_overrides(os.getenv("LOG_LEVELS", "")).items()}
+# Fraction of INFO/DEBUG records kept, e.g. LOG_SAMPLE_RATES="api_logger=0.1"
+LOG_SAMPLE_RATES = {k: float(v) for k, v in _parse_overrides(os.getenv("LOG_SAMPLE_RATES", "")).items()}
 
 
 # JSON Formatter
 class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line. Uses a pre-built encoder and formats the
+    timestamp from `record.created`, caching the seconds part.
+    """
+
+    _encode = json.JSONEncoder(ensure_ascii=False, check_circular=False).encode
+
+    def __init__(self, max_message_chars: int = LOG_MAX_MESSAGE_CHARS):
+        super().__init__()
+        self.max_message_chars = max_message_chars
+        self._cached_second = None
+        self._cached_prefix = ""
+
+    def _timestamp(self, created: float) -> str:
+        second = int(created)
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        return f"{self._cached_prefix}.{int((created - second) * 1_000_000):06d}"
+
     def format(self, record):
-        log_record = {
-            "timestamp": datetime.utcnow().isoformat(),
+        message = record.getMessage()
+        if len(message) > self.max_message_chars:
+            message = message[:self.max_message_chars] + "...[truncated]"
+        if record.exc_info:
+            message = f"{message}\n{self.formatException(record.exc_info)}"
+
+        return self._encode({
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
-            "message": record.getMessage(),
+            "message": message,
             "request_id": getattr(record, "request_id", None),
             "agent": getattr(record, "agent", None),
             "pipeline_step": getattr(record, "pipeline_step", None),
-        }
-        return json.dumps(log_record)
+        })
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records below WARNING; warnings and errors always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Enqueue the record untouched and never block the caller.
+
+    Message interpolation and JSON encoding happen on the listener
+    thread. When the queue is full the record is dropped and counted.
+    """
+
+    dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+class _RouteByLogger(logging.Handler):
+    """Listener-side handler: send each record to its logger's file."""
+
+    def __init__(self):
+        super().__init__()
+        self.routes: Dict[str, logging.Handler] = {}
+
+    def handle(self, record):
+        handler = self.routes.get(record.name)
+        if handler is not None:
+            handler.handle(record)
+        return True
+
+
+class _LazyRotatingFileHandler(RotatingFileHandler):
+    """Opens (and creates the directory for) its file on the first record."""
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
 
 
 def get_rotating_handler(log_filename):
-    handler = RotatingFileHandler(
+    handler = _LazyRotatingFileHandler(
         os.path.join(LOG_DIR, log_filename),
         maxBytes=5_000_000,  # 5 MB per log file
-        backupCount=5
+        backupCount=5,
+        delay=True,
     )
     handler.setFormatter(JSONFormatter())
     return handler
 
 
+_log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_MAX)
+_router = _RouteByLogger()
+_listener = QueueListener(_log_queue, _router)
+_queue_handler = NonBlockingQueueHandler(_log_queue)
+
+
+def _configure(name: str, log_filename: str, level: int) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.setLevel(LOG_LEVELS.get(name, level))
+    if name in LOG_SAMPLE_RATES:
+        logger.addFilter(SamplingFilter(LOG_SAMPLE_RATES[name]))
+
+    file_handler = get_rotating_handler(log_filename)
+    if LOG_ASYNC:
+        _router.routes[name] = file_handler
+        logger.addHandler(_queue_handler)
+    else:
+        logger.addHandler(file_handler)
+    return logger
+
+
 # MAIN LOGGER
-api_logger = logging.getLogger("api_logger")
-api_logger.setLevel(logging.INFO)
-api_logger.addHandler(get_rotating_handler("api.log"))
+api_logger = _configure("api_logger", "api.log", logging.INFO)
 
 
 # ERROR LOGGER
-error_logger = logging.getLogger("error_logger")
-error_logger.setLevel(logging.ERROR)
-error_logger.addHandler(get_rotating_handler("errors.log"))
+error_logger = _configure("error_logger", "errors.log", logging.ERROR)
 
 
 # AGENT LOGGERS
-query_agent_logger = logging.getLogger("agent_query_classifier")
-query_agent_logger.setLevel(logging.INFO)
-query_agent_logger.addHandler(get_rotating_handler("agent_query_classifier.log"))
+query_agent_logger = _configure("agent_query_classifier", "agent_query_classifier.log", logging.INFO)
 
-retriever_agent_logger = logging.getLogger("agent_retriever")
-retriever_agent_logger.setLevel(logging.INFO)
-retriever_agent_logger.addHandler(get_rotating_handler("agent_retriever.log"))
+retriever_agent_logger = _configure("agent_retriever", "agent_retriever.log", logging.INFO)
 
-synth_agent_logger = logging.getLogger("agent_synthesizer")
-synth_agent_logger.setLevel(logging.INFO)
-synth_agent_logger.addHandler(get_rotating_handler("agent_synthesizer.log"))
+synth_agent_logger = _configure("agent_synthesizer", "agent_synthesizer.log", logging.INFO)
 
 
 # RAG PIPELINE LOGGER
-pipeline_logger = logging.getLogger("rag_pipeline")
-pipeline_logger.setLevel(logging.INFO)
-pipeline_logger.addHandler(get_rotating_handler("rag_pipeline.log"))
+pipeline_logger = _configure("rag_pipeline", "rag_pipeline.log", logging.INFO)
+
+
+def _stop_listener():
+    _listener.stop()
+
+
+def _restart_listener_after_fork():
+    # A forked worker (gunicorn preload) inherits the queue but not the
+    # listener thread; give it its own queue and listener
+    global _log_queue, _listener
+    _log_queue = queue.Queue(maxsize=LOG_QUEUE_MAX)
+    _queue_handler.queue = _log_queue
+    _listener = QueueListener(_log_queue, _router)
+    _listener.start()
+
+
+if LOG_ASYNC:
+    _listener.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(_stop_listener)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_listener_after_fork)
 
 
 # Helper: create request ID
@@ -0,0 +1,222 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# ------------------------------------------------------------
+# Custom Prometheus metrics
+# ------------------------------------------------------------
+# Registered on the default registry, so they are served by the
+# Instrumentator /metrics endpoint alongside the HTTP metrics.
+
+# Single-flight coalescing of identical /query requests
+QUERY_INFLIGHT_WAITERS = Gauge(
+    "rag_query_coalesced_waiters",
+    "Requests currently waiting on an identical in-flight /query pipeline",
+)
+QUERY_COALESCED_TOTAL = Counter(
+    "rag_query_coalesced_total",
+    "Requests that shared the result of an identical in-flight /query pipeline",
+    ["outcome"],
+)
+QUERY_PIPELINE_EXECUTIONS_TOTAL = Counter(
+    "rag_query_pipeline_executions_total",
+    "Full answer_query pipeline executions started by /query",
+)
+
+# Embedding micro-batcher
+EMBED_BATCH_SIZE = Histogram(
+    "rag_embedding_batch_size",
+    "Number of texts sent per micro-batched embedding request",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+EMBED_BATCH_WAIT_SECONDS = Histogram(
+    "rag_embedding_batch_wait_seconds",
+    "Time a get_embedding call waited in the batcher before dispatch",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+EMBED_BATCH_IN_FLIGHT = Gauge(
+    "rag_embedding_batches_in_flight",
+    "Micro-batched embedding requests currently being sent",
+)
+
+# Hedged LLM requests
+LLM_HEDGE_TOTAL = Counter(
+    "rag_llm_hedge_total",
+    "Hedged chat completion events (fired, primary_won, hedge_won, skipped)",
+    ["outcome"],
+)
+
+# Latency budgets: how each pipeline stage was executed
+STAGE_OUTCOME_TOTAL = Counter(
+    "rag_stage_outcome_total",
+    "Pipeline stage executions by outcome (ran, skipped, degraded)",
+    ["stage", "status"],
+)
+QUERY_OUTCOME_TOTAL = Counter(
+    "rag_queries_total",
+    "Completed pipeline runs, by whether any stage was skipped or degraded",
+    ["degraded"],
+)
+
+# /query/batch
+BATCH_QUERIES_TOTAL = Counter(
+    "rag_batch_queries_total",
+    "Questions answered through /query/batch",
+    ["status"],
+)
+BATCH_THROUGHPUT_QPS = Gauge(
+    "rag_batch_last_throughput_qps",
+    "Questions per second achieved by the most recent /query/batch run",
+)
+
+# Per-agent instrumentation
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32)
+
+AGENT_LATENCY_SECONDS = Histogram(
+    "rag_agent_latency_seconds",
+    "Latency of each pipeline agent (retrieval, summarizer, reasoner, ...)",
+    ["agent"],
+    buckets=_LATENCY_BUCKETS,
+)
+AGENT_CONTEXT_CHARS = Histogram(
+    "rag_agent_context_chars",
+    "Characters of retrieved context sent to each agent",
+    ["agent"],
+    buckets=(250, 500, 1000, 2000, 4000, 6000, 8000, 16000),
+)
+LLM_TOKENS_TOTAL = Counter(
+    "rag_llm_tokens_total",
+    "Tokens reported by the provider, by agent and kind (prompt/completion)",
+    ["agent", "kind"],
+)
+EMBEDDING_REQUESTS_TOTAL = Counter(
+    "rag_embedding_requests_total",
+    "Single-text embedding lookups by cache result",
+    ["cache"],
+)
+EMBEDDING_CACHE_LOOKUPS_TOTAL = Counter(
+    "rag_embedding_cache_lookups_total",
+    "Batch embedding lookups in the persistent cache (result: hit, miss)",
+    ["result"],
+)
+FAISS_SEARCH_SECONDS = Histogram(
+    "rag_faiss_search_seconds",
+    "FAISS index search latency (one call, any batch size)",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+PIPELINE_DURATION = Histogram(
+    "rag_pipeline_duration",
+    "End-to-end answer_query duration in seconds",
+    buckets=_LATENCY_BUCKETS,
+)
+VECTOR_STORE_CHUNKS = Gauge(
+    "vector_store_chunks_total",
+    "Chunks currently held in the vector index",
+)
+RAGAS_COMPOSITE_SCORE = Gauge(
+    "ragas_composite_score",
+    "Latest composite score from the background evaluator (absent until a real scorer has run)",
+    ["scorer"],
+)
+
+# Token and cost accounting
+LLM_COST_USD_TOTAL = Counter(
+    "rag_llm_cost_usd_total",
+    "Estimated provider spend in USD, by agent and model",
+    ["agent", "model"],
+)
+QUERY_TOKENS = Histogram(
+    "rag_query_tokens",
+    "Prompt + completion tokens spent answering one query",
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+QUERY_COST_USD = Histogram(
+    "rag_query_cost_usd",
+    "Estimated USD spent answering one query",
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05),
+)
+
+# Cold start
+COLD_START_SECONDS = Gauge(
+    "rag_cold_start_seconds",
+    "Duration of each startup phase (import, index_load, warmup, total)",
+    ["phase"],
+)
+API_READY = Gauge(
+    "rag_api_ready",
+    "1 once the index is loaded and warm-up has finished",
+)
+
+# Ingest-time summaries
+SUMMARY_LOOKUPS_TOTAL = Counter(
+    "rag_summary_lookups_total",
+    "Retrieved chunks served from a precomputed summary (hit) or summarised live (miss)",
+    ["result"],
+)
+SUMMARIES_PRECOMPUTED_TOTAL = Counter(
+    "rag_summaries_precomputed_total",
+    "Summaries generated by the background precompute stage",
+    ["kind"],
+)
+SUMMARY_BACKLOG = Gauge(
+    "rag_summary_backlog_chunks",
+    "Chunks still waiting for a precomputed summary",
+)
+
+# Rate-limit scheduler
+LLM_SCHEDULER_QUEUE_DEPTH = Gauge(
+    "rag_llm_scheduler_queue_depth",
+    "Provider requests waiting for rate-limit capacity, by priority",
+    ["priority"],
+)
+LLM_SCHEDULER_WAIT_SECONDS = Histogram(
+    "rag_llm_scheduler_wait_seconds",
+    "Time a provider request waited for rate-limit capacity, by priority",
+    ["priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60),
+)
+LLM_THROTTLED_TOTAL = Counter(
+    "rag_llm_throttled_total",
+    "Provider requests delayed or rejected by rate limits (reason: 429, queue_timeout)",
+    ["priority", "reason"],
+)
+LLM_RATE_LIMIT_REMAINING = Gauge(
+    "rag_llm_rate_limit_remaining",
+    "Scheduler's view of remaining capacity per model (kind: requests, tokens)",
+    ["model", "kind"],
+)
+
+# /query admission control
+QUERY_ADMISSION_IN_FLIGHT = Gauge(
+    "rag_query_in_flight",
+    "Admitted /query requests currently running",
+)
+QUERY_QUEUE_DEPTH = Gauge(
+    "rag_query_queue_depth",
+    "/query requests waiting for admission",
+)
+QUERY_QUEUE_WAIT_SECONDS = Histogram(
+    "rag_query_queue_wait_seconds",
+    "Time an admitted /query request waited in the admission queue",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+QUERY_REJECTED_TOTAL = Counter(
+    "rag_query_rejected_total",
+    "/query requests rejected by admission control (reason: queue_full, queue_timeout)",
+    ["reason"],
+)
+QUERY_ADMISSION_LIMIT = Gauge(
+    "rag_query_admission_limit",
+    "Configured admission limits (kind: concurrency, queue)",
+    ["kind"],
+)
+
+# Context compression
+CONTEXT_KEPT_RATIO = Histogram(
+    "rag_context_compression_ratio",
+    "Share of retrieved chunk text kept by context compression, per query",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
+CONTEXT_CHARS_TOTAL = Counter(
+    "rag_context_chars_total",
+    "Retrieved chunk characters before and after compression (kind: in, out)",
+    ["kind"],
+)
@@ -6,7 +6,6 @@ from opentelemetry.sdk.resources import Resource
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
 
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from opentelemetry.instrumentation.requests import RequestsInstrumentor
 
 
 def setup_otel(app):
@@ -31,5 +30,15 @@ def setup_otel(app):
     # Instrument FastAPI
     FastAPIInstrumentor.instrument_app(app)
 
-    # Instrument outgoing calls (OpenAI, requests, etc.)
+
+def instrument_outgoing_clients():
+    """
+    Instrument outgoing calls (requests, and httpx used by the OpenAI SDK).
+    Deferred to the warm-up step because it imports both HTTP stacks; it
+    must run before the shared OpenAI client is created.
+    """
+    from opentelemetry.instrumentation.requests import RequestsInstrumentor
+    from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+
     RequestsInstrumentor().instrument()
+    HTTPXClientInstrumentor().instrument()
@@ -1,6 +1,9 @@
 import re
 import unicodedata
-from typing import List
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from .logging_config import error_logger
 
 CONTROL_CHARS_RE = re.compile(r"[\r\t]+")
 MULTI_SPACE_RE = re.compile(r"\s+")
@@ -36,3 +39,62 @@ def chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
         chunks.append(text[start:end])
         start += step
     return chunks
+
+
+# ------------------------------------------------------------
+# DOCUMENT EXTRACTION (shared by /ingest and the chunking sweep)
+# ------------------------------------------------------------
+SUPPORTED_EXTENSIONS = {".txt", ".md", ".pdf", ".docx"}
+
+
+def read_document(file_path: Path) -> str:
+    """Raw text of a .txt/.md/.pdf/.docx file."""
+    suffix = file_path.suffix.lower()
+    if suffix in {".txt", ".md"}:
+        return file_path.read_text(encoding="utf-8", errors="ignore")
+    if suffix == ".pdf":
+        from pypdf import PdfReader
+        reader = PdfReader(str(file_path))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    if suffix == ".docx":
+        import docx
+        doc = docx.Document(str(file_path))
+        return "\n".join(p.text for p in doc.paragraphs)
+    raise ValueError(f"Unsupported file type: {file_path}")
+
+
+def load_documents(directory: Path, log_extra: Dict | None = None) -> List[Tuple[Path, str]]:
+    """
+    (path, cleaned text) for every supported file; unreadable files are logged
+    (with `log_extra`, e.g. the request_id) and skipped.
+    """
+    documents = []
+    for file_path in sorted(directory.rglob("*")):
+        if file_path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+            continue
+        try:
+            raw = read_document(file_path)
+        except Exception as e:
+            error_logger.error(f"Failed to read {file_path}: {e}", extra=log_extra)
+            continue
+        documents.append((file_path, clean_text(raw)))
+    return documents
+
+
+def chunk_documents(
+    documents: List[Tuple[Path, str]], chunk_size: int, overlap: int
+) -> Tuple[List[str], List[Dict]]:
+    """Chunk texts plus their metadata (source, policy_id, chunk_id, text)."""
+    texts: List[str] = []
+    metadatas: List[Dict] = []
+    for file_path, text in documents:
+        policy_id = file_path.stem.split("_")[0]
+        for i, chunk in enumerate(chunk_text(text, chunk_size, overlap)):
+            texts.append(chunk)
+            metadatas.append({
+                "source": str(file_path),
+                "policy_id": policy_id,
+                "chunk_id": i,
+                "text": chunk,
+            })
+    return texts, metadatas
@@ -0,0 +1,210 @@
+"""
+In-process sampling profiler for the live API.
+
+A sampler thread walks `sys._current_frames()` at a fixed interval and
+counts each thread's stack. Output is the collapsed-stack format read by
+flamegraph.pl, speedscope and inferno:
+
+    MainThread;run (api.py:42);search (vector_store.py:99) 17
+
+Modes:
+    wall  every thread, every sample (includes time blocked on I/O, locks
+          and OpenAI calls)
+    cpu   only threads the kernel reports as running (Linux
+          /proc/self/task/<tid>/stat); elsewhere, threads whose top frame
+          is a known blocking call are skipped
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+from .config import (
+    PROFILE_CONTINUOUS_INTERVAL_MS,
+    PROFILE_CONTINUOUS_WINDOW_S,
+    PROFILE_KEEP,
+    PROFILE_DIR,
+)
+from .logging_config import pipeline_logger, error_logger
+
+MODES = ("wall", "cpu")
+
+# Top-of-stack functions that mean "waiting", for the cpu-mode fallback
+_IDLE_FUNCTIONS = {
+    "wait", "sleep", "select", "poll", "epoll", "accept", "recv", "recv_into",
+    "read", "readinto", "get", "acquire", "_wait_for_tstate_lock", "join",
+}
+
+
+def _thread_running(native_id: int | None) -> bool | None:
+    """True/False from the kernel's thread state, None when unknown."""
+    if native_id is None:
+        return None
+    try:
+        stat = Path(f"/proc/self/task/{native_id}/stat").read_text()
+    except OSError:
+        return None
+    # State is the first field after the parenthesised command name
+    return stat[stat.rindex(")") + 2] == "R"
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Counts collapsed stacks of every thread except the sampler itself."""
+
+    def __init__(self, interval_ms: float = 10.0, mode: str = "wall"):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        self.interval = max(interval_ms, 1.0) / 1000.0
+        self.mode = mode
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[object, str] = {}
+
+    def sample(self, skip_ident: int | None = None):
+        threads = {t.ident: t for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == skip_ident:
+                continue
+            thread = threads.get(ident)
+
+            if self.mode == "cpu":
+                running = _thread_running(getattr(thread, "native_id", None))
+                if running is False or (running is None and frame.f_code.co_name in _IDLE_FUNCTIONS):
+                    continue
+
+            parts: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = _frame_label(code)
+                parts.append(label)
+                frame = frame.f_back
+            parts.append(thread.name if thread is not None else f"thread-{ident}")
+            parts.reverse()
+            self.stacks[";".join(parts)] += 1
+        self.samples += 1
+
+    def run(self, seconds: float, stop: threading.Event | None = None):
+        """Sample from the calling thread for `seconds` (or until `stop` is set)."""
+        me = threading.get_ident()
+        end = time.perf_counter() + seconds
+        next_at = time.perf_counter()
+        while time.perf_counter() < end and not (stop is not None and stop.is_set()):
+            self.sample(skip_ident=me)
+            next_at += self.interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_at = time.perf_counter()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 25) -> List[Dict]:
+        """Self-time view: the innermost frame of each stack."""
+        leaf: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaf[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaf.values()) or 1
+        return [
+            {"function": fn, "samples": n, "percent": round(100.0 * n / total, 2)}
+            for fn, n in leaf.most_common(limit)
+        ]
+
+
+# ------------------------------------------------------------
+# ON-DEMAND PROFILING
+# ------------------------------------------------------------
+_on_demand = threading.Lock()
+
+
+def profile_for(seconds: float, interval_ms: float = 10.0, mode: str = "wall") -> SamplingProfiler | None:
+    """Run one profile; returns None if another on-demand profile is running."""
+    if not _on_demand.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(interval_ms, mode)
+        profiler.run(seconds)
+        return profiler
+    finally:
+        _on_demand.release()
+
+
+# ------------------------------------------------------------
+# CONTINUOUS PROFILING
+# ------------------------------------------------------------
+class ContinuousProfiler:
+    """
+    Low-rate wall-clock sampling in a daemon thread. Every `window_s`
+    the window's collapsed stacks are written to
+    `PROFILE_DIR/profile-<UTC timestamp>.collapsed`; only the newest
+    `keep` files are kept.
+    """
+
+    def __init__(
+        self,
+        directory: Path = PROFILE_DIR,
+        interval_ms: float = PROFILE_CONTINUOUS_INTERVAL_MS,
+        window_s: float = PROFILE_CONTINUOUS_WINDOW_S,
+        keep: int = PROFILE_KEEP,
+    ):
+        self.directory = Path(directory)
+        self.interval_ms = interval_ms
+        self.window_s = window_s
+        self.keep = max(1, keep)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="continuous-profiler", daemon=True)
+        self._thread.start()
+        pipeline_logger.info(
+            "Continuous profiler started (%sms interval, %ss windows)", self.interval_ms, self.window_s
+        )
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def profiles(self) -> List[Path]:
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob("profile-*.collapsed"))
+
+    def _run(self):
+        while not self._stop.is_set():
+            profiler = SamplingProfiler(self.interval_ms, "wall")
+            profiler.run(self.window_s, stop=self._stop)
+            try:
+                self._write(profiler)
+            except OSError as e:
+                error_logger.error(f"Could not write continuous profile: {e}")
+
+    def _write(self, profiler: SamplingProfiler):
+        if not profiler.stacks:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        (self.directory / f"profile-{stamp}.collapsed").write_text(profiler.collapsed(), encoding="utf-8")
+
+        for old in self.profiles()[:-self.keep]:
+            old.unlink(missing_ok=True)
+
+
+# GLOBAL INSTANCE
+continuous_profiler = ContinuousProfiler()
@@ -1,59 +1,133 @@
-from typing import Dict
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Tuple
 
 from .agents import (
     retrieval_agent,
+    batch_retrieval_agent,
     reranker_agent,
     summarizer_agent,
+    fallback_summary,
     compliance_reasoner_agent,
     fact_checker_agent,
     answer_writer_agent,
+    fused_agent,
     retriever_agent_logger,
     pipeline_logger,
 )
+from .config import (
+    QUERY_DEADLINE_MS,
+    SUMMARIZER_BUDGET_MS,
+    REASONER_BUDGET_MS,
+    FACT_CHECK_BUDGET_MS,
+    ANSWER_BUDGET_MS,
+    MIN_STAGE_BUDGET_MS,
+    BATCH_QUERY_CONCURRENCY,
+    CONTEXT_COMPRESSION,
+    TOP_K,
+    PIPELINE_MODE,
+    PIPELINE_MODES,
+)
+from .compression import compress_chunks
+from .deadlines import Deadline, StageReport, RAN, SKIPPED, DEGRADED
+from .instrumentation import tracer
+from .summaries import summary_store, text_hash
+from .metrics import PIPELINE_DURATION, QUERY_OUTCOME_TOTAL
+from .usage import track_usage, observe_query
+from .rate_limiter import llm_priority, BATCH
+from .lazy import lazy_import
 
-# ⚡ RAGAS removed from live query for speed
-# If needed, run RAGAS separately on demand (Tab 2 only)
-from .evaluation import run_ragas_evaluation
+openai = lazy_import("openai")
 
 
 # ----------------------------------------------------
 # MAIN PIPELINE ENTRYPOINT
 # ----------------------------------------------------
-def answer_query(query: str) -> Dict:
-    pipeline_logger.info(f"Starting full RAG pipeline for query='{query}'")
+FACT_CHECK_SKIPPED = "Fact check skipped: latency budget exhausted."
+
+# multi_agent: summarizer, reasoner, fact checker and answer writer as
+# separate calls; fused: one structured-output call returning all four
+MULTI_AGENT, FUSED = PIPELINE_MODES
+
+
+def _has_budget(budget: float | None) -> bool:
+    return budget is None or budget * 1000.0 >= MIN_STAGE_BUDGET_MS
+
+
+def _required(budget: float | None) -> float | None:
+    # Required stages always run, with at least the minimum stage budget
+    return None if budget is None else max(budget, MIN_STAGE_BUDGET_MS / 1000.0)
+
+
+def answer_query(query: str, deadline_ms: float | None = None, mode: str = PIPELINE_MODE) -> Dict:
+    pipeline_logger.info("Starting full RAG pipeline for query=%r (%s)", query, mode)
+
+    deadline = Deadline(QUERY_DEADLINE_MS if deadline_ms is None else deadline_ms)
+    report = StageReport()
+
+    with tracer.start_as_current_span("rag.answer_query") as span, PIPELINE_DURATION.time(), \
+            track_usage() as usage:
+        # 1 — Retrieve relevant document chunks
+        retrieved = retrieval_agent(query, top_k=TOP_K)
+        report.mark("retrieval", RAN)
 
-    # 1 — Retrieve relevant document chunks
-    retrieved = retrieval_agent(query, top_k=5)
+        result = _answer_from_retrieved(query, retrieved, deadline, report, mode=mode)
+        span.set_attribute("rag.degraded", result["degraded"])
+
+    observe_query(usage)
+    result["usage"] = usage.to_dict()
+    return result
+
+
+def _answer_from_retrieved(
+    query: str,
+    retrieved: List[Dict],
+    deadline: Deadline,
+    report: StageReport,
+    summarize: Callable[..., str] = summarizer_agent,
+    mode: str = MULTI_AGENT,
+) -> Dict:
+    """Stages 2-6 of the pipeline, shared by /query and /query/batch."""
 
     # 2 — Rerank for relevance
     reranked = reranker_agent(query, retrieved)
+    report.mark("rerank", RAN)
 
-    # 3 — Summarize the top chunks
-    summary = summarizer_agent(reranked)
-
-    # 4 — Compliance reasoning
-    reasoning = compliance_reasoner_agent(query, summary)
+    # 2b — Keep only the query-relevant sentences for the LLM stages
+    # (local BM25, no call). `contexts` in the response stay full chunks.
+    context, compression = reranked, None
+    if CONTEXT_COMPRESSION:
+        context, compression = compress_chunks(query, reranked)
+        report.mark("compression", RAN)
 
-    # 5 — Fact checking
-    fact_check_verdict, sources = fact_checker_agent(query, reasoning, reranked)
+    # 3-6 — Fused mode: one structured-output call in place of the agent stages
+    fused = None
+    if mode == FUSED:
+        try:
+            fused = fused_agent(query, context, timeout=_required(deadline.budget()))
+            report.mark("fused", RAN)
+        except ValueError:
+            pipeline_logger.info("Fused reply did not match the schema, running the agent stages")
+            report.mark("fused", DEGRADED)
 
-    # 6 — Final synthesized answer
-    answer = answer_writer_agent(query, reranked, reasoning, fact_check_verdict)
+    if fused is not None:
+        reasoning, fact_check_verdict, answer = fused["reasoning"], fused["fact_check"], fused["answer"]
+        sources = [c.get("source", "") for c in reranked]
+    else:
+        reasoning, fact_check_verdict, sources, answer = _agent_stages(
+            query, reranked, context, deadline, report, summarize
+        )
 
     # ------------------------------------------------
-    # 7 — RAGAS Evaluation (DISABLED FOR LATENCY)
+    # 7 — RAGAS Evaluation (not on the live path)
     # ------------------------------------------------
-    # RAGAS removed from the live query path to make responses faster.
-    # The dashboard’s Evaluation Tab can still call RAGAS when needed.
+    # Answers are scored by the background evaluator (eval_service)
     ragas_scores = {}
 
-    # If you ever want to turn it on:
-    # try:
-    #     ragas_scores = run_ragas_evaluation()
-    # except Exception as e:
-    #     ragas_scores = {"error": str(e)}
-
-    pipeline_logger.info("RAG pipeline complete")
+    pipeline_logger.info(
+        "RAG pipeline complete in %.2fs, stages=%s", deadline.elapsed(), report.stages
+    )
+    QUERY_OUTCOME_TOTAL.labels(degraded=str(report.degraded()).lower()).inc()
 
     return {
         "answer": answer,
@@ -62,4 +136,156 @@ def answer_query(query: str) -> Dict:
         "fact_check": fact_check_verdict,
         "sources": sources,
         "ragas_scores": ragas_scores,
+        "stages": report.stages,
+        "stage_ms": report.timings_ms,
+        "degraded": report.degraded(),
+        "elapsed_ms": round(deadline.elapsed() * 1000.0, 1),
+        "compression": compression,
+        "mode": mode,
     }
+
+
+def _agent_stages(
+    query: str,
+    reranked: List[Dict],
+    context: List[Dict],
+    deadline: Deadline,
+    report: StageReport,
+    summarize: Callable[..., str],
+) -> Tuple[str, str, List[str], str]:
+    """Stages 3-6 as separate agent calls: (reasoning, fact check, sources, answer)."""
+    # 3 — Summarize the top chunks (optional: extractive fallback).
+    # Fully precomputed summaries cost no call, so they ignore the budget.
+    budget = deadline.budget(SUMMARIZER_BUDGET_MS, reserve_ms=REASONER_BUDGET_MS + ANSWER_BUDGET_MS)
+    summary = None
+    if _has_budget(budget) or summary_store.covers(reranked):
+        try:
+            summary = summarize(context, timeout=budget)
+            report.mark("summarizer", RAN)
+        except openai.APITimeoutError:
+            pipeline_logger.info("Summarizer exceeded its budget, using extractive summary")
+    if summary is None:
+        summary = fallback_summary(context)
+        report.mark("summarizer", DEGRADED)
+
+    # 4 — Compliance reasoning
+    reasoning = compliance_reasoner_agent(
+        query, summary,
+        timeout=_required(deadline.budget(REASONER_BUDGET_MS, reserve_ms=ANSWER_BUDGET_MS)),
+    )
+    report.mark("reasoner", RAN)
+
+    # 5 — Fact checking (optional: skipped when out of budget)
+    budget = deadline.budget(FACT_CHECK_BUDGET_MS, reserve_ms=ANSWER_BUDGET_MS)
+    fact_check_verdict = None
+    if _has_budget(budget):
+        try:
+            fact_check_verdict, sources = fact_checker_agent(query, reasoning, context, timeout=budget)
+            report.mark("fact_check", RAN)
+        except openai.APITimeoutError:
+            pipeline_logger.info("Fact checker exceeded its budget, skipping")
+    if fact_check_verdict is None:
+        fact_check_verdict = FACT_CHECK_SKIPPED
+        sources = [c.get("source", "") for c in reranked]
+        report.mark("fact_check", SKIPPED)
+
+    # 6 — Final synthesized answer (gets whatever time is left)
+    answer = answer_writer_agent(
+        query, context, reasoning, fact_check_verdict,
+        timeout=_required(deadline.budget()),
+    )
+    report.mark("answer", RAN)
+
+    return reasoning, fact_check_verdict, sources, answer
+
+
+# ----------------------------------------------------
+# BATCH PIPELINE (/query/batch)
+# ----------------------------------------------------
+class SharedSummaries:
+    """
+    Summarizes each distinct set of retrieved chunks once per batch.
+    Questions that retrieve the same chunks wait on the first summary.
+    Chunks arrive compressed per question, so the key includes their
+    text: two questions share a summary only if they kept the same
+    sentences.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures: Dict[Tuple, Future] = {}
+        self.hits = 0
+
+    def __call__(self, chunks: List[Dict], timeout: float | None = None) -> str:
+        key = tuple(sorted(
+            (str(c.get("source")), c.get("chunk_id", -1), text_hash(c.get("text", "")))
+            for c in chunks
+        ))
+
+        with self._lock:
+            fut = self._futures.get(key)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._futures[key] = fut
+            else:
+                self.hits += 1
+
+        if owner:
+            try:
+                fut.set_result(summarizer_agent(chunks, timeout=timeout))
+            except BaseException as e:
+                fut.set_exception(e)
+
+        return fut.result()
+
+
+def answer_batch(
+    queries: List[str],
+    deadline_ms: float = 0,
+    concurrency: int = BATCH_QUERY_CONCURRENCY,
+    mode: str = PIPELINE_MODE,
+) -> Iterator[Tuple[int, Dict | None, Exception | None]]:
+    """
+    Answers many questions, yielding (index, result, error) as each finishes.
+
+    Retrieval is done for the whole batch up front (one embedding request,
+    one index search); the LLM stages then run with bounded concurrency,
+    sharing summaries between questions with identical contexts.
+    """
+    pipeline_logger.info(f"Starting batch RAG pipeline for {len(queries)} queries")
+
+    # Batch questions queue behind interactive /query calls for rate limits
+    with track_usage() as retrieval_usage, llm_priority(BATCH):
+        retrieved_all = batch_retrieval_agent(queries, top_k=TOP_K)
+    summaries = SharedSummaries()
+
+    def run(query: str, retrieved: List[Dict]) -> Dict:
+        report = StageReport()
+        report.mark("retrieval", RAN)
+        with track_usage() as usage, llm_priority(BATCH):
+            # Each question carries an equal share of the batched embedding call
+            usage.merge(retrieval_usage, 1.0 / len(queries))
+            result = _answer_from_retrieved(query, retrieved, Deadline(deadline_ms), report, summaries, mode)
+        observe_query(usage)
+        result["usage"] = usage.to_dict()
+        return result
+
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="rag-batch")
+    try:
+        futures = {
+            pool.submit(run, q, r): i
+            for i, (q, r) in enumerate(zip(queries, retrieved_all))
+        }
+        for fut in as_completed(futures):
+            try:
+                yield futures[fut], fut.result(), None
+            except Exception as e:
+                yield futures[fut], None, e
+    finally:
+        # Drop queued questions if the consumer goes away mid-stream
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    pipeline_logger.info(
+        f"Batch RAG pipeline complete, {summaries.hits} summaries shared"
+    )
@@ -0,0 +1,280 @@
+"""
+Client-side rate-limit scheduler for every provider request.
+
+Each model gets two token buckets: requests per minute and tokens per
+minute. A request takes one request and its estimated tokens before it
+is sent. While capacity is short, waiters queue by priority class:
+
+    interactive  /query (default)
+    batch        /query/batch, ingest embeddings, summary precompute
+    eval         background evaluation
+
+Batch and eval calls also leave LLM_INTERACTIVE_RESERVE of each bucket
+free, so a large ingest cannot use up the quota user queries need. The
+buckets follow the provider's x-ratelimit-* response headers, and a 429
+pauses the model's queue for the advertised retry-after.
+
+The scheduler sits in the httpx transport (transport.RateLimitedTransport),
+so it also covers the SDK's own retries. A request that cannot be
+scheduled within its wait limit raises httpx.PoolTimeout, which the
+OpenAI SDK reports as APITimeoutError.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Tuple
+
+from .config import (
+    LLM_RATE_LIMITS,
+    LLM_DEFAULT_RATE_LIMIT,
+    LLM_INTERACTIVE_RESERVE,
+    LLM_EST_COMPLETION_TOKENS,
+    LLM_MAX_QUEUE_WAIT_S,
+)
+from .metrics import (
+    LLM_SCHEDULER_QUEUE_DEPTH,
+    LLM_SCHEDULER_WAIT_SECONDS,
+    LLM_THROTTLED_TOTAL,
+    LLM_RATE_LIMIT_REMAINING,
+)
+
+INTERACTIVE, BATCH, EVAL = "interactive", "batch", "eval"
+PRIORITIES = {INTERACTIVE: 0, BATCH: 1, EVAL: 2}
+
+# Pins a client's priority regardless of context (third-party callers such as
+# ragas may run our client on their own threads); stripped before sending
+PRIORITY_HEADER = "x-rag-priority"
+
+_priority: ContextVar[str] = ContextVar("rag_llm_priority", default=INTERACTIVE)
+_max_wait: ContextVar[float | None] = ContextVar("rag_llm_max_wait", default=None)
+
+
+@contextmanager
+def llm_priority(priority: str):
+    """Provider calls made in this context are scheduled at `priority`."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {tuple(PRIORITIES)}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def current_max_wait() -> float:
+    seconds = _max_wait.get()
+    return LLM_MAX_QUEUE_WAIT_S if seconds is None else seconds
+
+
+@contextmanager
+def max_queue_wait(seconds: float | None):
+    """Bound the time calls in this context may wait for capacity (a latency budget)."""
+    token = _max_wait.set(seconds)
+    try:
+        yield
+    finally:
+        _max_wait.reset(token)
+
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_S = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: str) -> float | None:
+    """OpenAI reset headers look like '20ms', '1.5s' or '6m0s'."""
+    parts = _DURATION_RE.findall(value or "")
+    if not parts:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    return sum(float(n) * _UNIT_S[unit] for n, unit in parts)
+
+
+def estimate_tokens(body: Dict) -> int:
+    """Rough token cost of a request as counted against the TPM limit."""
+    if "messages" in body:
+        chars = sum(len(str(m.get("content", ""))) for m in body["messages"])
+        completion = body.get("max_completion_tokens") or body.get("max_tokens") or LLM_EST_COMPLETION_TOKENS
+        return chars // 4 + int(completion)
+    inputs = body.get("input", "")
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    return max(1, sum(len(str(t)) for t in inputs) // 4)
+
+
+# ------------------------------------------------------------
+# TOKEN BUCKET
+# ------------------------------------------------------------
+class TokenBucket:
+    """Refills continuously at `per_minute / 60` per second up to `per_minute`."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60.0)
+        self._updated = now
+
+    def wait_time(self, amount: float, reserve: float, now: float) -> float:
+        """Seconds until `amount` can be taken while leaving `reserve` of the capacity."""
+        self._refill(now)
+        # Capped at a full bucket: a request larger than capacity minus the
+        # reserve could otherwise never be admitted
+        needed = min(amount + reserve * self.capacity, self.capacity)
+        deficit = needed - self.level
+        return 0.0 if deficit <= 0 else deficit * 60.0 / self.capacity
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def sync(self, limit: float | None, remaining: float | None, now: float):
+        """Adopt the provider's limit and never assume more than it reports remaining."""
+        self._refill(now)
+        if limit and limit != self.capacity:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+
+
+# ------------------------------------------------------------
+# PER-MODEL SCHEDULER
+# ------------------------------------------------------------
+class ModelLimiter:
+    def __init__(self, model: str, rpm: float, tpm: float, reserve: float = LLM_INTERACTIVE_RESERVE):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.reserve = reserve
+        self.paused_until = 0.0
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, tokens: int, priority: str, max_wait: float):
+        """Block until the request may be sent; raises TimeoutError after `max_wait`."""
+        entry = (PRIORITIES[priority], next(self._seq))
+        start = time.monotonic()
+        deadline = start + max_wait
+        reserve = 0.0 if priority == INTERACTIVE else self.reserve
+
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            LLM_SCHEDULER_QUEUE_DEPTH.labels(priority=priority).inc()
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None   # not at the head: sleep until notified
+                    if self._waiters[0] == entry:
+                        wait = max(
+                            self.paused_until - now,
+                            self.requests.wait_time(1, reserve, now),
+                            self.tokens.wait_time(tokens, reserve, now),
+                        )
+                        if wait <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            heapq.heappop(self._waiters)
+                            break
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        LLM_THROTTLED_TOTAL.labels(priority=priority, reason="queue_timeout").inc()
+                        raise TimeoutError(
+                            f"No {self.model} rate-limit capacity within {max_wait:.1f}s ({priority})"
+                        )
+                    self._cond.wait(remaining if wait is None else min(wait, remaining))
+            finally:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                LLM_SCHEDULER_QUEUE_DEPTH.labels(priority=priority).dec()
+                # The next waiter may now be at the head
+                self._cond.notify_all()
+
+        LLM_SCHEDULER_WAIT_SECONDS.labels(priority=priority).observe(time.monotonic() - start)
+        self._export()
+
+    def observe(self, status: int, headers, priority: str):
+        """Correct the buckets from x-ratelimit-* headers; pause on 429."""
+        def number(name):
+            try:
+                return float(headers[name])
+            except (KeyError, ValueError):
+                return None
+
+        now = time.monotonic()
+        with self._cond:
+            self.requests.sync(number("x-ratelimit-limit-requests"), number("x-ratelimit-remaining-requests"), now)
+            self.tokens.sync(number("x-ratelimit-limit-tokens"), number("x-ratelimit-remaining-tokens"), now)
+
+            if status == 429:
+                LLM_THROTTLED_TOTAL.labels(priority=priority, reason="429").inc()
+                retry_ms = number("retry-after-ms")
+                retry_after = retry_ms / 1000.0 if retry_ms is not None else number("retry-after")
+                if retry_after is None:
+                    retry_after = max(
+                        parse_duration(headers.get("x-ratelimit-reset-requests", "")) or 0.0,
+                        parse_duration(headers.get("x-ratelimit-reset-tokens", "")) or 1.0,
+                    )
+                self.paused_until = max(self.paused_until, now + retry_after)
+            self._cond.notify_all()
+        self._export()
+
+    def _export(self):
+        LLM_RATE_LIMIT_REMAINING.labels(model=self.model, kind="requests").set(self.requests.level)
+        LLM_RATE_LIMIT_REMAINING.labels(model=self.model, kind="tokens").set(self.tokens.level)
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            self.requests._refill(time.monotonic())
+            self.tokens._refill(time.monotonic())
+            return {
+                "rpm": self.requests.capacity,
+                "tpm": self.tokens.capacity,
+                "requests_available": round(self.requests.level, 1),
+                "tokens_available": round(self.tokens.level),
+                "waiting": len(self._waiters),
+                "paused_for_s": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            }
+
+
+class RateLimitScheduler:
+    """One ModelLimiter per model, created on first use."""
+
+    def __init__(self, limits: Dict[str, List[float]] = LLM_RATE_LIMITS, default: List[float] = LLM_DEFAULT_RATE_LIMIT):
+        self.limits = limits
+        self.default = default
+        self._models: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, model: str) -> ModelLimiter:
+        limiter = self._models.get(model)
+        if limiter is None:
+            with self._lock:
+                limiter = self._models.get(model)
+                if limiter is None:
+                    # Longest matching prefix wins, as for LLM_PRICES
+                    best = max((name for name in self.limits if model.startswith(name)), key=len, default=None)
+                    rpm, tpm = self.limits[best] if best else self.default
+                    limiter = self._models[model] = ModelLimiter(model, rpm, tpm)
+        return limiter
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {model: limiter.snapshot() for model, limiter in list(self._models.items())}
+
+
+# GLOBAL INSTANCE
+scheduler = RateLimitScheduler()
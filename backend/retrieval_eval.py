@@ -0,0 +1,170 @@
+"""
+Offline retrieval-quality metrics: recall@k, MRR and nDCG@k.
+
+Evaluation set format (JSONL, one labelled question per line):
+
+    {"question": "How long must personal data be retained?", "relevant_policy_ids": ["POL-045"]}
+
+Graded relevance for nDCG is optional:
+
+    {"question": "...", "relevance": {"POL-045": 2, "POL-011": 1}}
+
+No LLM judges are involved: questions are embedded in batches, searched
+with one batched index call, and the metrics are computed with numpy over
+the ranked policy IDs. With LLM_TRANSPORT_MODE=synthetic or replay the
+run needs no network at all.
+
+    python -m backend.retrieval_eval --eval-set artifacts/retrieval_eval_set.jsonl --k 1,3,5,10
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from .config import RETRIEVAL_EVAL_SET_PATH
+from .embeddings import get_embeddings
+from .lazy import lazy_import
+from .vector_store import VectorStore, vector_store
+
+np = lazy_import("numpy")
+
+EMBED_BATCH = 256
+
+
+def load_eval_set(path: Path = RETRIEVAL_EVAL_SET_PATH) -> List[Dict]:
+    items = []
+    with Path(path).open("r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if "relevance" in row:
+                relevance = {str(k): float(v) for k, v in row["relevance"].items()}
+            elif "relevant_policy_ids" in row:
+                relevance = {str(p): 1.0 for p in row["relevant_policy_ids"]}
+            else:
+                raise ValueError(f"{path}:{line_no}: needs 'relevant_policy_ids' or 'relevance'")
+            items.append({"question": row["question"], "relevance": relevance})
+    return items
+
+
+def ranked_policies(hits: List[Dict], depth: int) -> List[str]:
+    """Policy IDs in rank order, keeping only the first chunk of each policy."""
+    seen, ranked = set(), []
+    for h in hits:
+        pid = h.get("policy_id")
+        if pid and pid not in seen:
+            seen.add(pid)
+            ranked.append(pid)
+            if len(ranked) == depth:
+                break
+    return ranked
+
+
+def compute_metrics(rankings: List[List[str]], items: List[Dict], ks: Sequence[int]) -> Dict[str, float]:
+    """Vectorized recall@k, MRR and nDCG@k over a (queries x depth) gain matrix."""
+    depth = max(ks)
+    n = len(items)
+    gains = np.zeros((n, depth), dtype=np.float64)
+    for i, (ranked, item) in enumerate(zip(rankings, items)):
+        rel = item["relevance"]
+        for j, pid in enumerate(ranked[:depth]):
+            gains[i, j] = rel.get(pid, 0.0)
+
+    hits = gains > 0
+    num_relevant = np.array([sum(1 for g in it["relevance"].values() if g > 0) for it in items], dtype=np.float64)
+    num_relevant = np.maximum(num_relevant, 1.0)
+
+    # Ideal gains: each query's relevance grades sorted descending
+    ideal = np.zeros((n, depth), dtype=np.float64)
+    for i, item in enumerate(items):
+        grades = sorted(item["relevance"].values(), reverse=True)[:depth]
+        ideal[i, :len(grades)] = grades
+
+    discounts = 1.0 / np.log2(np.arange(2, depth + 2))
+    cum_hits = np.cumsum(hits, axis=1)
+    dcg = np.cumsum(gains * discounts, axis=1)
+    idcg = np.cumsum(ideal * discounts, axis=1)
+
+    first_hit = np.where(hits.any(axis=1), hits.argmax(axis=1) + 1, 0)
+    rr = np.where(first_hit > 0, 1.0 / np.maximum(first_hit, 1), 0.0)
+
+    metrics: Dict[str, float] = {"mrr": round(float(rr.mean()), 4)}
+    for k in ks:
+        metrics[f"recall@{k}"] = round(float((cum_hits[:, k - 1] / num_relevant).mean()), 4)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ndcg = np.where(idcg[:, k - 1] > 0, dcg[:, k - 1] / idcg[:, k - 1], 0.0)
+        metrics[f"ndcg@{k}"] = round(float(ndcg.mean()), 4)
+    return metrics
+
+
+def embed_questions(items: List[Dict]) -> List[List[float]]:
+    questions = [it["question"] for it in items]
+    vectors: List[List[float]] = []
+    for i in range(0, len(questions), EMBED_BATCH):
+        vectors.extend(get_embeddings(questions[i:i + EMBED_BATCH]))
+    return vectors
+
+
+def evaluate_retrieval(
+    items: List[Dict],
+    ks: Sequence[int] = (1, 3, 5, 10),
+    store: VectorStore = vector_store,
+    chunk_multiplier: int = 4,
+    vectors: List[List[float]] | None = None,
+) -> Dict:
+    """
+    Run batched retrieval for every labelled question and score it.
+    Several chunks can come from one policy, so `chunk_multiplier` x k
+    chunks are fetched before de-duplicating to policy IDs. Pass
+    `vectors` to reuse question embeddings across runs.
+    """
+    ks = sorted(set(int(k) for k in ks))
+    depth = max(ks)
+    start = time.perf_counter()
+
+    if vectors is None:
+        vectors = embed_questions(items)
+    embed_s = time.perf_counter() - start
+
+    search_start = time.perf_counter()
+    results = store.search_batch(vectors, k=depth * chunk_multiplier) if vectors else []
+    search_s = time.perf_counter() - search_start
+
+    rankings = [ranked_policies(hits, depth) for hits in results]
+    metrics = compute_metrics(rankings, items, ks) if items else {}
+
+    return {
+        "num_questions": len(items),
+        "metrics": metrics,
+        "timings_s": {
+            "embedding": round(embed_s, 3),
+            "search": round(search_s, 3),
+            "total": round(time.perf_counter() - start, 3),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval-quality evaluation")
+    parser.add_argument("--eval-set", default=str(RETRIEVAL_EVAL_SET_PATH))
+    parser.add_argument("--k", default="1,3,5,10", help="comma-separated cutoffs")
+    parser.add_argument("--index", help="FAISS index path (default: the API's index)")
+    parser.add_argument("--metadata", help="metadata JSON path (default: the API's metadata)")
+    parser.add_argument("--out", help="write the report JSON here")
+    args = parser.parse_args()
+
+    store = vector_store
+    if args.index or args.metadata:
+        store = VectorStore(args.index or store.index_path, args.metadata or store.metadata_path)
+    store.load()
+
+    report = evaluate_retrieval(load_eval_set(Path(args.eval_set)), [int(k) for k in args.k.split(",")], store)
+    print(json.dumps(report, indent=2))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import re
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from .metrics import (
+    QUERY_INFLIGHT_WAITERS,
+    QUERY_COALESCED_TOTAL,
+    QUERY_PIPELINE_EXECUTIONS_TOTAL,
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def query_key(query: str, **options: Any) -> Tuple:
+    """
+    Build the coalescing key for a query.
+    Case and whitespace differences are ignored; any options
+    (filters, execution mode, ...) must match exactly.
+    """
+    normalized = _WHITESPACE_RE.sub(" ", (query or "").strip().lower())
+    return (normalized, tuple(sorted(options.items())))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one execution.
+
+    The first caller (the leader) runs the function; callers arriving
+    while it is in flight block until it finishes and receive the same
+    result, or the same exception. Nothing is cached once the call
+    completes — the next request for the key runs the function again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Tuple[Any, bool]:
+        """Returns (result, shared) where shared is True for waiters."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            return self._wait(call), True
+
+        QUERY_PIPELINE_EXECUTIONS_TOTAL.inc()
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Remove before waking waiters so late arrivals start a fresh call
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+        return call.result, False
+
+    def _wait(self, call: _Call) -> Any:
+        QUERY_INFLIGHT_WAITERS.inc()
+        try:
+            call.done.wait()
+        finally:
+            QUERY_INFLIGHT_WAITERS.dec()
+
+        if call.error is not None:
+            QUERY_COALESCED_TOTAL.labels(outcome="error").inc()
+            raise call.error
+
+        QUERY_COALESCED_TOTAL.labels(outcome="success").inc()
+        return call.result
+
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+# GLOBAL INSTANCE
+query_flight = SingleFlight()
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+
+from .config import WARMUP, WARMUP_QUERY, TOP_K, SUMMARY_PRECOMPUTE
+from .logging_config import api_logger, error_logger
+from .metrics import COLD_START_SECONDS, API_READY
+
+PENDING, RUNNING, DONE, FAILED, SKIPPED = "pending", "running", "done", "failed", "skipped"
+
+
+def process_age_s() -> float | None:
+    """Seconds since the OS started this process (Linux), else None."""
+    try:
+        with open("/proc/self/stat") as f:
+            stat = f.read()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except OSError:
+        return None
+    # starttime is field 22; fields after the ")" start at field 3
+    start_ticks = int(stat[stat.rindex(")") + 2:].split()[19])
+    return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+class Readiness:
+    """
+    Startup progress reported by /ready.
+
+    Phases run in order on a background thread; the API accepts
+    connections (and answers /health and /ready) the whole time.
+    """
+
+    PHASES = ("import", "instrument_clients", "index_load", "warmup")
+
+    def __init__(self):
+        self.phases: Dict[str, Dict[str, Any]] = {p: {"status": PENDING} for p in self.PHASES}
+        self.ready = False
+        self.error: str | None = None
+        self.since_process_start_s: float | None = None
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def mark_imported(self, import_started: float):
+        """Record the API module import, counting startup from its first line."""
+        self._started = import_started
+        self.finish_phase("import", time.perf_counter() - import_started)
+
+    def finish_phase(self, name: str, seconds: float, status: str = DONE, **details: Any):
+        with self._lock:
+            self.phases[name] = {"status": status, "seconds": round(seconds, 3), **details}
+        COLD_START_SECONDS.labels(phase=name).set(seconds)
+
+    @contextmanager
+    def phase(self, name: str, **details: Any):
+        # The yielded dict is live: callers can add progress details to it
+        entry = {"status": RUNNING, **details}
+        with self._lock:
+            self.phases[name] = entry
+        start = time.perf_counter()
+        try:
+            yield entry
+        except Exception as e:
+            extra = {k: v for k, v in entry.items() if k != "status"}
+            self.finish_phase(name, time.perf_counter() - start, FAILED, error=str(e), **extra)
+            raise
+        extra = {k: v for k, v in entry.items() if k != "status"}
+        self.finish_phase(name, time.perf_counter() - start, **extra)
+
+    def mark_ready(self):
+        total = time.perf_counter() - self._started
+        with self._lock:
+            self.ready = True
+            self.since_process_start_s = process_age_s()
+        COLD_START_SECONDS.labels(phase="total").set(total)
+        API_READY.set(1)
+        api_logger.info(
+            f"API ready: {total:.2f}s since import started, "
+            f"{self.since_process_start_s or 0:.2f}s since process start"
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "error": self.error,
+                "elapsed_s": round(time.perf_counter() - self._started, 3),
+                "since_process_start_s": (
+                    round(self.since_process_start_s, 3) if self.since_process_start_s else None
+                ),
+                "phases": {k: dict(v) for k, v in self.phases.items()},
+            }
+
+
+def warm_up(readiness: Readiness, store):
+    """
+    Background startup: instrument HTTP clients, load the index, then
+    run one embedding + search so the first real query finds the SDK
+    imported, the connection pool open and FAISS pages resident.
+    """
+    try:
+        with readiness.phase("instrument_clients"):
+            from .opentelemetry_config import instrument_outgoing_clients
+            instrument_outgoing_clients()
+
+        size = os.path.getsize(store.index_path) if os.path.exists(store.index_path) else 0
+        if store.index is not None:
+            # Loaded by the gunicorn master before fork (preload mode)
+            readiness.finish_phase("index_load", 0.0, SKIPPED, reason="preloaded", chunks=len(store.metadatas))
+        else:
+            with readiness.phase("index_load", index_bytes=size) as progress:
+                store.load()
+                progress["chunks"] = len(store.metadatas)
+    except Exception as e:
+        readiness.error = str(e)
+        error_logger.error(f"Startup failed: {e}")
+        return
+
+    if not WARMUP:
+        readiness.finish_phase("warmup", 0.0, SKIPPED)
+    else:
+        # A failed warm-up only costs latency on the first query; stay ready
+        try:
+            with readiness.phase("warmup"):
+                from .embeddings import get_embedding
+                vector = get_embedding(WARMUP_QUERY)
+                if store.index is not None and len(vector) == store.dimension:
+                    store.search(vector, k=TOP_K)
+        except Exception as e:
+            error_logger.error(f"Warm-up failed, continuing cold: {e}")
+
+    readiness.mark_ready()
+
+    if SUMMARY_PRECOMPUTE and len(store.metadatas):
+        # Resumes any summaries an earlier run did not finish
+        from .summaries import summary_precomputer
+        summary_precomputer.schedule(store.metadatas)
+
+
+def start_background_warmup(readiness: Readiness, store) -> threading.Thread:
+    thread = threading.Thread(target=warm_up, args=(readiness, store), name="startup-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+# GLOBAL INSTANCE
+readiness = Readiness()
@@ -0,0 +1,373 @@
+"""
+Ingest-time chunk and policy summaries.
+
+Chunks are static between ingests, so they are summarised once in the
+background and the query-time summarizer only assembles the stored text.
+Summaries live in append-only JSONL files keyed by a hash of the chunk
+text: a re-ingested but unchanged chunk keeps its summary, an edited one
+gets a new one, and an interrupted run resumes where it stopped.
+"""
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .config import (
+    CHAT_MODEL,
+    SUMMARY_BATCH_SIZE,
+    SUMMARY_CONCURRENCY,
+    CHUNK_SUMMARIES_PATH,
+    POLICY_SUMMARIES_PATH,
+    SNAPSHOT_CHECK_INTERVAL_S,
+)
+from .instrumentation import agent_span
+from .llm_client import chat_completion
+from .logging_config import pipeline_logger, error_logger
+from .metrics import SUMMARIES_PRECOMPUTED_TOTAL, SUMMARY_BACKLOG
+from .rate_limiter import llm_priority, BATCH
+
+try:
+    import fcntl
+except ImportError:   # not on Windows; every process may run the backfill
+    fcntl = None
+
+# Backoff while another process holds the backfill lock
+LOCK_RETRY_S = 5.0
+LOCK_RETRY_MAX_S = 300.0
+
+CHUNK_PROMPT = (
+    "Summarise the following policy excerpt into key bullet points focused on "
+    "rules, thresholds, timelines, and obligations. Preserve any numbers or limits.\n\n"
+)
+BATCH_PROMPT = (
+    "Summarise each numbered policy excerpt into key bullet points focused on "
+    "rules, thresholds, timelines, and obligations. Preserve any numbers or limits. "
+    "Reply with a JSON object mapping each excerpt number (as a string) to its summary.\n\n"
+)
+POLICY_PROMPT = (
+    "Below are summaries of every section of one policy. Write a short overview "
+    "(at most 5 bullet points) of the policy's scope and its most important "
+    "rules, thresholds and deadlines.\n\n"
+)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+# ------------------------------------------------------------
+# STORE
+# ------------------------------------------------------------
+class SummaryStore:
+    """
+    In-memory view of the summary files. Other processes (gunicorn
+    workers) append to the same files; new lines are picked up at most
+    once per SNAPSHOT_CHECK_INTERVAL_S.
+    """
+
+    def __init__(self, chunk_path: Path = CHUNK_SUMMARIES_PATH, policy_path: Path = POLICY_SUMMARIES_PATH):
+        self.chunk_path = Path(chunk_path)
+        self.policy_path = Path(policy_path)
+        self._chunks: Dict[str, str] = {}
+        self._policies: Dict[str, Dict[str, str]] = {}
+        self._offsets = {self.chunk_path: 0, self.policy_path: 0}
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+
+    def chunk(self, metadata: Dict[str, Any]) -> str | None:
+        self._refresh()
+        # Compressed chunks carry their full text as original_text
+        text = metadata.get("original_text", metadata.get("text", ""))
+        return self._chunks.get(text_hash(text))
+
+    def policy(self, policy_id: str) -> str | None:
+        self._refresh()
+        row = self._policies.get(policy_id)
+        return row["summary"] if row else None
+
+    def covers(self, chunks: List[Dict[str, Any]]) -> bool:
+        """True when every chunk has a precomputed summary."""
+        return all(self.chunk(c) is not None for c in chunks)
+
+    def has_chunk(self, digest: str) -> bool:
+        return digest in self._chunks
+
+    def chunk_by_hash(self, digest: str) -> str | None:
+        return self._chunks.get(digest)
+
+    def policy_digest(self, policy_id: str) -> str | None:
+        row = self._policies.get(policy_id)
+        return row["digest"] if row else None
+
+    def add_chunks(self, rows: List[Dict[str, str]]):
+        """rows: {"hash", "summary"}"""
+        self._append(self.chunk_path, rows)
+
+    def add_policy(self, policy_id: str, digest: str, summary: str):
+        self._append(self.policy_path, [{"policy_id": policy_id, "digest": digest, "summary": summary}])
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def _append(self, path: Path, rows: List[Dict[str, str]]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r) + "\n" for r in rows))
+        self._read_new(path)
+
+    def reload(self):
+        self._read_new(self.chunk_path)
+        self._read_new(self.policy_path)
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + SNAPSHOT_CHECK_INTERVAL_S
+        self.reload()
+
+    def _read_new(self, path: Path):
+        """Load lines appended since the last read (complete lines only)."""
+        with self._lock:
+            try:
+                with path.open("rb") as f:
+                    f.seek(self._offsets[path])
+                    data = f.read()
+            except OSError:
+                return
+            end = data.rfind(b"\n") + 1
+            self._offsets[path] += end
+
+            for line in data[:end].splitlines():
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if path == self.chunk_path:
+                    self._chunks[row["hash"]] = row["summary"]
+                else:
+                    self._policies[row["policy_id"]] = row
+
+
+# ------------------------------------------------------------
+# BACKGROUND PRECOMPUTE
+# ------------------------------------------------------------
+def _summarize_one(text: str) -> str:
+    resp = chat_completion(
+        model=CHAT_MODEL,
+        messages=[{"role": "user", "content": CHUNK_PROMPT + text[:6000]}],
+        temperature=0.2,
+    )
+    return resp.choices[0].message.content
+
+
+def _summarize_batch(texts: List[str]) -> List[str]:
+    """One call for several chunks; falls back to one call each if the reply can't be parsed."""
+    if len(texts) == 1:
+        return [_summarize_one(texts[0])]
+
+    per_chunk = max(500, 6000 // len(texts))
+    body = "\n\n".join(f"[{i}] {t[:per_chunk]}" for i, t in enumerate(texts, 1))
+    resp = chat_completion(
+        model=CHAT_MODEL,
+        messages=[{"role": "user", "content": BATCH_PROMPT + body}],
+        temperature=0.2,
+        response_format={"type": "json_object"},
+    )
+    try:
+        parsed = json.loads(resp.choices[0].message.content)
+        summaries = [parsed[str(i)] for i in range(1, len(texts) + 1)]
+        if all(isinstance(s, str) and s.strip() for s in summaries):
+            return summaries
+    except (ValueError, KeyError, TypeError):
+        pass
+    return [_summarize_one(t) for t in texts]
+
+
+class SummaryPrecomputer:
+    """
+    Fills the SummaryStore for every chunk in the index, then writes one
+    overview per policy. `schedule()` only queues the work; a single
+    daemon thread runs it in batches of `batch_size` chunks with
+    `concurrency` calls in flight. Across processes a lock file makes
+    sure only one of them runs the backfill at a time; a job that finds
+    the lock taken is retried with backoff.
+    """
+
+    def __init__(self, store: SummaryStore, batch_size: int = SUMMARY_BATCH_SIZE, concurrency: int = SUMMARY_CONCURRENCY):
+        self.store = store
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self._jobs: "queue.Queue[List[Dict[str, Any]]]" = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._count_lock = threading.Lock()
+        self.busy = False
+        self.pending = 0
+        self.done = 0
+        self.failed = 0
+        self.last_error: str | None = None
+
+    def schedule(self, metadatas) -> int:
+        """Queue summarisation for chunks that have no summary yet; returns their count."""
+        snapshot = list(metadatas)
+        missing = sum(
+            not self.store.has_chunk(h) for h in {text_hash(m.get("text", "")) for m in snapshot}
+        )
+        self.busy = True
+        self._jobs.put(snapshot)
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="summary-precompute", daemon=True)
+                self._thread.start()
+        return missing
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.busy,
+            "pending": self.pending,
+            "done": self.done,
+            "failed": self.failed,
+            "stored_chunks": len(self.store),
+            "last_error": self.last_error,
+        }
+
+    def _run(self):
+        deferred, delay = None, LOCK_RETRY_S
+        while True:
+            try:
+                metadatas = self._jobs.get(timeout=None if deferred is None else delay)
+            except queue.Empty:
+                metadatas = deferred
+                delay = min(delay * 2, LOCK_RETRY_MAX_S)
+            # Only the newest snapshot matters if several ingests queued up
+            while not self._jobs.empty():
+                metadatas = self._jobs.get()
+            deferred = None
+            try:
+                with _FileLock(self.store.chunk_path.with_suffix(".lock")) as owner:
+                    if owner:
+                        self._backfill(metadatas)
+                        delay = LOCK_RETRY_S
+                    else:
+                        # The other process backfills its own snapshot, which may
+                        # not include this worker's chunks: retry ours later
+                        deferred = metadatas
+                        pipeline_logger.info(
+                            f"Summary precompute deferred: another process holds the lock, retrying in {delay:g}s"
+                        )
+            except Exception as e:
+                self.last_error = str(e)
+                error_logger.error(f"Summary precompute failed: {e}")
+            finally:
+                self.busy = deferred is not None or not self._jobs.empty()
+
+    def _backfill(self, metadatas: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        self.store.reload()
+
+        # Distinct chunk texts without a summary, in index order
+        todo: "OrderedDict[str, str]" = OrderedDict()
+        for m in metadatas:
+            digest = text_hash(m.get("text", ""))
+            if not self.store.has_chunk(digest) and digest not in todo:
+                todo[digest] = m.get("text", "")
+        self.pending = len(todo)
+        SUMMARY_BACKLOG.set(self.pending)
+
+        items = list(todo.items())
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="summary") as pool:
+            for _ in pool.map(self._run_batch, batches):
+                pass
+
+        self._policies(metadatas)
+        pipeline_logger.info(
+            f"Summary precompute finished: {len(items)} chunks in {time.perf_counter() - start:.1f}s, "
+            f"{self.failed} failed"
+        )
+
+    def _run_batch(self, batch: List[tuple]):
+        try:
+            with agent_span("summary_precompute", chunks=len(batch)), llm_priority(BATCH):
+                summaries = _summarize_batch([text for _, text in batch])
+            # Persisted per batch, so a restart resumes from here
+            self.store.add_chunks([{"hash": h, "summary": s} for (h, _), s in zip(batch, summaries)])
+            with self._count_lock:
+                self.done += len(batch)
+            SUMMARIES_PRECOMPUTED_TOTAL.labels(kind="chunk").inc(len(batch))
+        except Exception as e:
+            with self._count_lock:
+                self.failed += len(batch)
+            self.last_error = str(e)
+            error_logger.error(f"Summary batch of {len(batch)} chunks failed: {e}")
+        finally:
+            with self._count_lock:
+                self.pending -= len(batch)
+                SUMMARY_BACKLOG.set(max(self.pending, 0))
+
+    def _policies(self, metadatas: List[Dict[str, Any]]):
+        """One overview per policy whose chunk set changed since its last overview."""
+        by_policy: "OrderedDict[str, List[str]]" = OrderedDict()
+        for m in metadatas:
+            if m.get("policy_id"):
+                by_policy.setdefault(m["policy_id"], []).append(text_hash(m.get("text", "")))
+
+        for policy_id, hashes in by_policy.items():
+            if not all(self.store.has_chunk(h) for h in hashes):
+                continue   # retried on the next schedule()
+            digest = text_hash("".join(hashes))
+            if self.store.policy_digest(policy_id) == digest:
+                continue
+
+            joined = "\n".join(self.store.chunk_by_hash(h) for h in dict.fromkeys(hashes))[:6000]
+            try:
+                with agent_span("summary_precompute", policy_id=policy_id), llm_priority(BATCH):
+                    resp = chat_completion(
+                        model=CHAT_MODEL,
+                        messages=[{"role": "user", "content": POLICY_PROMPT + joined}],
+                        temperature=0.2,
+                    )
+                self.store.add_policy(policy_id, digest, resp.choices[0].message.content)
+                SUMMARIES_PRECOMPUTED_TOTAL.labels(kind="policy").inc()
+            except Exception as e:
+                self.last_error = str(e)
+                error_logger.error(f"Policy summary for {policy_id} failed: {e}")
+
+
+class _FileLock:
+    """Non-blocking exclusive lock; `owner` is False if another process holds it."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self) -> bool:
+        if fcntl is None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            os.close(self._fd)
+            self._fd = None
+            return False
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+# GLOBAL INSTANCE
+summary_store = SummaryStore()
+summary_precomputer = SummaryPrecomputer(summary_store)
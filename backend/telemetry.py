@@ -0,0 +1,160 @@
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List
+
+from .config import TELEMETRY_RECENT_MAX, TELEMETRY_SKETCH_ACCURACY
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+# ------------------------------------------------------------
+# STREAMING PERCENTILE SKETCH
+# ------------------------------------------------------------
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch style).
+
+    Values land in geometric buckets of ratio gamma, so every quantile
+    is within `relative_accuracy` of the true value. Inserts are O(1)
+    and memory depends on the value range, not on how many values
+    were added (about 1k buckets span 1ms..1h at 1% accuracy).
+    """
+
+    def __init__(self, relative_accuracy: float = TELEMETRY_SKETCH_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 0:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def quantile(self, q: float) -> float | None:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Midpoint of the bucket keeps the error symmetric
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def summary(self, scale: float = 1.0, digits: int = 3) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"count": self.count}
+        if self.count:
+            out["mean"] = round(self.mean() * scale, digits)
+            for q in QUANTILES:
+                out[f"p{int(q * 100)}"] = round(self.quantile(q) * scale, digits)
+            out["max"] = round(self.max * scale, digits)
+        return out
+
+
+# ------------------------------------------------------------
+# IN-PROCESS TELEMETRY STORE
+# ------------------------------------------------------------
+class Telemetry:
+    """
+    Recent queries, latency sketches and counters kept in memory.
+
+    `record()` is called once per answered (or failed) query; reading
+    is constant-time and never touches disk or the pipeline, so the
+    dashboard can poll /stats and /recent-queries freely. Everything
+    resets when the process restarts — Prometheus holds the history.
+    """
+
+    def __init__(self, recent_max: int = TELEMETRY_RECENT_MAX):
+        self.started = time.time()
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=recent_max)
+        self._lock = threading.Lock()
+
+        self.latency = QuantileSketch()
+        self.stage_latency: Dict[str, QuantileSketch] = {}
+
+        self.total = 0
+        self.errors = 0
+        self.degraded = 0
+        self.coalesced = 0
+        self.by_status: Dict[int, int] = {}
+
+    def record(
+        self,
+        query: str,
+        latency_s: float,
+        status: int = 200,
+        stage_ms: Dict[str, float] | None = None,
+        degraded: bool = False,
+        coalesced: bool = False,
+        endpoint: str = "/query",
+    ):
+        row = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "endpoint": endpoint,
+            "query": query[:200],
+            "latency": round(latency_s, 3),
+            "status": status,
+            "degraded": degraded,
+        }
+        with self._lock:
+            self._recent.append(row)
+            self.total += 1
+            self.by_status[status] = self.by_status.get(status, 0) + 1
+            if status >= 400:
+                self.errors += 1
+                return
+            self.degraded += int(degraded)
+            self.coalesced += int(coalesced)
+            self.latency.add(latency_s)
+            for stage, ms in (stage_ms or {}).items():
+                sketch = self.stage_latency.get(stage)
+                if sketch is None:
+                    sketch = self.stage_latency[stage] = QuantileSketch()
+                sketch.add(ms)
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Newest first."""
+        with self._lock:
+            n = min(max(limit, 0), len(self._recent))
+            return [self._recent[-i] for i in range(1, n + 1)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "uptime_s": round(time.time() - self.started, 1),
+                "queries_total": self.total,
+                "errors_total": self.errors,
+                "error_rate": round(self.errors / self.total, 4) if self.total else 0.0,
+                "degraded_total": self.degraded,
+                "coalesced_total": self.coalesced,
+                "by_status": {str(k): v for k, v in self.by_status.items()},
+                "latency_s": self.latency.summary(),
+                "stage_latency_ms": {
+                    stage: sketch.summary(digits=1) for stage, sketch in self.stage_latency.items()
+                },
+            }
+
+
+# GLOBAL INSTANCE
+telemetry = Telemetry()
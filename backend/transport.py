@@ -0,0 +1,316 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Tuple
+
+import httpx
+
+# ------------------------------------------------------------
+# Pluggable httpx transports for the shared OpenAI client
+# ------------------------------------------------------------
+#   live       real network (default)
+#   record     real network, every request/response saved as a cassette
+#   replay     cassettes served back, no network
+#   synthetic  deterministic fake embeddings/completions, no network
+TRANSPORT_MODES = ("live", "record", "replay", "synthetic")
+
+
+def request_key(request: httpx.Request) -> str:
+    """Stable cassette key: method + path + canonical JSON body."""
+    body = request.content or b""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True).encode("utf-8")
+    except ValueError:
+        pass
+    h = hashlib.sha256()
+    h.update(request.method.encode("utf-8"))
+    h.update(request.url.path.encode("utf-8"))
+    h.update(body)
+    return h.hexdigest()
+
+
+def _json_response(status: int, payload: Dict, request: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        status,
+        headers={"content-type": "application/json"},
+        content=json.dumps(payload).encode("utf-8"),
+        request=request,
+    )
+
+
+# ------------------------------------------------------------
+# RECORD
+# ------------------------------------------------------------
+class RecordingTransport(httpx.BaseTransport):
+    """Forwards to a real transport and writes each exchange to a cassette."""
+
+    def __init__(self, inner: httpx.BaseTransport, cassette_dir: Path):
+        self._inner = inner
+        self._dir = Path(cassette_dir)
+        self._dir.mkdir(parents=True, exist_ok=True)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        response = self._inner.handle_request(request)
+        response.read()
+        latency = time.perf_counter() - start
+
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {"error": {"message": response.text}}
+
+        cassette = {
+            "method": request.method,
+            "path": request.url.path,
+            "request": json.loads(request.content or b"null"),
+            "status": response.status_code,
+            "response": payload,
+            "latency_s": round(latency, 4),
+        }
+        path = self._dir / f"{request_key(request)}.json"
+        path.write_text(json.dumps(cassette), encoding="utf-8")
+
+        return _json_response(response.status_code, payload, request)
+
+    def close(self):
+        self._inner.close()
+
+
+# ------------------------------------------------------------
+# REPLAY
+# ------------------------------------------------------------
+class ReplayTransport(httpx.BaseTransport):
+    """
+    Serves recorded cassettes. Uses the recorded latency unless
+    `latency_ms` is set. Unknown requests get a 404 naming the key.
+    """
+
+    def __init__(self, cassette_dir: Path, latency_ms: float | None = None):
+        self._dir = Path(cassette_dir)
+        self._latency = None if latency_ms is None else latency_ms / 1000.0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        path = self._dir / f"{key}.json"
+        if not path.exists():
+            return _json_response(
+                404,
+                {"error": {"message": f"No cassette for {request.url.path} ({key})"}},
+                request,
+            )
+
+        cassette = json.loads(path.read_text(encoding="utf-8"))
+        delay = cassette.get("latency_s", 0.0) if self._latency is None else self._latency
+        if delay > 0:
+            time.sleep(delay)
+        return _json_response(cassette["status"], cassette["response"], request)
+
+
+# ------------------------------------------------------------
+# SYNTHETIC
+# ------------------------------------------------------------
+_VOCAB = [
+    "policy", "requires", "retention", "approval", "employees", "must",
+    "data", "access", "review", "within", "days", "compliance",
+]
+
+
+def _token_count(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def synthetic_embedding(text: str, dim: int) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vec = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = sum(v * v for v in vec) ** 0.5 or 1.0
+    return [v / norm for v in vec]
+
+
+def synthetic_completion(prompt: str, words: int) -> str:
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+    return " ".join(rng.choice(_VOCAB) for _ in range(words)) + "."
+
+
+def synthetic_chat_response(body: Dict, words: int = 120) -> Dict:
+    prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        # Structured output: one generated string per schema field
+        fields = response_format["json_schema"]["schema"].get("properties", {})
+        content = json.dumps({name: synthetic_completion(prompt + name, words) for name in fields})
+    else:
+        content = synthetic_completion(prompt, words)
+    prompt_tokens, completion_tokens = _token_count(prompt), _token_count(content)
+    return {
+        "id": "chatcmpl-synthetic",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "synthetic"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def synthetic_embeddings_response(body: Dict, dim: int = 3072) -> Dict:
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    tokens = sum(_token_count(t) for t in inputs)
+    return {
+        "object": "list",
+        "model": body.get("model", "synthetic"),
+        "data": [
+            {"object": "embedding", "index": i, "embedding": synthetic_embedding(t, dim)}
+            for i, t in enumerate(inputs)
+        ],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+class ProviderRateLimits:
+    """
+    Per-model requests/tokens-per-minute limits over a sliding minute, as
+    the real API enforces them (0 = unlimited). Used by the synthetic
+    transport and benchmarks.fake_provider.
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.rejected = 0
+        self._windows: Dict[str, Deque[Tuple[float, int]]] = {}
+        self._lock = threading.Lock()
+
+    def admit(self, model: str, tokens: int) -> Tuple[bool, Dict[str, str]]:
+        """Returns (allowed, x-ratelimit-* headers; retry-after-ms when rejected)."""
+        if not (self.rpm or self.tpm):
+            return True, {}
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(model, deque())
+            while window and now - window[0][0] >= 60.0:
+                window.popleft()
+            used_requests = len(window)
+            used_tokens = sum(t for _, t in window)
+            allowed = (not self.rpm or used_requests < self.rpm) and \
+                (not self.tpm or used_tokens + tokens <= self.tpm)
+            if allowed:
+                window.append((now, tokens))
+                used_requests += 1
+                used_tokens += tokens
+            else:
+                self.rejected += 1
+            reset = 60.0 - (now - window[0][0]) if window else 0.0
+
+        headers = {}
+        if self.rpm:
+            headers["x-ratelimit-limit-requests"] = str(self.rpm)
+            headers["x-ratelimit-remaining-requests"] = str(max(0, self.rpm - used_requests))
+            headers["x-ratelimit-reset-requests"] = f"{reset:.3f}s"
+        if self.tpm:
+            headers["x-ratelimit-limit-tokens"] = str(self.tpm)
+            headers["x-ratelimit-remaining-tokens"] = str(max(0, self.tpm - used_tokens))
+            headers["x-ratelimit-reset-tokens"] = f"{reset:.3f}s"
+        if not allowed:
+            headers["retry-after-ms"] = str(int(reset * 1000) + 1)
+        return allowed, headers
+
+
+RATE_LIMIT_ERROR = {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+
+
+class SyntheticTransport(httpx.BaseTransport):
+    """
+    Deterministic OpenAI-shaped responses with a fixed injected latency.
+    With `rpm`/`tpm` set it enforces rate limits like the real API
+    (ProviderRateLimits).
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        embedding_dim: int = 3072,
+        completion_words: int = 120,
+        rpm: int = 0,
+        tpm: int = 0,
+    ):
+        self._latency = latency_ms / 1000.0
+        self._dim = embedding_dim
+        self._words = completion_words
+        self.limits = ProviderRateLimits(rpm, tpm)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.requests += 1
+        if self._latency > 0:
+            time.sleep(self._latency)
+
+        body = json.loads(request.content or b"{}")
+        path = request.url.path
+        if path.endswith("/chat/completions"):
+            payload = synthetic_chat_response(body, self._words)
+        elif path.endswith("/embeddings"):
+            payload = synthetic_embeddings_response(body, self._dim)
+        else:
+            return _json_response(404, {"error": {"message": f"Unknown path {path}"}}, request)
+
+        allowed, headers = self.limits.admit(body.get("model", "synthetic"), payload["usage"]["total_tokens"])
+        if not allowed:
+            payload = RATE_LIMIT_ERROR
+        response = _json_response(200 if allowed else 429, payload, request)
+        response.headers.update(headers)
+        return response
+
+
+# ------------------------------------------------------------
+# RATE-LIMIT SCHEDULING
+# ------------------------------------------------------------
+class RateLimitedTransport(httpx.BaseTransport):
+    """
+    Waits for rate-limit capacity (rate_limiter.scheduler) before each
+    request and feeds the response's rate-limit headers back to it.
+    """
+
+    def __init__(self, inner: httpx.BaseTransport, scheduler):
+        self._inner = inner
+        self._scheduler = scheduler
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        from .rate_limiter import PRIORITIES, PRIORITY_HEADER, current_priority, current_max_wait, estimate_tokens
+
+        try:
+            body = json.loads(request.content or b"{}")
+        except ValueError:
+            body = {}
+        limiter = self._scheduler.limiter(str(body.get("model", "unknown")))
+        pinned = request.headers.pop(PRIORITY_HEADER, None)
+        priority = pinned if pinned in PRIORITIES else current_priority()
+
+        try:
+            limiter.acquire(estimate_tokens(body), priority, current_max_wait())
+        except TimeoutError as e:
+            # The OpenAI SDK reports httpx timeouts as APITimeoutError
+            raise httpx.PoolTimeout(str(e), request=request) from e
+
+        response = self._inner.handle_request(request)
+        limiter.observe(response.status_code, response.headers, priority)
+        return response
+
+    def close(self):
+        self._inner.close()
@@ -0,0 +1,150 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from .config import LLM_PRICES, USAGE_DAYS_KEPT
+from .metrics import LLM_COST_USD_TOTAL, QUERY_TOKENS, QUERY_COST_USD
+
+
+# ------------------------------------------------------------
+# PRICING
+# ------------------------------------------------------------
+def price_for(model: str) -> List[float]:
+    """[prompt, completion] USD per 1M tokens; longest matching prefix wins."""
+    best = ""
+    for name in LLM_PRICES:
+        if model.startswith(name) and len(name) > len(best):
+            best = name
+    return LLM_PRICES[best] if best else [0.0, 0.0]
+
+
+def cost_usd(model: str, prompt_tokens: float, completion_tokens: float) -> float:
+    prompt_price, completion_price = price_for(model or "")
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+# ------------------------------------------------------------
+# PER-REQUEST ACCUMULATOR
+# ------------------------------------------------------------
+class Usage:
+    """Token and cost totals for one unit of work, broken down by stage."""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, prompt: float, completion: float, cost: float, calls: float = 1):
+        with self._lock:
+            row = self.stages.setdefault(
+                stage, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+            )
+            row["calls"] += calls
+            row["prompt_tokens"] += prompt
+            row["completion_tokens"] += completion
+            row["cost_usd"] += cost
+
+    def merge(self, other: "Usage", fraction: float = 1.0):
+        """Add `fraction` of another accumulator (shared batch calls)."""
+        for stage, row in other.to_dict()["stages"].items():
+            self.add(
+                stage,
+                row["prompt_tokens"] * fraction,
+                row["completion_tokens"] * fraction,
+                row["cost_usd"] * fraction,
+                calls=row["calls"] * fraction,
+            )
+
+    def totals(self) -> Dict[str, float]:
+        with self._lock:
+            rows = list(self.stages.values())
+        return {
+            "calls": sum(r["calls"] for r in rows),
+            "prompt_tokens": sum(r["prompt_tokens"] for r in rows),
+            "completion_tokens": sum(r["completion_tokens"] for r in rows),
+            "cost_usd": sum(r["cost_usd"] for r in rows),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {s: _rounded(r) for s, r in self.stages.items()}
+        return {"total": _rounded(self.totals()), "stages": stages}
+
+
+def _rounded(row: Dict[str, float]) -> Dict[str, float]:
+    return {
+        "calls": round(row["calls"], 2),
+        "prompt_tokens": round(row["prompt_tokens"]),
+        "completion_tokens": round(row["completion_tokens"]),
+        "cost_usd": round(row["cost_usd"], 6),
+    }
+
+
+_current_usage: ContextVar[Usage | None] = ContextVar("rag_current_usage", default=None)
+
+
+def current_usage() -> Usage | None:
+    return _current_usage.get()
+
+
+@contextmanager
+def track_usage():
+    """Collect every provider call made in this context into a fresh Usage."""
+    usage = Usage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def observe_query(usage: Usage):
+    totals = usage.totals()
+    QUERY_TOKENS.observe(totals["prompt_tokens"] + totals["completion_tokens"])
+    QUERY_COST_USD.observe(totals["cost_usd"])
+
+
+# ------------------------------------------------------------
+# DAILY LEDGER
+# ------------------------------------------------------------
+class UsageLedger:
+    """Per-UTC-day, per-stage totals for the last `days_kept` days (in memory)."""
+
+    def __init__(self, days_kept: int = USAGE_DAYS_KEPT):
+        self.days_kept = max(1, days_kept)
+        self._days: "OrderedDict[str, Usage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, prompt: float, completion: float, cost: float):
+        day = datetime.now(timezone.utc).date().isoformat()
+        with self._lock:
+            usage = self._days.get(day)
+            if usage is None:
+                usage = self._days[day] = Usage()
+                while len(self._days) > self.days_kept:
+                    self._days.popitem(last=False)
+        usage.add(stage, prompt, completion, cost)
+
+    def daily(self, days: int | None = None) -> Dict[str, Any]:
+        with self._lock:
+            items = list(self._days.items())
+        if days is not None:
+            items = items[-days:]
+        return {day: usage.to_dict() for day, usage in reversed(items)}
+
+
+# GLOBAL INSTANCE
+usage_ledger = UsageLedger()
+
+
+def add_usage(agent: str, model: str, prompt: int, completion: int):
+    """Account one provider call: Prometheus, the daily ledger and the current request."""
+    cost = cost_usd(model, prompt, completion)
+    LLM_COST_USD_TOTAL.labels(agent=agent, model=model or "unknown").inc(cost)
+    usage_ledger.add(agent, prompt, completion, cost)
+
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.add(agent, prompt, completion, cost)
@@ -1,46 +1,264 @@
 import os
 import json
-import numpy as np
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-import faiss
+
+from .config import VECTOR_STORE_MMAP, SNAPSHOT_CHECK_INTERVAL_S
+from .instrumentation import agent_span
+from .lazy import lazy_import
+from .metrics import FAISS_SEARCH_SECONDS, VECTOR_STORE_CHUNKS
+
+# Loaded on first use so importing the API stays cheap
+np = lazy_import("numpy")
+faiss = lazy_import("faiss")
+
+try:
+    import fcntl
+except ImportError:   # not on Windows; snapshot reads and writes are unsynchronised there
+    fcntl = None
 
 VECTOR_INDEX_PATH = "/app/artifacts/faiss_index.bin"
 METADATA_PATH = "/app/artifacts/metadata.json"
 
 
+# ------------------------------------------------------------
+# MEMORY-MAPPED METADATA
+# ------------------------------------------------------------
+class MmapMetadata:
+    """
+    Read-only metadata list backed by a JSONL file and an offsets array,
+    both memory-mapped. Workers share the pages instead of each holding
+    a private list of dicts; each lookup parses one line.
+    """
+
+    def __init__(self, jsonl_path: str, offsets_path: str):
+        self._data = np.memmap(jsonl_path, dtype=np.uint8, mode="r") if os.path.getsize(jsonl_path) else b""
+        self._offsets = np.load(offsets_path, mmap_mode="r")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(bytes(self._data[start:end]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+@contextmanager
+def _file_lock(path: str, exclusive: bool):
+    """Cross-process lock: save() holds it exclusively, snapshot reads shared."""
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(path, os.O_CREAT | os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def _write_atomic(path: str, write):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    write(tmp)
+    os.replace(tmp, path)
+
+
 class VectorStore:
-    def __init__(self):
+    def __init__(self, index_path=VECTOR_INDEX_PATH, metadata_path=METADATA_PATH, mmap=VECTOR_STORE_MMAP):
         self.index = None          # FAISS index
-        self.metadatas = []        # List of metadata dicts
+        self.metadatas = []        # List of metadata dicts (MmapMetadata in mmap mode)
         self.dimension = None      # Embedding dimension
+        self.policy_ids = set()    # Distinct documents, kept in step with metadatas
+        self.index_path = str(index_path)
+        self.metadata_path = str(metadata_path)
+        self.mmap = mmap
+
+        # Snapshot written by save(); other workers reload when it changes
+        self.version = None
+        self._mapped = False       # index/metadata currently mapped read-only
+        self._swap_lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._writer = None        # thread holding the exclusive snapshot lock
+        self._next_check = 0.0
+
+    @property
+    def version_path(self):
+        return f"{self.index_path}.version"
+
+    @property
+    def _lock_path(self):
+        return f"{self.index_path}.lock"
+
+    @property
+    def _jsonl_path(self):
+        return f"{self.metadata_path}.jsonl"
+
+    @property
+    def _offsets_path(self):
+        return f"{self.metadata_path}.offsets.npy"
+
+    def _read_version(self):
+        try:
+            with open(self.version_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
 
     # --------------------------------------------------------
     # LOAD EXISTING INDEX + METADATA
     # --------------------------------------------------------
     def load(self):
         """Load FAISS index + metadata from disk."""
-        if os.path.exists(VECTOR_INDEX_PATH):
-            self.index = faiss.read_index(VECTOR_INDEX_PATH)
-            self.dimension = self.index.d    # Extract vector dimension
-        else:
-            self.index = None
+        self._swap_in(*self._read_snapshot(self.mmap), mapped=self.mmap)
+
+    def _read_snapshot(self, mmap: bool):
+        """Index, metadata, policy ids and version of one published snapshot."""
+        # A concurrent save() would otherwise pair a new index with old metadata
+        with self._snapshot_lock(exclusive=False):
+            snapshot = self._read_version()
 
-        if os.path.exists(METADATA_PATH):
-            with open(METADATA_PATH, "r") as f:
-                self.metadatas = json.load(f)
+            index = None
+            if os.path.exists(self.index_path):
+                # IO_FLAG_MMAP_IFC maps the vectors in place instead of copying them
+                flags = faiss.IO_FLAG_MMAP_IFC if mmap else 0
+                index = faiss.read_index(self.index_path, flags)
+
+            if mmap and os.path.exists(self.metadata_path):
+                if not os.path.exists(self._offsets_path):
+                    with open(self.metadata_path, "r") as f:
+                        self._write_metadata_sidecar(json.load(f))
+                metadatas = MmapMetadata(self._jsonl_path, self._offsets_path)
+            elif os.path.exists(self.metadata_path):
+                with open(self.metadata_path, "r") as f:
+                    metadatas = json.load(f)
+            else:
+                metadatas = []
+
+        if snapshot and "policy_ids" in snapshot:
+            policy_ids = set(snapshot["policy_ids"])
         else:
-            self.metadatas = []
+            policy_ids = {m.get("policy_id") for m in metadatas if m.get("policy_id")}
+        return index, metadatas, policy_ids, snapshot.get("version") if snapshot else None
+
+    def _swap_in(self, index, metadatas, policy_ids, version, mapped: bool):
+        # Searches read index + metadatas as a pair, so swap them together
+        with self._swap_lock:
+            self.index, self.metadatas = index, metadatas
+            self.dimension = index.d if index is not None else None
+            self.policy_ids = policy_ids
+            self.version = version
+            self._mapped = mapped
+        VECTOR_STORE_CHUNKS.set(len(metadatas))
+
+    def refresh_if_stale(self):
+        """Reload when another worker has saved a newer snapshot (rate-limited)."""
+        with self._check_lock:
+            now = time.monotonic()
+            if now < self._next_check:
+                return False
+            self._next_check = now + SNAPSHOT_CHECK_INTERVAL_S
+
+        snapshot = self._read_version()
+        if snapshot is None or snapshot.get("version") == self.version:
+            return False
+        self.load()
+        return True
 
     # --------------------------------------------------------
     # SAVE INDEX + METADATA
     # --------------------------------------------------------
+    @contextmanager
+    def writing(self):
+        """
+        Exclusive read-modify-write across workers and threads: add() starts
+        from the latest published snapshot and save() publishes it before any
+        other writer can start, so concurrent ingests never drop each other's
+        chunks. Re-entrant for the holding thread.
+        """
+        with self._write_lock:
+            if self._writer == threading.get_ident():
+                yield self
+                return
+            with _file_lock(self._ensure_lock_path(), exclusive=True):
+                self._writer = threading.get_ident()
+                try:
+                    yield self
+                finally:
+                    self._writer = None
+
+    @contextmanager
+    def _snapshot_lock(self, exclusive: bool):
+        if self._writer == threading.get_ident():
+            yield   # already held exclusively by this thread
+            return
+        with _file_lock(self._ensure_lock_path(), exclusive=exclusive):
+            yield
+
+    def _ensure_lock_path(self):
+        Path(self._lock_path).parent.mkdir(parents=True, exist_ok=True)
+        return self._lock_path
+
     def save(self):
-        """Persist FAISS index + metadata to disk."""
-        if self.index is not None:
-            faiss.write_index(self.index, VECTOR_INDEX_PATH)
+        """
+        Persist FAISS index + metadata to disk, then publish a new snapshot
+        version. Files are replaced atomically, so workers that still map
+        the previous files keep searching them until they reload.
+        """
+        Path(self.index_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(self.metadata_path).parent.mkdir(parents=True, exist_ok=True)
+        with self.writing():
+            self._save()
+
+    def _save(self):
+        with self._swap_lock:
+            index, metadatas, policy_ids = self.index, list(self.metadatas), sorted(self.policy_ids)
+        if index is not None:
+            _write_atomic(self.index_path, lambda p: faiss.write_index(index, p))
+
+        def write_json(p):
+            with open(p, "w") as f:
+                json.dump(metadatas, f, indent=2)
+
+        _write_atomic(self.metadata_path, write_json)
+        self._write_metadata_sidecar(metadatas)
 
-        with open(METADATA_PATH, "w") as f:
-            json.dump(self.metadatas, f, indent=2)
+        version = time.time_ns()
+        snapshot = {"version": version, "chunks": len(metadatas), "policy_ids": policy_ids}
+
+        def write_version(p):
+            with open(p, "w") as f:
+                json.dump(snapshot, f)
+
+        _write_atomic(self.version_path, write_version)
+        self.version = version
+
+    def _write_metadata_sidecar(self, metadatas):
+        """JSONL + offsets used by MmapMetadata."""
+        offsets = [0]
+
+        def write_jsonl(p):
+            with open(p, "wb") as f:
+                for m in metadatas:
+                    line = json.dumps(m).encode("utf-8") + b"\n"
+                    f.write(line)
+                    offsets.append(offsets[-1] + len(line))
+
+        def write_offsets(p):
+            with open(p, "wb") as f:
+                np.save(f, np.array(offsets, dtype=np.uint64))
+
+        _write_atomic(self._jsonl_path, write_jsonl)
+        _write_atomic(self._offsets_path, write_offsets)
 
     # --------------------------------------------------------
     # CREATE NEW HNSW INDEX
@@ -51,60 +269,96 @@ class VectorStore:
         index.hnsw.efConstruction = 40
         return index
 
+    def _writable_copy(self):
+        # Searches keep using the published index and metadata, so ingest works
+        # on private copies of the latest snapshot (mapped data is read-only,
+        # and another worker may have published since this one loaded)
+        snapshot = self._read_version()
+        latest = snapshot.get("version") if snapshot else None
+        if self._mapped or latest != self.version:
+            return self._read_snapshot(mmap=False)
+        with self._swap_lock:
+            index, metadatas, policy_ids = self.index, self.metadatas, self.policy_ids
+        index = faiss.clone_index(index) if index is not None else None
+        return index, list(metadatas), set(policy_ids), self.version
+
     # --------------------------------------------------------
     # ADD NEW VECTORS
     # --------------------------------------------------------
     def add(self, vectors, metadata):
+        """
+        Add vectors + metadata and publish them to searches in one swap.
+        Wrap add() and save() in writing() so no other writer publishes
+        in between.
+        """
         vectors = np.array(vectors).astype("float32")
 
-        # Set dimension if this is the first batch
-        if self.index is None:
-            self.dimension = vectors.shape[1]
-            self.index = self._create_hnsw(self.dimension)
+        with self.writing():
+            index, metadatas, policy_ids, version = self._writable_copy()
 
-        # Ensure dimensions match
-        if vectors.shape[1] != self.dimension:
-            raise ValueError("Vector dimension mismatch")
+            # Create the index on the first batch
+            if index is None:
+                index = self._create_hnsw(vectors.shape[1])
 
-        # Add to FAISS
-        self.index.add(vectors)
+            # Ensure dimensions match
+            if vectors.shape[1] != index.d:
+                raise ValueError("Vector dimension mismatch")
 
-        # Merge metadata
-        self.metadatas.extend(metadata)
+            index.add(vectors)
+            metadatas.extend(metadata)
+            policy_ids.update(m.get("policy_id") for m in metadata if m.get("policy_id"))
+            self._swap_in(index, metadatas, policy_ids, version, mapped=False)
 
     # --------------------------------------------------------
     # SEARCH TOP-K
     # --------------------------------------------------------
     def search(self, query_vector, k=5):
-        if self.index is None or len(self.metadatas) == 0:
-            return []
+        return self.search_batch([query_vector], k=k)[0]
+
+    def search_batch(self, query_vectors, k=5):
+        """Search many query vectors in one FAISS call; one result list per query."""
+        self.refresh_if_stale()
+        with self._swap_lock:
+            index, metadatas = self.index, self.metadatas
+
+        if index is None or len(metadatas) == 0:
+            return [[] for _ in query_vectors]
 
-        q = np.array(query_vector).astype("float32").reshape(1, -1)
+        q = np.array(query_vectors).astype("float32").reshape(len(query_vectors), -1)
 
         # FAISS returns (distance, index)
-        scores, indices = self.index.search(q, k)
+        with agent_span("faiss_search", queries=len(q), k=k):
+            with FAISS_SEARCH_SECONDS.time():
+                scores, indices = index.search(q, k)
 
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx == -1:
-                continue  # No result
+        batch_results = []
+        for row_scores, row_indices in zip(scores, indices):
+            results = []
+            for score, idx in zip(row_scores, row_indices):
+                if idx == -1:
+                    continue  # No result
 
-            item = self.metadatas[idx].copy()
-            item["score"] = float(score)
-            results.append(item)
+                item = metadatas[idx].copy()
+                item["score"] = float(score)
+                results.append(item)
+            batch_results.append(results)
 
-        return results
+        return batch_results
 
     # --------------------------------------------------------
     # BASIC STATS
     # --------------------------------------------------------
     def stats(self):
         if self.index is None:
-            return {"num_vectors": 0}
+            return {"num_vectors": 0, "documents": 0, "chunks": 0}
 
         return {
             "num_vectors": self.index.ntotal,
             "vector_dim": self.dimension,
+            "documents": len(self.policy_ids),
+            "chunks": len(self.metadatas),
+            "snapshot_version": self.version,
+            "mmap": self.mmap,
         }
 
 
@@ -0,0 +1,308 @@
+"""
+Micro-benchmarks for the preprocessing and vector store hot paths.
+
+Builds synthetic corpora (default 10k, 100k and 1M chunks with random
+vectors) and measures wall time and peak memory of:
+
+    clean_text, chunk_text, VectorStore.add, search, search_batch,
+    metadata copy (the per-hit dict copy inside search), save, load
+
+Results are compared against a stored baseline and the run fails
+(exit code 1) when any gated metric regresses by more than
+--max-regression percent:
+
+    python -m benchmarks.bench_hot_paths --sizes 10000 --update-baseline
+    python -m benchmarks.bench_hot_paths --sizes 10000 --max-regression 15
+
+1M chunks needs several GB of RAM and a long HNSW build; use --sizes
+and --ops to run a subset.
+"""
+import argparse
+import gc
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from backend.preprocess import clean_text, chunk_text
+from backend.vector_store import VectorStore
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "baselines" / "hot_paths.json"
+
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 200
+
+_PARAGRAPH = (
+    "Section 3: Key Requirements\tPasswords must be at least 12 characters long. "
+    "All violations must be reported within 24 hours to compliance@company.com. "
+    "Records are retained for 7 years — including digital copies • backups.\r\n"
+)
+
+
+# ------------------------------------------------------------
+# SYNTHETIC CORPUS
+# ------------------------------------------------------------
+class Corpus:
+    def __init__(self, size: int, dim: int, queries: int, seed: int):
+        rng = np.random.default_rng(seed)
+        self.size = size
+        self.dim = dim
+        self.vectors = rng.standard_normal((size, dim), dtype=np.float32)
+        self.queries = rng.standard_normal((queries, dim), dtype=np.float32)
+
+        # A small pool of distinct chunk texts keeps generation memory flat
+        pool = [(_PARAGRAPH * 4)[i:i + CHUNK_SIZE] for i in range(64)]
+        self.metadatas = [
+            {
+                "source": f"/app/data/raw/POL-{i % 1000:03d}.pdf",
+                "policy_id": f"POL-{i % 1000:03d}",
+                "chunk_id": i,
+                "text": pool[i % len(pool)],
+            }
+            for i in range(size)
+        ]
+
+        # Raw text long enough to produce `size` chunks
+        step = CHUNK_SIZE - CHUNK_OVERLAP
+        repeats = (size * step) // len(_PARAGRAPH) + 1
+        self.raw_text = _PARAGRAPH * repeats
+        self.clean = clean_text(self.raw_text)
+
+
+# ------------------------------------------------------------
+# OPERATIONS
+# ------------------------------------------------------------
+def _built_store(corpus: Corpus, state: Dict) -> VectorStore:
+    if "store" not in state:
+        store = VectorStore()
+        store.add(corpus.vectors, list(corpus.metadatas))
+        state["store"] = store
+    return state["store"]
+
+
+def op_clean_text(corpus, state):
+    clean_text(corpus.raw_text)
+
+
+def op_chunk_text(corpus, state):
+    chunk_text(corpus.clean, CHUNK_SIZE, CHUNK_OVERLAP)
+
+
+def op_add(corpus, state):
+    store = VectorStore()
+    store.add(corpus.vectors, list(corpus.metadatas))
+    state["store"] = store
+
+
+def op_search(corpus, state):
+    store = _built_store(corpus, state)
+    for q in corpus.queries:
+        store.search(q, k=5)
+
+
+def op_search_batch(corpus, state):
+    _built_store(corpus, state).search_batch(corpus.queries, k=5)
+
+
+def op_metadata_copy(corpus, state):
+    # Isolates the per-hit dict copy that search() does for every result
+    metas = corpus.metadatas
+    n = len(metas)
+    for i in range(len(corpus.queries) * 5 * 100):
+        item = metas[(i * 7919) % n].copy()
+        item["score"] = 0.0
+
+
+def op_save(corpus, state):
+    store = _built_store(corpus, state)
+    tmp = state.setdefault("tmpdir", tempfile.mkdtemp(prefix="bench_vs_"))
+    store.index_path = str(Path(tmp) / "faiss_index.bin")
+    store.metadata_path = str(Path(tmp) / "metadata.json")
+    store.save()
+
+
+def op_load(corpus, state):
+    tmp = Path(state["tmpdir"])
+    VectorStore(tmp / "faiss_index.bin", tmp / "metadata.json").load()
+
+
+# Set-up done outside the timed region
+def _prepare(op: str, corpus: Corpus, state: Dict):
+    if op in ("search", "search_batch", "save", "load"):
+        _built_store(corpus, state)
+    if op == "load" and "tmpdir" not in state:
+        op_save(corpus, state)
+
+
+OPS: Dict[str, Callable] = {
+    "clean_text": op_clean_text,
+    "chunk_text": op_chunk_text,
+    "add": op_add,
+    "search": op_search,
+    "search_batch": op_search_batch,
+    "metadata_copy": op_metadata_copy,
+    "save": op_save,
+    "load": op_load,
+}
+
+
+# ------------------------------------------------------------
+# MEASUREMENT
+# ------------------------------------------------------------
+def _reset_rss_peak() -> bool:
+    # Linux only: writing 5 to clear_refs resets VmHWM
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def _rss_peak_mb() -> float | None:
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def _rss_now_mb() -> float | None:
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def measure(fn: Callable, corpus: Corpus, state: Dict, repeat: int, memory: bool) -> Dict:
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn(corpus, state)
+        times.append(time.perf_counter() - start)
+
+    result = {"seconds": round(min(times), 6)}
+    if not memory:
+        return result
+
+    # Separate pass: tracemalloc slows Python code down considerably
+    gc.collect()
+    rss_supported = _reset_rss_peak()
+    rss_before = _rss_now_mb()
+    tracemalloc.start()
+    fn(corpus, state)
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result["py_peak_mb"] = round(py_peak / 1e6, 3)
+    if rss_supported and rss_before is not None:
+        result["rss_peak_delta_mb"] = round(max(0.0, _rss_peak_mb() - rss_before), 3)
+    return result
+
+
+# ------------------------------------------------------------
+# BASELINE GATING
+# ------------------------------------------------------------
+# Absolute changes below these are treated as noise
+NOISE_FLOOR = {"seconds": 0.005, "py_peak_mb": 1.0, "rss_peak_delta_mb": 5.0}
+
+
+def check_regressions(results: Dict, baseline: Dict, max_pct: float, gated: List[str]) -> List[str]:
+    failures = []
+    for key, cur in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for metric in gated:
+            a, b = base.get(metric), cur.get(metric)
+            if a is None or b is None or a <= 0:
+                continue
+            change = (b - a) / a * 100.0
+            if change > max_pct and (b - a) > NOISE_FLOOR.get(metric, 0.0):
+                failures.append(f"{key} {metric}: {a} -> {b} ({change:+.1f}%)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-path micro-benchmarks with regression gating")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--ops", default=",".join(OPS))
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="percent")
+    parser.add_argument("--gate", default="seconds,py_peak_mb", help="metrics checked against the baseline")
+    parser.add_argument("--out", help="also write results JSON here")
+    args = parser.parse_args()
+
+    ops = [o.strip() for o in args.ops.split(",") if o.strip()]
+    unknown = set(ops) - set(OPS)
+    if unknown:
+        parser.error(f"Unknown ops: {sorted(unknown)}")
+
+    results: Dict[str, Dict] = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"\n== {size:,} chunks, dim={args.dim} ==")
+        corpus = Corpus(size, args.dim, args.queries, args.seed)
+        state: Dict = {}
+        # HNSW build dominates large sizes; never repeat it more than needed
+        for op in ops:
+            repeat = 1 if op in ("add", "save", "load") and size >= 100_000 else args.repeat
+            _prepare(op, corpus, state)
+            res = measure(OPS[op], corpus, state, repeat, not args.no_memory)
+            results[f"{op}@{size}"] = res
+            extras = "  ".join(f"{k}={v}" for k, v in res.items() if k != "seconds")
+            print(f"  {op:<14} {res['seconds']:>10.4f}s  {extras}")
+        del corpus, state
+        gc.collect()
+
+    payload = {"dim": args.dim, "queries": args.queries, "results": results}
+    if args.out:
+        Path(args.out).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        stored = json.loads(baseline_path.read_text()) if baseline_path.exists() else {"results": {}}
+        stored.update({"dim": args.dim, "queries": args.queries})
+        stored["results"].update(results)
+        baseline_path.write_text(json.dumps(stored, indent=2), encoding="utf-8")
+        print(f"\nBaseline updated: {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print(f"\nNo baseline at {baseline_path}; run with --update-baseline to create one.")
+        return
+
+    baseline = json.loads(baseline_path.read_text())
+    if (baseline.get("dim"), baseline.get("queries")) != (args.dim, args.queries):
+        print("\nBaseline was recorded with a different --dim/--queries; not comparing.")
+        sys.exit(2)
+
+    gated = [g.strip() for g in args.gate.split(",") if g.strip()]
+    failures = check_regressions(results, baseline["results"], args.max_regression, gated)
+    if failures:
+        print(f"\nREGRESSIONS (> {args.max_regression}%):")
+        for f in failures:
+            print(f"  {f}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.max_regression}% against {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
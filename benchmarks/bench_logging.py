@@ -0,0 +1,184 @@
+"""
+Per-request logging overhead: synchronous file handlers vs. the queue pipeline.
+
+Replays the log calls one /query makes (middleware, agents, pipeline;
+about a dozen records) against private loggers writing to a temp
+directory, and reports the time spent on the request thread:
+
+    sync    RotatingFileHandler on the caller, the previous JSON formatter
+            and eager f-strings (the old behaviour)
+    queue   NonBlockingQueueHandler + background listener, lazy %-args
+    sampled queue with 10% sampling on INFO records
+
+    python -m benchmarks.bench_logging --requests 5000 --query-chars 500
+
+`drain_s` is how long the listener needs to write everything queued;
+it shows the background cost the request thread no longer pays.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import tempfile
+import time
+from datetime import datetime
+from logging.handlers import QueueListener, RotatingFileHandler
+from typing import Dict, List
+
+from backend.logging_config import JSONFormatter, NonBlockingQueueHandler, SamplingFilter
+
+LOGGER_NAMES = ["bench_api", "bench_retriever", "bench_synth", "bench_pipeline"]
+
+
+class LegacyJSONFormatter(logging.Formatter):
+    """The formatter logging_config used before the queue pipeline."""
+
+    def format(self, record):
+        log_record = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "agent": getattr(record, "agent", None),
+            "pipeline_step": getattr(record, "pipeline_step", None),
+        }
+        return json.dumps(log_record)
+
+
+# ------------------------------------------------------------
+# ONE REQUEST'S WORTH OF LOG CALLS
+# ------------------------------------------------------------
+def request_eager(loggers: Dict[str, logging.Logger], query: str, rid: str):
+    api, retr, synth, pipe = (loggers[n] for n in LOGGER_NAMES)
+    api.info("Incoming POST request to /query", extra={"request_id": rid})
+    pipe.info(f"Starting full RAG pipeline for query='{query}'")
+    retr.info(f"Retrieval agent received query='{query}', top_k={5}", extra={"agent": "retrieval"})
+    pipe.info(f"Reranker agent sorting {5} candidates for query='{query}'", extra={"pipeline_step": "rerank"})
+    synth.info(f"Summarizer agent condensing {5} chunks", extra={"agent": "summarizer"})
+    pipe.info(f"Compliance reasoning agent analyzing query='{query}'", extra={"pipeline_step": "compliance_reasoning"})
+    pipe.info(f"Fact-checker agent validating answer for query='{query}' using {5} chunks", extra={"pipeline_step": "fact_check"})
+    synth.info(f"Answer writer agent generating final answer for query='{query}'", extra={"agent": "answer_writer"})
+    pipe.info(f"RAG pipeline complete in {1.234:.2f}s, stages={ {'retrieval': 'ran', 'answer': 'ran'} }")
+    api.info(f"Completed request with status {200}", extra={"request_id": rid})
+
+
+def request_lazy(loggers: Dict[str, logging.Logger], query: str, rid: str):
+    api, retr, synth, pipe = (loggers[n] for n in LOGGER_NAMES)
+    api.info("Incoming %s request to %s", "POST", "/query", extra={"request_id": rid})
+    pipe.info("Starting full RAG pipeline for query=%r", query)
+    retr.info("Retrieval agent received query=%r, top_k=%s", query, 5, extra={"agent": "retrieval"})
+    pipe.info("Reranker agent sorting %s candidates for query=%r", 5, query, extra={"pipeline_step": "rerank"})
+    synth.info("Summarizer agent condensing %s chunks", 5, extra={"agent": "summarizer"})
+    pipe.info("Compliance reasoning agent analyzing query=%r", query, extra={"pipeline_step": "compliance_reasoning"})
+    pipe.info("Fact-checker agent validating answer for query=%r using %s chunks", query, 5, extra={"pipeline_step": "fact_check"})
+    synth.info("Answer writer agent generating final answer for query=%r", query, extra={"agent": "answer_writer"})
+    pipe.info("RAG pipeline complete in %.2fs, stages=%s", 1.234, {"retrieval": "ran", "answer": "ran"})
+    api.info("Completed request with status %s", 200, extra={"request_id": rid})
+
+
+# ------------------------------------------------------------
+# LOGGER SET-UPS
+# ------------------------------------------------------------
+def _fresh_logger(name: str) -> logging.Logger:
+    logger = logging.getLogger(name)
+    for h in list(logger.handlers):
+        logger.removeHandler(h)
+        h.close()
+    for f in list(logger.filters):
+        logger.removeFilter(f)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def _file_handler(log_dir: str, name: str, formatter: logging.Formatter) -> RotatingFileHandler:
+    handler = RotatingFileHandler(os.path.join(log_dir, f"{name}.log"), maxBytes=5_000_000, backupCount=5)
+    handler.setFormatter(formatter)
+    return handler
+
+
+def run_mode(mode: str, requests: int, query: str, log_dir: str) -> Dict:
+    loggers = {n: _fresh_logger(n) for n in LOGGER_NAMES}
+    listener = None
+
+    if mode == "sync":
+        for n, logger in loggers.items():
+            logger.addHandler(_file_handler(log_dir, f"{mode}_{n}", LegacyJSONFormatter()))
+        emit = request_eager
+    else:
+        log_queue: queue.Queue = queue.Queue(maxsize=requests * 16)
+        handler = NonBlockingQueueHandler(log_queue)
+        routes = {n: _file_handler(log_dir, f"{mode}_{n}", JSONFormatter()) for n in LOGGER_NAMES}
+
+        class _Route(logging.Handler):
+            def handle(self, record):
+                routes[record.name].handle(record)
+                return True
+
+        listener = QueueListener(log_queue, _Route())
+        for logger in loggers.values():
+            logger.addHandler(handler)
+            if mode == "sampled":
+                logger.addFilter(SamplingFilter(0.1))
+        listener.start()
+        emit = request_lazy
+
+    per_request: List[float] = []
+    start = time.perf_counter()
+    for i in range(requests):
+        t0 = time.perf_counter()
+        emit(loggers, query, f"req-{i}")
+        per_request.append(time.perf_counter() - t0)
+    caller_s = time.perf_counter() - start
+
+    drain_s = 0.0
+    if listener is not None:
+        t0 = time.perf_counter()
+        listener.stop()
+        drain_s = time.perf_counter() - t0
+
+    for logger in loggers.values():
+        _fresh_logger(logger.name)
+
+    per_request.sort()
+    return {
+        "mean_us": round(caller_s / requests * 1e6, 1),
+        "p50_us": round(per_request[len(per_request) // 2] * 1e6, 1),
+        "p99_us": round(per_request[int(len(per_request) * 0.99)] * 1e6, 1),
+        "caller_s": round(caller_s, 3),
+        "drain_s": round(drain_s, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request logging overhead benchmark")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--query-chars", type=int, default=500)
+    parser.add_argument("--modes", default="sync,queue,sampled")
+    parser.add_argument("--out", help="write results JSON here")
+    args = parser.parse_args()
+
+    query = ("What is the retention period for customer records? " * 50)[:args.query_chars]
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_logging_") as log_dir:
+        for mode in (m.strip() for m in args.modes.split(",") if m.strip()):
+            results[mode] = run_mode(mode, args.requests, query, log_dir)
+            r = results[mode]
+            print(f"{mode:<8} mean={r['mean_us']:>8.1f}us  p50={r['p50_us']:>8.1f}us  "
+                  f"p99={r['p99_us']:>8.1f}us  drain={r['drain_s']:.3f}s")
+
+    if "sync" in results:
+        base = results["sync"]["mean_us"]
+        for mode, r in results.items():
+            if mode != "sync" and r["mean_us"] > 0:
+                print(f"{mode}: {base / r['mean_us']:.1f}x less time on the request thread than sync")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"requests": args.requests, "query_chars": args.query_chars, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Interactive latency under a competing batch load, against the fake
+provider with enforced rate limits, with and without the client-side
+scheduler (backend/rate_limiter.py).
+
+    python -m benchmarks.bench_rate_limits --duration 20 --rpm 120 --tpm 40000
+
+Batch threads embed large inputs back to back (an ingest) while one
+interactive thread sends a chat call with a latency budget every
+`--interactive-interval-s`. Modes:
+
+    off        no scheduler: the SDK retries 429s with backoff
+    scheduler  RateLimitedTransport; it starts with `--client-rpm/--client-tpm`
+               (deliberately wrong by default) and adapts from the headers
+
+Reported per priority: successes, failures, p50/p95 latency and the
+provider's 429 count.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+import openai
+
+from backend.rate_limiter import RateLimitScheduler, llm_priority, max_queue_wait, BATCH, INTERACTIVE
+from backend.transport import RateLimitedTransport
+from .fake_provider import ProviderConfig, serve_in_thread
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def _client(base_url: str, scheduler: RateLimitScheduler | None) -> openai.OpenAI:
+    transport: httpx.BaseTransport = httpx.HTTPTransport()
+    if scheduler is not None:
+        transport = RateLimitedTransport(transport, scheduler)
+    return openai.OpenAI(
+        api_key="fake",
+        base_url=base_url,
+        http_client=httpx.Client(transport=transport, timeout=30.0),
+        max_retries=2,
+    )
+
+
+def _summary(latencies: List[float], failures: int) -> Dict:
+    ordered = sorted(latencies)
+    pct = lambda p: round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 1) if ordered else None
+    return {
+        "ok": len(latencies),
+        "failed": failures,
+        "p50_ms": round(statistics.median(ordered) * 1000, 1) if ordered else None,
+        "p95_ms": pct(0.95),
+    }
+
+
+def run_mode(mode: str, args) -> Dict:
+    cfg = ProviderConfig(latency_ms=args.latency_ms, rpm=args.rpm, tpm=args.tpm)
+    server, base_url = serve_in_thread(cfg)
+
+    scheduler = None
+    if mode == "scheduler":
+        limits = {"": [args.client_rpm, args.client_tpm]}
+        scheduler = RateLimitScheduler(limits=limits, default=limits[""])
+    client = _client(base_url, scheduler)
+
+    stop = time.perf_counter() + args.duration
+    results: Dict[str, Dict] = {p: {"lat": [], "failed": 0} for p in (INTERACTIVE, BATCH)}
+    lock = threading.Lock()
+    batch_text = "policy clause " * (args.batch_tokens // 2)
+
+    def record(priority: str, start: float, ok: bool):
+        with lock:
+            if ok:
+                results[priority]["lat"].append(time.perf_counter() - start)
+            else:
+                results[priority]["failed"] += 1
+
+    def batch_worker():
+        with llm_priority(BATCH):
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                try:
+                    # Don't keep queueing past the end of the run
+                    with max_queue_wait(max(0.1, stop - start)):
+                        client.embeddings.create(model="text-embedding-3-large", input=[batch_text])
+                    record(BATCH, start, True)
+                except openai.OpenAIError:
+                    record(BATCH, start, False)
+
+    def interactive_worker():
+        i = 0
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                with max_queue_wait(args.budget_s):
+                    client.with_options(timeout=args.budget_s, max_retries=0).chat.completions.create(
+                        model="text-embedding-3-large",   # same model bucket as the batch load
+                        messages=[{"role": "user", "content": f"What is the retention period? #{i}"}],
+                        max_tokens=200,
+                    )
+                record(INTERACTIVE, start, True)
+            except openai.OpenAIError:
+                record(INTERACTIVE, start, False)
+            i += 1
+            time.sleep(max(0.0, args.interactive_interval_s - (time.perf_counter() - start)))
+
+    threads = [threading.Thread(target=batch_worker) for _ in range(args.batch_threads)]
+    threads.append(threading.Thread(target=interactive_worker))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    server.shutdown()
+
+    out = {p: _summary(r["lat"], r["failed"]) for p, r in results.items()}
+    out["provider_429s"] = cfg.limits.rejected
+    if scheduler is not None:
+        out["scheduler"] = scheduler.snapshot()
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate-limit scheduler benchmark against the fake provider")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--rpm", type=int, default=120, help="provider requests/minute")
+    parser.add_argument("--tpm", type=int, default=40000, help="provider tokens/minute")
+    parser.add_argument("--client-rpm", type=int, default=1000, help="scheduler's initial guess")
+    parser.add_argument("--client-tpm", type=int, default=1000000, help="scheduler's initial guess")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--batch-threads", type=int, default=4)
+    parser.add_argument("--batch-tokens", type=int, default=1500)
+    parser.add_argument("--interactive-interval-s", type=float, default=1.0)
+    parser.add_argument("--budget-s", type=float, default=5.0, help="interactive latency budget")
+    parser.add_argument("--modes", default="off,scheduler")
+    args = parser.parse_args()
+
+    report = {"config": vars(args)}
+    for mode in args.modes.split(","):
+        print(f"Running mode={mode} for {args.duration:.0f}s ...")
+        report[mode] = run_mode(mode, args)
+        print(json.dumps(report[mode], indent=2))
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"rate_limits-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    path.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
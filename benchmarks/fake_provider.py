@@ -0,0 +1,158 @@
+"""
+Local stand-in for the OpenAI API with injectable latency.
+
+Serves /v1/chat/completions and /v1/embeddings with deterministic
+responses so the backend can be exercised without network access:
+
+    python -m benchmarks.fake_provider --port 8089 --latency-ms 300 \\
+        --slow-fraction 0.05 --slow-ms 4000
+
+`--prompt-ms-per-1k` and `--completion-ms-per-1k` add prefill and
+decode time proportional to prompt and completion tokens, so shorter
+prompts and replies answer faster as they do against the real API.
+
+`--rpm` / `--tpm` enforce per-model rate limits (x-ratelimit-* headers,
+429 with retry-after-ms) to exercise the client-side scheduler.
+
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake uvicorn backend.api:app
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+from backend.transport import (
+    RATE_LIMIT_ERROR,
+    ProviderRateLimits,
+    synthetic_chat_response,
+    synthetic_embeddings_response,
+)
+
+
+class ProviderConfig:
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        slow_fraction: float = 0.0,
+        slow_ms: float = 0.0,
+        embedding_dim: int = 3072,
+        completion_words: int = 120,
+        seed: int = 0,
+        rpm: int = 0,
+        tpm: int = 0,
+        prompt_ms_per_1k: float = 0.0,
+        completion_ms_per_1k: float = 0.0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.slow_fraction = slow_fraction
+        self.slow_ms = slow_ms
+        self.embedding_dim = embedding_dim
+        self.completion_words = completion_words
+        self.limits = ProviderRateLimits(rpm, tpm)
+        self.prompt_ms_per_1k = prompt_ms_per_1k
+        self.completion_ms_per_1k = completion_ms_per_1k
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def sleep(self, prompt_tokens: int = 0, completion_tokens: int = 0):
+        with self.lock:
+            self.requests += 1
+            delay = self.latency_ms + self.rng.uniform(0, self.jitter_ms)
+            delay += prompt_tokens / 1000.0 * self.prompt_ms_per_1k
+            delay += completion_tokens / 1000.0 * self.completion_ms_per_1k
+            if self.slow_fraction and self.rng.random() < self.slow_fraction:
+                delay += self.slow_ms
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+
+# ------------------------------------------------------------
+# HTTP SERVER
+# ------------------------------------------------------------
+def make_handler(cfg: ProviderConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, payload: Dict, headers: Dict[str, str] | None = None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+
+            if self.path.endswith("/chat/completions"):
+                payload = synthetic_chat_response(body, cfg.completion_words)
+            elif self.path.endswith("/embeddings"):
+                payload = synthetic_embeddings_response(body, cfg.embedding_dim)
+            else:
+                cfg.sleep()
+                self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+            cfg.sleep(payload["usage"]["prompt_tokens"], payload["usage"].get("completion_tokens", 0))
+
+            allowed, headers = cfg.limits.admit(body.get("model", "synthetic"), payload["usage"]["total_tokens"])
+            self._send(200 if allowed else 429, payload if allowed else RATE_LIMIT_ERROR, headers)
+
+    return Handler
+
+
+def serve_in_thread(cfg: ProviderConfig | None = None, host: str = "127.0.0.1", port: int = 0):
+    """Start the fake provider on a daemon thread; returns (server, base_url)."""
+    cfg = cfg or ProviderConfig()
+    server = ThreadingHTTPServer((host, port), make_handler(cfg))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI provider with injected latency")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--slow-fraction", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-dim", type=int, default=3072)
+    parser.add_argument("--completion-words", type=int, default=120)
+    parser.add_argument("--prompt-ms-per-1k", type=float, default=0.0, help="extra latency per 1k prompt tokens")
+    parser.add_argument("--completion-ms-per-1k", type=float, default=0.0, help="extra latency per 1k completion tokens")
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute per model (0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=0, help="tokens per minute per model (0 = unlimited)")
+    args = parser.parse_args()
+
+    cfg = ProviderConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        slow_fraction=args.slow_fraction,
+        slow_ms=args.slow_ms,
+        embedding_dim=args.embedding_dim,
+        completion_words=args.completion_words,
+        rpm=args.rpm,
+        tpm=args.tpm,
+        prompt_ms_per_1k=args.prompt_ms_per_1k,
+        completion_ms_per_1k=args.completion_ms_per_1k,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(cfg))
+    print(f"Fake provider listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+End-to-end load generator for the RAG API.
+
+Drives /query (and optionally /ingest) in closed-loop mode (fixed number
+of concurrent clients sending back-to-back) or open-loop mode (Poisson
+arrivals at a fixed rate, independent of response times), then reports
+throughput, latency percentiles, error rate, the per-stage time
+breakdown returned by the API in `stage_ms`, tokens and provider calls
+per query and the share of context kept by compression.
+`--pipeline-mode fused` sends every query through the single-call
+pipeline instead of the multi-agent one.
+
+Against an already running API:
+
+    python -m benchmarks.load_test --url http://localhost:8000 --mode closed --concurrency 16
+
+Self-contained, with the API started against the local fake provider:
+
+    python -m benchmarks.load_test --start-api --provider-latency-ms 300 \\
+        --mode open --rate 5 --duration 60 --out benchmarks/results/run.json
+
+    python -m benchmarks.load_test --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+
+DEFAULT_QUERIES = [
+    "What is the data retention period for customer records?",
+    "How long must passwords be?",
+    "Who must approve remote work requests?",
+    "What happens when an employee violates the conduct policy?",
+    "How quickly must security incidents be reported?",
+    "Are contractors covered by the acceptable use policy?",
+    "What are the standard working hours?",
+    "How often must access rights be reviewed?",
+]
+
+
+# ------------------------------------------------------------
+# RESULT COLLECTION
+# ------------------------------------------------------------
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: List[Dict] = []
+
+    def add(self, sample: Dict):
+        with self._lock:
+            self.samples.append(sample)
+
+
+def percentile(values: List[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+def summarize(samples: List[Dict], wall_s: float) -> Dict:
+    by_endpoint: Dict[str, Dict] = {}
+
+    for endpoint in sorted({s["endpoint"] for s in samples}):
+        rows = [s for s in samples if s["endpoint"] == endpoint]
+        ok = [s for s in rows if s["ok"]]
+        lat = [s["latency_ms"] for s in ok]
+
+        def mean_of(key: str) -> float | None:
+            values = [s[key] for s in ok if s.get(key) is not None]
+            return round(statistics.fmean(values), 1) if values else None
+
+        ratios = [s["context_ratio"] for s in ok if s.get("context_ratio") is not None]
+
+        stages: Dict[str, List[float]] = {}
+        for s in ok:
+            for stage, ms in (s.get("stage_ms") or {}).items():
+                stages.setdefault(stage, []).append(ms)
+
+        by_endpoint[endpoint] = {
+            "requests": len(rows),
+            "errors": len(rows) - len(ok),
+            "error_rate": round((len(rows) - len(ok)) / len(rows), 4) if rows else 0.0,
+            "throughput_rps": round(len(ok) / wall_s, 3) if wall_s > 0 else 0.0,
+            "latency_ms": {
+                "mean": round(statistics.fmean(lat), 1) if lat else None,
+                "p50": percentile(lat, 50),
+                "p95": percentile(lat, 95),
+                "p99": percentile(lat, 99),
+                "max": max(lat) if lat else None,
+            },
+            "stage_ms_mean": {k: round(statistics.fmean(v), 1) for k, v in stages.items()},
+            "stage_ms_p95": {k: percentile(v, 95) for k, v in stages.items()},
+            "prompt_tokens_mean": mean_of("prompt_tokens"),
+            "completion_tokens_mean": mean_of("completion_tokens"),
+            "llm_calls_mean": mean_of("llm_calls"),
+            "context_ratio_mean": round(statistics.fmean(ratios), 3) if ratios else None,
+        }
+
+    return {"wall_s": round(wall_s, 3), "endpoints": by_endpoint}
+
+
+# ------------------------------------------------------------
+# REQUEST DRIVERS
+# ------------------------------------------------------------
+def one_request(
+    client: httpx.Client, endpoint: str, queries: List[str], rec: Recorder, rng: random.Random,
+    mode: str | None = None,
+):
+    if endpoint == "ingest":
+        path, payload = "/ingest", {}
+    else:
+        path, payload = "/query", {"query": rng.choice(queries), "include_usage": True}
+        if mode:
+            payload["mode"] = mode
+
+    start = time.perf_counter()
+    sample = {"endpoint": endpoint, "ok": False}
+    try:
+        resp = client.post(path, json=payload)
+        sample["status"] = resp.status_code
+        sample["ok"] = resp.status_code == 200
+        if sample["ok"] and endpoint == "query":
+            body = resp.json()
+            sample["stage_ms"] = body.get("stage_ms", {})
+            totals = (body.get("usage") or {}).get("total") or {}
+            sample["prompt_tokens"] = totals.get("prompt_tokens")
+            sample["completion_tokens"] = totals.get("completion_tokens")
+            sample["llm_calls"] = totals.get("calls")
+            sample["context_ratio"] = (body.get("compression") or {}).get("ratio")
+    except httpx.HTTPError as e:
+        sample["status"] = type(e).__name__
+    sample["latency_ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+    rec.add(sample)
+
+
+def pick_endpoint(rng: random.Random, ingest_fraction: float) -> str:
+    return "ingest" if ingest_fraction and rng.random() < ingest_fraction else "query"
+
+
+def run_closed_loop(client, queries, args, rec: Recorder):
+    stop_at = time.perf_counter() + args.duration
+    budget = [args.requests] if args.requests else None
+    budget_lock = threading.Lock()
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        while time.perf_counter() < stop_at:
+            if budget is not None:
+                with budget_lock:
+                    if budget[0] <= 0:
+                        return
+                    budget[0] -= 1
+            one_request(client, pick_endpoint(rng, args.ingest_fraction), queries, rec, rng, args.pipeline_mode)
+
+    threads = [threading.Thread(target=worker, args=(args.seed + i,)) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def run_open_loop(client, queries, args, rec: Recorder):
+    rng = random.Random(args.seed)
+    stop_at = time.perf_counter() + args.duration
+    sent = 0
+
+    # Arrivals do not wait for responses; the pool only caps outstanding work
+    with ThreadPoolExecutor(max_workers=args.max_outstanding) as pool:
+        next_at = time.perf_counter()
+        while time.perf_counter() < stop_at and (not args.requests or sent < args.requests):
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(
+                one_request, client, pick_endpoint(rng, args.ingest_fraction),
+                queries, rec, random.Random(rng.random()), args.pipeline_mode,
+            )
+            sent += 1
+            next_at += rng.expovariate(args.rate)
+
+
+# ------------------------------------------------------------
+# SELF-CONTAINED STACK (fake provider + uvicorn)
+# ------------------------------------------------------------
+def start_api(args) -> Tuple[subprocess.Popen, float]:
+    """Start the API against the fake provider; returns (process, seconds until /ready)."""
+    from .fake_provider import ProviderConfig, serve_in_thread
+
+    _, base_url = serve_in_thread(ProviderConfig(
+        latency_ms=args.provider_latency_ms,
+        jitter_ms=args.provider_jitter_ms,
+        prompt_ms_per_1k=args.provider_prompt_ms_per_1k,
+        completion_ms_per_1k=args.provider_completion_ms_per_1k,
+    ))
+    env = dict(os.environ, OPENAI_BASE_URL=base_url, OPENAI_API_KEY="fake")
+    launched = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.api:app", "--port", str(args.api_port),
+         "--workers", str(args.api_workers), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=env,
+    )
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{args.url}/ready", timeout=1).status_code == 200:
+                return proc, time.perf_counter() - launched
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("API did not become ready within 60s")
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ------------------------------------------------------------
+# COMPARISON
+# ------------------------------------------------------------
+def compare(old_path: str, new_path: str):
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+
+    for endpoint, n in new["summary"]["endpoints"].items():
+        o = old["summary"]["endpoints"].get(endpoint)
+        if not o:
+            continue
+        print(f"\n[{endpoint}]")
+        for key in ("p50", "p95", "p99"):
+            a, b = o["latency_ms"][key], n["latency_ms"][key]
+            if a and b:
+                print(f"  {key:<16} {a:>10.1f} -> {b:>10.1f} ms ({(b - a) / a * 100:+.1f}%)")
+        print(f"  {'throughput_rps':<16} {o['throughput_rps']:>10.3f} -> {n['throughput_rps']:>10.3f}")
+        print(f"  {'error_rate':<16} {o['error_rate']:>10.4f} -> {n['error_rate']:>10.4f}")
+        for key in ("prompt_tokens_mean", "completion_tokens_mean", "llm_calls_mean", "context_ratio_mean"):
+            a, b = o.get(key), n.get(key)
+            if a is not None or b is not None:
+                print(f"  {key:<16} {a if a is not None else '-':>10} -> {b if b is not None else '-':>10}")
+        for stage, b in n["stage_ms_mean"].items():
+            a = o["stage_ms_mean"].get(stage)
+            if a:
+                print(f"  stage {stage:<10} {a:>10.1f} -> {b:>10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the RAG API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=8, help="closed-loop clients")
+    parser.add_argument("--rate", type=float, default=2.0, help="open-loop arrivals per second")
+    parser.add_argument("--max-outstanding", type=int, default=256, help="open-loop in-flight cap")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--requests", type=int, default=0, help="stop after N requests (0 = duration only)")
+    parser.add_argument("--ingest-fraction", type=float, default=0.0, help="share of requests sent to /ingest")
+    parser.add_argument("--queries-file", help="JSON list or one question per line")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--start-api", action="store_true", help="start uvicorn against the fake provider")
+    parser.add_argument("--api-port", type=int, default=8000)
+    parser.add_argument("--api-workers", type=int, default=1)
+    parser.add_argument("--provider-latency-ms", type=float, default=300.0)
+    parser.add_argument("--provider-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--provider-prompt-ms-per-1k", type=float, default=0.0)
+    parser.add_argument("--provider-completion-ms-per-1k", type=float, default=0.0)
+    parser.add_argument("--pipeline-mode", choices=["multi_agent", "fused"], help="per-request pipeline mode")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    queries = DEFAULT_QUERIES
+    if args.queries_file:
+        raw = Path(args.queries_file).read_text(encoding="utf-8")
+        queries = json.loads(raw) if raw.lstrip().startswith("[") else [l for l in raw.splitlines() if l.strip()]
+
+    proc, cold_start_s = None, None
+    if args.start_api:
+        args.url = f"http://127.0.0.1:{args.api_port}"
+        proc, cold_start_s = start_api(args)
+        print(f"API ready after {cold_start_s:.2f}s (process launch -> /ready)")
+
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_outstanding))
+    try:
+        with httpx.Client(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+            start = time.perf_counter()
+            if args.mode == "closed":
+                run_closed_loop(client, queries, args, rec)
+            else:
+                run_open_loop(client, queries, args, rec)
+            wall = time.perf_counter() - start
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k != "compare"},
+        "summary": summarize(rec.samples, wall),
+        "cold_start_s": round(cold_start_s, 3) if cold_start_s is not None else None,
+    }
+    print(json.dumps(result["summary"], indent=2))
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"load_{result['commit'] or 'local'}_{int(time.time())}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(f"Saved results to {out}")
+
+
+if __name__ == "__main__":
+    main()
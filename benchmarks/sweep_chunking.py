@@ -0,0 +1,255 @@
+"""
+Chunking-parameter sweep: cost, index size, ingest time, retrieval
+latency and retrieval quality for a grid of CHUNK_SIZE x CHUNK_OVERLAP
+settings, plus policy recall at several TOP_K values.
+
+    python -m benchmarks.sweep_chunking --sizes 400,600,800,1200 --overlaps 0,100,200 --top-ks 3,5,6,10
+
+The corpus (data/raw) is extracted once. The cleaned text is cached in
+artifacts/sweep/extracted.json by file size and mtime, so PDF/DOCX
+parsing is skipped on later runs. Chunks are embedded through the
+persistent embedding cache (backend/embedding_cache.py). A chunk that
+several settings share, or that an earlier sweep or ingest already
+embedded, is paid for once. Indexes are then built in parallel, one per
+setting, under artifacts/sweep/<size>_<overlap>/, and evaluated against
+the labelled retrieval set (RETRIEVAL_EVAL_SET_PATH).
+
+Per setting:
+
+    chunks, index_bytes, metadata_bytes
+    full_ingest_tokens / _usd   what a fresh ingest would pay for embeddings
+    paid_tokens                 what this run paid (cache misses only)
+    chunk_s, embed_s, build_s, ingest_s
+    search_ms p50/p95           single-query index search
+    recall@k, mrr, ndcg@k       policy-level, as in backend.retrieval_eval
+    recall@top{t}               policies found within the first t chunks
+                                (what answer_query sees with TOP_K=t)
+
+The recommendation is the cheapest setting whose recall@top{TOP_K} is
+within --tolerance of the best. Quality is only meaningful with real
+embeddings (live or replay). With LLM_TRANSPORT_MODE=synthetic the sweep
+runs offline and the cost, size and latency numbers still hold.
+"""
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from backend.config import (
+    ARTIFACTS_DIR,
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    DATA_DIR,
+    EMBEDDING_MODEL,
+    RETRIEVAL_EVAL_SET_PATH,
+    TOP_K,
+)
+from backend.embeddings import get_embeddings
+from backend.preprocess import SUPPORTED_EXTENSIONS, chunk_documents, clean_text, read_document
+from backend.rate_limiter import llm_priority, BATCH
+from backend.retrieval_eval import compute_metrics, embed_questions, evaluate_retrieval, load_eval_set, ranked_policies
+from backend.usage import cost_usd, track_usage
+from backend.vector_store import VectorStore, faiss
+
+SWEEP_DIR = ARTIFACTS_DIR / "sweep"
+RESULTS_DIR = Path(__file__).parent / "results"
+EMBED_BATCH = 256
+
+
+# ------------------------------------------------------------
+# EXTRACTION (once, cached across runs)
+# ------------------------------------------------------------
+def extract_corpus(directory: Path, cache_path: Path = SWEEP_DIR / "extracted.json") -> List[Tuple[Path, str]]:
+    cache = json.loads(cache_path.read_text(encoding="utf-8")) if cache_path.exists() else {}
+    documents, fresh, parsed = [], {}, 0
+
+    for file_path in sorted(directory.rglob("*")):
+        if file_path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+            continue
+        stat = file_path.stat()
+        entry = cache.get(str(file_path))
+        if not entry or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+            try:
+                text = clean_text(read_document(file_path))
+            except Exception as e:
+                print(f"Skipping {file_path}: {e}")
+                continue
+            entry = {"size": stat.st_size, "mtime": stat.st_mtime, "text": text}
+            parsed += 1
+        fresh[str(file_path)] = entry
+        documents.append((file_path, entry["text"]))
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    cache_path.write_text(json.dumps(fresh), encoding="utf-8")
+    print(f"Corpus: {len(documents)} documents ({parsed} parsed, {len(documents) - parsed} from cache)")
+    return documents
+
+
+# ------------------------------------------------------------
+# PER-SETTING STAGES
+# ------------------------------------------------------------
+def embed_setting(texts: List[str]) -> Tuple[List[List[float]], float, int]:
+    """Embed through the persistent cache; returns (vectors, seconds, tokens paid)."""
+    start = time.perf_counter()
+    vectors: List[List[float]] = []
+    with track_usage() as usage, llm_priority(BATCH):
+        for i in range(0, len(texts), EMBED_BATCH):
+            vectors.extend(get_embeddings(texts[i:i + EMBED_BATCH]))
+    return vectors, time.perf_counter() - start, int(usage.totals()["prompt_tokens"])
+
+
+def build_and_evaluate(setting: Dict, vectors, metadatas, items, question_vectors, args) -> Dict:
+    out_dir = SWEEP_DIR / f"{setting['chunk_size']}_{setting['overlap']}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    store = VectorStore(out_dir / "faiss_index.bin", out_dir / "metadata.json", mmap=False)
+
+    start = time.perf_counter()
+    store.add(vectors, metadatas)
+    store.save()
+    setting["build_s"] = round(time.perf_counter() - start, 3)
+    setting["ingest_s"] = round(setting["chunk_s"] + setting["embed_s"] + setting["build_s"], 3)
+    setting["index_bytes"] = Path(store.index_path).stat().st_size
+    setting["metadata_bytes"] = Path(store.metadata_path).stat().st_size
+
+    if not items:
+        return setting
+
+    depth = max(args.top_ks)
+    timings = []
+    for _ in range(args.latency_repeats):
+        for vector in question_vectors:
+            t = time.perf_counter()
+            store.search(vector, k=depth)
+            timings.append((time.perf_counter() - t) * 1000.0)
+    timings.sort()
+    setting["search_ms"] = {
+        "p50": round(statistics.median(timings), 3),
+        "p95": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+    }
+
+    report = evaluate_retrieval(items, args.ks, store, vectors=question_vectors)
+    setting["quality"] = report["metrics"]
+
+    hits = store.search_batch(question_vectors, k=depth)
+    for t in args.top_ks:
+        rankings = [ranked_policies(h[:t], t) for h in hits]
+        setting["quality"][f"recall@top{t}"] = compute_metrics(rankings, items, [t])[f"recall@{t}"]
+    return setting
+
+
+# ------------------------------------------------------------
+# REPORT
+# ------------------------------------------------------------
+def recommend(settings: List[Dict], top_k: int, tolerance: float) -> Dict | None:
+    key = f"recall@top{top_k}"
+    scored = [s for s in settings if key in s.get("quality", {})]
+    if not scored:
+        return None
+    best = max(s["quality"][key] for s in scored)
+    eligible = [s for s in scored if s["quality"][key] >= best - tolerance]
+    return min(eligible, key=lambda s: (s["full_ingest_tokens"], s["index_bytes"]))
+
+
+def print_table(settings: List[Dict], top_ks: List[int]):
+    header = f"{'size':>5} {'ovl':>4} {'chunks':>6} {'index_kb':>9} {'ingest_tok':>10} {'paid_tok':>8} " \
+             f"{'ingest_s':>8} {'search_p50':>10} {'mrr':>6} " + " ".join(f"{'r@top' + str(t):>7}" for t in top_ks)
+    print(header)
+    for s in settings:
+        q = s.get("quality", {})
+        default = " *" if (s["chunk_size"], s["overlap"]) == (CHUNK_SIZE, CHUNK_OVERLAP) else ""
+        print(
+            f"{s['chunk_size']:>5} {s['overlap']:>4} {s['chunks']:>6} {s['index_bytes'] / 1024:>9.1f} "
+            f"{s['full_ingest_tokens']:>10} {s['paid_tokens']:>8} {s['ingest_s']:>8.2f} "
+            f"{s.get('search_ms', {}).get('p50', float('nan')):>10.3f} {q.get('mrr', float('nan')):>6.3f} "
+            + " ".join(f"{q.get(f'recall@top{t}', float('nan')):>7.3f}" for t in top_ks)
+            + default
+        )
+    print("(* = current CHUNK_SIZE/CHUNK_OVERLAP)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep chunk size/overlap and TOP_K against retrieval quality and cost")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--sizes", default="400,600,800,1200")
+    parser.add_argument("--overlaps", default="0,100,200")
+    parser.add_argument("--top-ks", default=f"3,5,{TOP_K},10", help="chunk cutoffs for recall@top{t}")
+    parser.add_argument("--k", default="1,3,5,10", help="policy-level cutoffs for recall/nDCG")
+    parser.add_argument("--eval-set", default=str(RETRIEVAL_EVAL_SET_PATH))
+    parser.add_argument("--workers", type=int, default=4, help="indexes built in parallel")
+    parser.add_argument("--latency-repeats", type=int, default=20)
+    parser.add_argument("--tolerance", type=float, default=0.01, help="recall a cheaper setting may give up")
+    parser.add_argument("--out", help="write the report JSON here")
+    args = parser.parse_args()
+    args.top_ks = sorted({int(t) for t in args.top_ks.split(",")})
+    args.ks = sorted({int(k) for k in args.k.split(",")})
+
+    documents = extract_corpus(Path(args.data_dir))
+    eval_path = Path(args.eval_set)
+    items = load_eval_set(eval_path) if eval_path.exists() else []
+    if not items:
+        print(f"No retrieval eval set at {eval_path}; reporting cost, size and ingest time only")
+    question_vectors = embed_questions(items) if items else []
+
+    grid = [
+        (size, overlap)
+        for size in (int(x) for x in args.sizes.split(","))
+        for overlap in (int(x) for x in args.overlaps.split(","))
+        if overlap < size
+    ]
+
+    # Embedding is sequential, so settings that share chunks pay for them once
+    prepared = []
+    for size, overlap in grid:
+        start = time.perf_counter()
+        texts, metadatas = chunk_documents(documents, size, overlap)
+        chunk_s = time.perf_counter() - start
+        vectors, embed_s, paid = embed_setting(texts)
+        full_tokens = sum(len(t) for t in texts) // 4
+        setting = {
+            "chunk_size": size,
+            "overlap": overlap,
+            "chunks": len(texts),
+            "full_ingest_tokens": full_tokens,
+            "full_ingest_usd": round(cost_usd(EMBEDDING_MODEL, full_tokens, 0), 6),
+            "paid_tokens": paid,
+            "chunk_s": round(chunk_s, 3),
+            "embed_s": round(embed_s, 3),
+        }
+        print(f"Embedded {size}/{overlap}: {len(texts)} chunks, {paid} tokens paid")
+        prepared.append((setting, vectors, metadatas))
+
+    # lazy_import is not thread-safe on first use before Python 3.12:
+    # finish importing faiss before the build threads touch it
+    faiss.index_factory
+    with ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix="sweep") as pool:
+        futures = [
+            pool.submit(build_and_evaluate, setting, vectors, metadatas, items, question_vectors, args)
+            for setting, vectors, metadatas in prepared
+        ]
+        settings = [f.result() for f in futures]
+
+    print_table(settings, args.top_ks)
+    pick = recommend(settings, TOP_K if TOP_K in args.top_ks else args.top_ks[-1], args.tolerance)
+    if pick:
+        print(f"Recommended: CHUNK_SIZE={pick['chunk_size']} CHUNK_OVERLAP={pick['overlap']}")
+
+    report = {
+        "config": vars(args),
+        "embedding_model": EMBEDDING_MODEL,
+        "documents": len(documents),
+        "questions": len(items),
+        "settings": settings,
+        "recommended": {"chunk_size": pick["chunk_size"], "overlap": pick["overlap"]} if pick else None,
+    }
+    path = Path(args.out) if args.out else RESULTS_DIR / f"sweep-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import json
+import os
+from typing import Any, Dict, Iterator, List
+
+import requests
+import streamlit as st
+
+
+# API URL (loaded from .env or default fallback)
+API_URL = os.getenv("API_URL", "http://3.20.47.220:8000")
+
+# Read endpoints are cached so Streamlit reruns (every widget change)
+# reuse the last response instead of calling the backend again
+SUMMARY_TTL_S = float(os.getenv("DASHBOARD_SUMMARY_TTL_S", "10"))
+RECENT_TTL_S = float(os.getenv("DASHBOARD_RECENT_TTL_S", "15"))
+REQUEST_TIMEOUT_S = float(os.getenv("DASHBOARD_REQUEST_TIMEOUT_S", "10"))
+
+
+@st.cache_resource
+def _session() -> requests.Session:
+    # One pooled connection set shared by every browser session
+    return requests.Session()
+
+
+# --------------------------------------------------------------
+# CACHED READS (never trigger an LLM call)
+# --------------------------------------------------------------
+@st.cache_data(ttl=SUMMARY_TTL_S, show_spinner=False)
+def get_summary() -> Dict[str, Any]:
+    """Status, stats, evaluation aggregates and today's usage in one call."""
+    try:
+        resp = _session().get(f"{API_URL}/dashboard/summary", timeout=REQUEST_TIMEOUT_S)
+        resp.raise_for_status()
+        return resp.json()
+    except (requests.RequestException, ValueError):
+        return {"status": "unreachable"}
+
+
+@st.cache_data(ttl=RECENT_TTL_S, show_spinner=False)
+def get_recent_queries(limit: int = 20) -> List[Dict[str, Any]]:
+    try:
+        resp = _session().get(f"{API_URL}/recent-queries", params={"limit": limit}, timeout=REQUEST_TIMEOUT_S)
+        resp.raise_for_status()
+        return resp.json()
+    except (requests.RequestException, ValueError):
+        return []
+
+
+def refresh():
+    """Drop cached reads after an action that changes backend state."""
+    get_summary.clear()
+    get_recent_queries.clear()
+
+
+# --------------------------------------------------------------
+# ACTIONS (explicit user clicks only)
+# --------------------------------------------------------------
+def run_query(query: str) -> requests.Response:
+    return _session().post(f"{API_URL}/query", json={"query": query})
+
+
+def trigger_ingestion() -> Dict[str, Any]:
+    resp = _session().post(f"{API_URL}/ingest", json={})
+    refresh()
+    return resp.json()
+
+
+def rescore_pending() -> Dict[str, Any]:
+    """Score already-sampled answers now; no new pipeline runs."""
+    resp = _session().post(f"{API_URL}/evaluation/run", timeout=REQUEST_TIMEOUT_S)
+    refresh()
+    return resp.json()
+
+
+def stream_evaluation(questions: List[str], concurrency: int) -> Iterator[Dict[str, Any]]:
+    """
+    Answer `questions` concurrently through /query/batch with every
+    answer queued for scoring. Yields one dict per finished question
+    (in completion order), then the batch summary.
+    """
+    payload = {"queries": questions, "concurrency": concurrency, "evaluate": True}
+    with _session().post(f"{API_URL}/query/batch", json=payload, stream=True) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if line:
+                yield json.loads(line)
+    refresh()
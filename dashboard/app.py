@@ -1,11 +1,7 @@
-import os
-import requests
 import streamlit as st
 import pandas as pd
 
-
-# API URL (loaded from .env or default fallback)
-API_URL = os.getenv("API_URL", "http://3.20.47.220:8000")
+import api_client
 
 
 # --------------------------------------------------------------
@@ -94,21 +90,23 @@ st.caption("Built by Akeem Asiru")
 with st.sidebar:
     st.header("Backend Status")
 
-    # Health check
-    try:
-        health = requests.get(f"{API_URL}/health", timeout=5).json().get("status")
-    except:
-        health = "unreachable"
+    # Cached summary: one cheap backend call per TTL, shared by all tabs
+    summary = api_client.get_summary()
+    health = summary.get("status", "unreachable")
+    if health == "ok" and not summary.get("ready"):
+        health = "starting"
 
     st.metric("API Health", health)
+    if st.button("Refresh Data"):
+        api_client.refresh()
+        st.rerun()
 
     # Trigger ingestion
     st.subheader("Document Ingestion")
 
     if st.button("Trigger Ingestion"):
         with st.spinner("Ingesting documents from /data/raw ..."):
-            resp = requests.post(f"{API_URL}/ingest", json={})
-        st.write(resp.json())
+            st.write(api_client.trigger_ingestion())
 
 
 # --------------------------------------------------------------
@@ -135,7 +133,7 @@ with tab1:
         else:
             with st.spinner("Querying multi-agent RAG backend..."):
                 try:
-                    resp = requests.post(f"{API_URL}/query", json={"query": query})
+                    resp = api_client.run_query(query)
                 except Exception as e:
                     st.error(f"Communication error: {e}")
                     st.stop()
@@ -210,22 +208,17 @@ with tab2:
         </style>
     """, unsafe_allow_html=True)
 
-    # Trigger RAGAS recalculation
+    # Score answers already sampled from live traffic (no new pipeline runs)
     if st.button("🔄 Refresh RAGAS Scores"):
-        with st.spinner("Re-evaluating RAG performance..."):
-            try:
-                req = {"query": "Test evaluation ping"}
-                ragas_resp = requests.post(f"{API_URL}/query", json=req).json()
-                scores = ragas_resp.get("ragas_scores", {})
-            except:
-                scores = {}
-
-    # Always attempt to load latest results
-    try:
-        ping = requests.post(f"{API_URL}/query", json={"query": "metrics check"}).json()
-        scores = ping.get("ragas_scores", {})
-    except:
-        scores = {}
+        try:
+            st.toast(f"Scoring {api_client.rescore_pending().get('pending', 0)} pending samples")
+        except Exception as e:
+            st.error(f"Communication error: {e}")
+
+    # Latest aggregates come from the cached summary
+    evaluation = summary.get("evaluation", {})
+    metric_names = ["answer_relevancy", "faithfulness", "context_precision", "context_recall"]
+    scores = {k: evaluation[k] for k in metric_names + ["composite_score"] if k in evaluation}
 
     # Show redesigned metrics
     if "answer_relevancy" in scores:
@@ -293,8 +286,52 @@ with tab2:
         with st.expander("📄 Raw RAGAS JSON Output"):
             st.json(scores)
 
+        st.caption(
+            f"{evaluation.get('num_samples', 0)} scored samples · "
+            f"{evaluation.get('pending', 0)} pending · last run {evaluation.get('last_run') or '—'}"
+        )
+
+    elif evaluation.get("scorer") == "placeholder":
+        st.info("EVAL_SCORER=placeholder: answers are logged but not scored. Set EVAL_SCORER=ragas to score them.")
     else:
-        st.info("Run at least one query — RAGAS metrics will appear here.")
+        st.info("No scored samples yet — run an evaluation batch below.")
+
+    # Batch evaluation: questions answered concurrently via /query/batch,
+    # every answer queued for scoring; progress updates as each one finishes
+    st.markdown("### 🧪 Evaluate a Question Set")
+    questions_text = st.text_area("Questions (one per line)", height=140, key="eval_questions")
+    concurrency = st.slider("Concurrency", min_value=1, max_value=8, value=4)
+
+    if st.button("Run Evaluation", key="run_eval"):
+        questions = [q.strip() for q in questions_text.splitlines() if q.strip()]
+        if not questions:
+            st.warning("Please enter at least one question.")
+        else:
+            progress = st.progress(0.0, text=f"0 / {len(questions)} answered")
+            rows, batch_summary = [], {}
+            try:
+                for line in api_client.stream_evaluation(questions, concurrency):
+                    if "summary" in line:
+                        batch_summary = line["summary"]
+                        continue
+                    rows.append({
+                        "question": line.get("query"),
+                        "status": "error" if "error" in line else ("degraded" if line.get("degraded") else "ok"),
+                        "latency_ms": line.get("elapsed_ms"),
+                        "answer": (line.get("answer") or line.get("error") or "")[:200],
+                    })
+                    progress.progress(len(rows) / len(questions), text=f"{len(rows)} / {len(questions)} answered")
+            except Exception as e:
+                st.error(f"Communication error: {e}")
+
+            if rows:
+                st.dataframe(pd.DataFrame(rows))
+            if batch_summary:
+                st.success(
+                    f"{batch_summary.get('count')} answered in {batch_summary.get('elapsed_s')}s "
+                    f"({batch_summary.get('errors')} errors). Scores update once the background "
+                    f"evaluator finishes — use Refresh Data."
+                )
 
 
 # --------------------------------------------------------------
@@ -303,21 +340,24 @@ with tab2:
 with tab3:
     st.subheader("System Metrics & Operational Stats")
 
-    try:
-        metrics = requests.get(f"{API_URL}/stats").json()
-    except:
-        metrics = {}
+    metrics = summary.get("stats", {})
 
-    c1, c2, c3, c4 = st.columns(4)
+    c1, c2, c3, c4, c5 = st.columns(5)
 
     c1.metric("Documents Ingested", metrics.get("documents_ingested", "—"))
     c2.metric("Chunks Ingested", metrics.get("chunks_ingested", "—"))
-    c3.metric("Average Latency (s)", metrics.get("avg_latency", "—"))
-    c4.metric("RAGAS Score (Latest)", metrics.get("ragas_score", "—"))
+    c3.metric("Average Latency (s)", metrics.get("avg_latency") or "—")
+    c4.metric("P95 Latency (s)", metrics.get("p95_latency") or "—")
+    c5.metric("RAGAS Score (Latest)", metrics.get("ragas_score") or "—")
+
+    stage_latency = metrics.get("stage_latency_ms") or {}
+    if stage_latency:
+        st.markdown("**Per-stage latency (ms)**")
+        st.dataframe(pd.DataFrame(stage_latency).T)
 
     with st.expander("Recent Queries Log"):
-        try:
-            logs = requests.get(f"{API_URL}/recent-queries").json()
+        logs = api_client.get_recent_queries()
+        if logs:
             st.dataframe(logs)
-        except:
+        else:
             st.write("Logs unavailable.")
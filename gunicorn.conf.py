@@ -0,0 +1,31 @@
+"""
+Multi-worker serving: gunicorn -c gunicorn.conf.py backend.api:app
+
+The app is imported and the FAISS index loaded once in the master, then
+workers are forked. Index pages are shared copy-on-write (or through the
+page cache with VECTOR_STORE_MMAP=true), so N workers hold one physical
+copy. Ingest in any worker publishes a new snapshot version that the
+other workers pick up on their next search.
+"""
+import gc
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master before any worker is forked. Only load here:
+    # searching would start FAISS/OpenMP threads that do not survive fork.
+    from backend.vector_store import vector_store
+
+    vector_store.load()
+    server.log.info(
+        f"Preloaded vector index: {len(vector_store.metadatas)} chunks "
+        f"(mmap={vector_store.mmap}, snapshot={vector_store.version})"
+    )
+    # Keep the collector from touching (and un-sharing) preloaded objects
+    gc.freeze()
@@ -1,51 +1,220 @@
-from datasets import Dataset
-from ragas import evaluate
-from ragas.metrics import (
-    Faithfulness,
-    ResponseRelevancy,
-    ContextRelevance,
-    ContextRecall
-)
+import argparse
+import hashlib
 import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
 
 # --------------------------
-# Load evaluation data
+# Configuration
 # --------------------------
-with open("ragas_eval_sample.json", "r") as f:
-    data = json.load(f)
+DEFAULT_DATA = "ragas_eval_sample.json"
+DEFAULT_CACHE = "artifacts/ragas_cache.jsonl"
+DEFAULT_RESULTS = "artifacts/ragas_results.jsonl"
+METRIC_NAMES = ["faithfulness", "answer_relevancy", "context_relevance", "context_recall"]
 
-eval_rows = {
-    "question": [],
-    "answer": [],
-    "contexts": [],
-    "ground_truth": []
-}
+# Judge model is part of the cache key; unset means ragas' default LLM
+JUDGE_MODEL = os.getenv("RAGAS_JUDGE_MODEL", "")
+RAGAS_DEFAULT_JUDGE = "gpt-4o-mini"   # what ragas.evaluate picks when given no llm
 
-for item in data:
-    eval_rows["question"].append(item["question"])
-    eval_rows["answer"].append(item["answer"])
-    eval_rows["contexts"].append(item["contexts"])
-    eval_rows["ground_truth"].append(item["ground_truth"])
 
-dataset = Dataset.from_dict(eval_rows)
+def build_metric(name):
+    from ragas.metrics import (
+        Faithfulness,
+        ResponseRelevancy,
+        ContextRelevance,
+        ContextRecall
+    )
+
+    return {
+        "faithfulness": Faithfulness,
+        "answer_relevancy": ResponseRelevancy,
+        "context_relevance": ContextRelevance,
+        "context_recall": ContextRecall,
+    }[name]()
+
+
+# --------------------------
+# Per-sample score cache
+# --------------------------
+def sample_key(item, metric, judge_model):
+    payload = json.dumps(
+        [item["question"], item["answer"], item["contexts"], item["ground_truth"], metric, judge_model or "default"],
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ScoreCache:
+    """Append-only JSONL cache of key -> score, safe to write from threads."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.scores = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                        self.scores[row["key"]] = row["score"]
+                    except (ValueError, KeyError):
+                        continue
+
+    def put_many(self, rows):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                for key, metric, score in rows:
+                    self.scores[key] = score
+                    f.write(json.dumps({"key": key, "metric": metric, "score": score}) + "\n")
+
 
 # --------------------------
-# Run RAGAS evaluation
+# Scoring
 # --------------------------
-metrics = [
-    Faithfulness(),
-    ResponseRelevancy(),
-    ContextRelevance(),
-    ContextRecall(),
-]
-
-result = evaluate(dataset, metrics=metrics)
-
-print("\n===== RAGAS Evaluation Results =====")
-print(result)
-
-try:
-    print("\n=== Detailed Pandas Table ===")
-    print(result.to_pandas())
-except Exception:
-    pass
+def score_batch(metric_name, items, judge_model):
+    """Run one ragas metric over a batch of rows; returns one score per row."""
+    from datasets import Dataset
+    from ragas import evaluate
+
+    dataset = Dataset.from_dict({
+        "question": [i["question"] for i in items],
+        "answer": [i["answer"] for i in items],
+        "contexts": [i["contexts"] for i in items],
+        "ground_truth": [i["ground_truth"] for i in items],
+    })
+
+    from ragas.embeddings import embedding_factory
+    from ragas.llms import llm_factory
+
+    from backend.llm_client import priority_client
+    from backend.rate_limiter import EVAL
+
+    # Same models ragas would pick, but on the shared rate-limited client
+    client = priority_client(EVAL)
+    metric = build_metric(metric_name)
+    result = evaluate(
+        dataset,
+        metrics=[metric],
+        llm=llm_factory(judge_model or RAGAS_DEFAULT_JUDGE, client=client),
+        embeddings=embedding_factory("openai", client=client),
+    )
+    column = result.to_pandas()[metric.name]
+    return [None if v != v else float(v) for v in column.tolist()]
+
+
+def run(data, metrics, cache, concurrency, batch_size, judge_model, results_path):
+    # Work out which (row, metric) pairs are not cached yet
+    todo = {m: [] for m in metrics}
+    for idx, item in enumerate(data):
+        for m in metrics:
+            if sample_key(item, m, judge_model) not in cache.scores:
+                todo[m].append(idx)
+
+    jobs = [
+        (m, idxs[i:i + batch_size])
+        for m, idxs in todo.items()
+        for i in range(0, len(idxs), batch_size)
+    ]
+    total_pairs = len(data) * len(metrics)
+    missing = sum(len(v) for v in todo.values())
+    print(f"{total_pairs - missing}/{total_pairs} scores cached, {missing} to compute in {len(jobs)} jobs")
+
+    start = time.perf_counter()
+    done_pairs, failed_jobs = 0, 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {
+            pool.submit(score_batch, m, [data[i] for i in idxs], judge_model): (m, idxs)
+            for m, idxs in jobs
+        }
+        for fut in as_completed(futures):
+            m, idxs = futures[fut]
+            try:
+                scores = fut.result()
+            except Exception as e:
+                failed_jobs += 1
+                print(f"  [{m}] batch of {len(idxs)} failed: {e}")
+                continue
+
+            # Persist as each job finishes, so an interrupted run resumes here
+            cache.put_many([
+                (sample_key(data[i], m, judge_model), m, s)
+                for i, s in zip(idxs, scores) if s is not None
+            ])
+            done_pairs += len(idxs)
+            elapsed = time.perf_counter() - start
+            print(f"  progress {done_pairs}/{missing} ({done_pairs / elapsed:.2f} scores/s)")
+
+    # Assemble per-row results from the cache
+    rows = []
+    for item in data:
+        row = {"question": item["question"]}
+        for m in metrics:
+            row[m] = cache.scores.get(sample_key(item, m, judge_model))
+        rows.append(row)
+
+    Path(results_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(results_path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+    summary = {}
+    for m in metrics:
+        vals = [r[m] for r in rows if r[m] is not None]
+        summary[m] = round(sum(vals) / len(vals), 4) if vals else None
+    summary["num_samples"] = len(rows)
+    summary["computed"] = missing
+    summary["failed_jobs"] = failed_jobs
+    return rows, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental RAGAS evaluation with per-sample caching")
+    parser.add_argument("--data", default=DEFAULT_DATA)
+    parser.add_argument("--metrics", default=",".join(METRIC_NAMES))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--cache", default=DEFAULT_CACHE)
+    parser.add_argument("--results", default=DEFAULT_RESULTS)
+    parser.add_argument("--judge-model", default=JUDGE_MODEL)
+    args = parser.parse_args()
+
+    # --------------------------
+    # Load evaluation data
+    # --------------------------
+    with open(args.data, "r") as f:
+        data = json.load(f)
+
+    metrics = [m.strip() for m in args.metrics.split(",") if m.strip()]
+    unknown = set(metrics) - set(METRIC_NAMES)
+    if unknown:
+        parser.error(f"Unknown metrics: {sorted(unknown)}")
+
+    # --------------------------
+    # Run RAGAS evaluation
+    # --------------------------
+    rows, summary = run(
+        data, metrics, ScoreCache(args.cache), args.concurrency, args.batch_size,
+        args.judge_model, args.results,
+    )
+
+    print("\n===== RAGAS Evaluation Results =====")
+    print(json.dumps(summary, indent=2))
+    print(f"Per-sample results written to {args.results}")
+
+    try:
+        import pandas as pd
+        print("\n=== Detailed Pandas Table ===")
+        print(pd.DataFrame(rows))
+    except Exception:
+        pass
+
+    if summary["failed_jobs"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()